@@ -0,0 +1,260 @@
+"""
+History compaction: folds near-duplicate wordings of a question into one
+canonical entry and drops entries that no longer answer anything.
+
+Questions are only merged when their stored answers are identical, so every
+merged wording keeps resolving to the answer it had. Within each group of
+entries sharing an answer, similar wordings are found with a prefix-filtered
+self-join on the token sets of matching.py: only wordings sharing one of
+their rarest tokens are ever compared, and candidates are confirmed with the
+same Jaccard metric lookups use, so the pass never scores all pairs yet misses
+none above the threshold. The threshold applies to every merge: two wordings
+stored under the same intent still stay apart below it, since an intent
+labels a kind of question ("work_authorization") rather than one question.
+Merged wordings become ``aliases`` of the canonical entry (see the
+version 4 schema in store.py); exact and similarity lookups follow them.
+"""
+
+import json
+import math
+import time
+from collections import Counter
+from typing import Any, Dict, FrozenSet, Iterator, List, NamedTuple, Optional, Tuple
+
+from .matching import jaccard, normalize_question, question_tokens
+from .metrics import timed
+from .store import AnswerStore
+
+Row = Tuple[str, Dict[str, Any], Optional[str], int, Optional[float]]
+
+
+class Cluster(NamedTuple):
+    canonical: str
+    entry: Dict[str, Any]
+    intent: Optional[str]
+    merged: List[str]
+
+
+class CompactionPlan(NamedTuple):
+    clusters: List[Cluster]
+    # Entries whose alias lists only need pruning (an alias key was stored again since).
+    rewrites: List[Cluster]
+    dropped_empty: List[str]
+    dropped_stale: List[str]
+    versions: Dict[str, int]
+
+
+class _DisjointSet:
+    def __init__(self) -> None:
+        self.parent: Dict[str, str] = {}
+
+    def find(self, key: str) -> str:
+        root = key
+        while self.parent.get(root, root) != root:
+            root = self.parent[root]
+        while key != root:
+            self.parent[key], key = root, self.parent.get(key, key)
+        return root
+
+    def union(self, first: str, second: str) -> None:
+        first, second = self.find(first), self.find(second)
+        if first != second:
+            self.parent[second] = first
+
+
+def similar_pairs(token_sets: List[FrozenSet[str]], threshold: float) -> Iterator[Tuple[int, int]]:
+    """
+    Index pairs (i, j) whose Jaccard similarity is at least ``threshold``.
+
+    Sets are visited smallest first with their tokens ordered rarest first.
+    Two sets reaching the threshold must share a token among the first
+    ``|s| - ceil(threshold * |s|) + 1`` of each, so only those prefixes are
+    indexed and probed, and earlier sets smaller than ``threshold * |s|`` are
+    skipped.
+    """
+    threshold = max(threshold, 1e-9)
+    frequency = Counter(token for tokens in token_sets for token in tokens)
+    order = sorted((index for index, tokens in enumerate(token_sets) if tokens), key=lambda i: len(token_sets[i]))
+    postings: Dict[str, List[int]] = {}
+    for current in order:
+        tokens = token_sets[current]
+        size = len(tokens)
+        prefix = sorted(tokens, key=lambda token: (frequency[token], token))[: size - math.ceil(threshold * size - 1e-9) + 1]
+        min_size = threshold * size - 1e-9
+        candidates: Dict[int, None] = {}
+        for token in prefix:
+            posting = postings.setdefault(token, [])
+            for other in posting:
+                if len(token_sets[other]) >= min_size:
+                    candidates[other] = None
+            posting.append(current)
+        for other in candidates:
+            if jaccard(tokens, token_sets[other]) >= threshold:
+                yield other, current
+
+
+def _answer(entry: Dict[str, Any]) -> str:
+    answer = entry.get("answer")
+    return answer.strip() if isinstance(answer, str) else json.dumps(answer) if answer is not None else ""
+
+
+def _aliases(entry: Dict[str, Any]) -> List[Dict[str, str]]:
+    aliases = entry.get("aliases")
+    if not isinstance(aliases, list):
+        return []
+    return [alias for alias in aliases if isinstance(alias, dict) and isinstance(alias.get("key"), str)]
+
+
+def _row_size(key: str, entry: Dict[str, Any]) -> int:
+    return len(key) + len(json.dumps(entry))
+
+
+def plan_compaction(
+    rows: List[Row],
+    threshold: float = 0.75,
+    stale_before: Optional[float] = None,
+) -> CompactionPlan:
+    """
+    Decide what to merge and drop. ``rows`` come from AnswerStore.history_rows();
+    entries last written before ``stale_before`` (a Unix time) are dropped.
+    """
+    by_key = {row[0]: row for row in rows}
+    versions = {key: row[3] for key, row in by_key.items()}
+    dropped_empty = [key for key, entry, *_ in rows if not _answer(entry)]
+    dropped_stale = []
+    if stale_before is not None:
+        dropped_stale = [
+            key for key, entry, _intent, _version, updated_at in rows
+            if _answer(entry) and updated_at is not None and updated_at < stale_before
+        ]
+    dropped = set(dropped_empty) | set(dropped_stale)
+
+    groups: Dict[str, List[str]] = {}
+    for key, entry, *_ in rows:
+        if key not in dropped:
+            groups.setdefault(_answer(entry), []).append(key)
+
+    components = _DisjointSet()
+    for keys in groups.values():
+        if len(keys) < 2:
+            continue
+        # Every wording of an entry takes part: its key, its original question and
+        # its earlier aliases, so a new wording close to any of them joins the entry.
+        owners: List[str] = []
+        token_sets: List[FrozenSet[str]] = []
+        for key in keys:
+            entry = by_key[key][1]
+            wordings = {key, normalize_question(str(entry.get("question", "")))}
+            wordings.update(normalize_question(str(alias.get("question") or alias["key"])) for alias in _aliases(entry))
+            for wording in wordings:
+                owners.append(key)
+                token_sets.append(question_tokens(wording))
+        for first, second in similar_pairs(token_sets, threshold):
+            components.union(owners[first], owners[second])
+
+    members: Dict[str, List[str]] = {}
+    for key, *_ in rows:
+        if key not in dropped:
+            members.setdefault(components.find(key), []).append(key)
+
+    clusters: List[Cluster] = []
+    rewrites: List[Cluster] = []
+    for keys in members.values():
+        # The most recently written wording becomes canonical; its answer is the same as the others'.
+        canonical = max(keys, key=lambda key: (by_key[key][4] or 0.0, by_key[key][3]))
+        merged = [key for key in keys if key != canonical]
+        aliases: Dict[str, Dict[str, str]] = {}
+        for key in [canonical, *merged]:
+            entry = by_key[key][1]
+            if key != canonical:
+                aliases.setdefault(key, {"key": key, "question": str(entry.get("question") or key)})
+            for alias in _aliases(entry):
+                aliases.setdefault(alias["key"], {"key": alias["key"], "question": alias.get("question") or alias["key"]})
+        # A wording stored again as its own entry answers for itself.
+        kept = [alias for key, alias in aliases.items() if key != canonical and (key not in by_key or key in merged)]
+        entry = dict(by_key[canonical][1])
+        if kept:
+            entry["aliases"] = kept
+        else:
+            entry.pop("aliases", None)
+        intent = by_key[canonical][2] or next((by_key[key][2] for key in merged if by_key[key][2]), None)
+        cluster = Cluster(canonical, entry, intent, merged)
+        if merged:
+            clusters.append(cluster)
+        elif entry != by_key[canonical][1]:
+            rewrites.append(cluster)
+    return CompactionPlan(clusters, rewrites, dropped_empty, dropped_stale, versions)
+
+
+def compact_history(
+    store: AnswerStore,
+    threshold: float = 0.75,
+    stale_days: Optional[float] = None,
+    dry_run: bool = False,
+    examples: int = 10,
+) -> Dict[str, Any]:
+    """
+    Plan and (unless ``dry_run``) apply a compaction, returning a report of
+    what changed. Planning reads a snapshot without holding the write lock;
+    a cluster whose entries were written in the meantime is skipped and left
+    for the next run.
+    """
+    started = time.perf_counter()
+    with timed("compact.plan"):
+        rows = store.history_rows()
+        stale_before = time.time() - stale_days * 86400 if stale_days else None
+        plan = plan_compaction(rows, threshold, stale_before)
+
+    clusters = plan.clusters + plan.rewrites
+    drops = plan.dropped_empty + plan.dropped_stale
+    skipped = 0
+    if not dry_run:
+        with timed("compact.apply"), store.transaction():
+            keys = [key for cluster in clusters for key in (cluster.canonical, *cluster.merged)] + drops
+            current = store.entry_versions(keys)
+
+            def unchanged(keys: List[str]) -> bool:
+                return all(current.get(key) == plan.versions[key] for key in keys)
+
+            applied = [cluster for cluster in clusters if unchanged([cluster.canonical, *cluster.merged])]
+            applied_drops = [key for key in drops if unchanged([key])]
+            skipped = len(clusters) - len(applied) + len(drops) - len(applied_drops)
+            for cluster in applied:
+                store.upsert_entry(cluster.canonical, cluster.entry, cluster.intent)
+                for key in cluster.merged:
+                    store.delete_entry(key)
+            for key in applied_drops:
+                store.delete_entry(key)
+        clusters, drops = applied, applied_drops
+
+    merged = [cluster for cluster in clusters if cluster.merged]
+    removed = {key for cluster in merged for key in cluster.merged} | set(drops)
+    rewritten = {cluster.canonical: cluster.entry for cluster in clusters}
+    bytes_before = sum(_row_size(key, entry) for key, entry, *_ in rows)
+    bytes_after = sum(
+        _row_size(key, rewritten.get(key, entry)) for key, entry, *_ in rows if key not in removed
+    )
+    return {
+        "dry_run": dry_run,
+        "threshold": threshold,
+        "entries_before": len(rows),
+        "entries_after": len(rows) - len(removed),
+        "clusters": len(merged),
+        "merged": sum(len(cluster.merged) for cluster in merged),
+        "aliases_pruned": len(clusters) - len(merged),
+        "dropped_empty": len(set(plan.dropped_empty) & set(drops)),
+        "dropped_stale": len(set(plan.dropped_stale) & set(drops)),
+        "skipped": skipped,
+        "bytes_before": bytes_before,
+        "bytes_after": bytes_after,
+        "duration_ms": round((time.perf_counter() - started) * 1000, 3),
+        "examples": [
+            {
+                "key": cluster.canonical,
+                "question": cluster.entry.get("question", cluster.canonical),
+                "answer": cluster.entry.get("answer"),
+                "aliases": [alias["question"] for alias in cluster.entry.get("aliases", [])],
+            }
+            for cluster in merged[:examples]
+        ],
+    }
@@ -0,0 +1,121 @@
+"""
+Local stand-in for the parts of ``google.generativeai`` the backend uses.
+
+Select it with ``GEMINI_BACKEND=fake`` (no API key needed) or hand it to
+``GeminiClient`` directly. Latency is configurable so benchmarks and tests can
+exercise timeouts, concurrency limits and caching without network access.
+"""
+
+import asyncio
+import hashlib
+import os
+import time
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+
+LATENCY_SECONDS = float(os.getenv("FAKE_GEMINI_LATENCY_MS", "50")) / 1000
+# Streaming: the first chunk arrives after LATENCY_SECONDS, each later chunk after this delay.
+CHUNK_LATENCY_SECONDS = float(os.getenv("FAKE_GEMINI_CHUNK_LATENCY_MS", "10")) / 1000
+CHUNK_WORDS = 4
+
+# Observable call counters, reset with reset_stats().
+stats: Dict[str, int] = {"calls": 0, "stream_calls": 0}
+_configured: Dict[str, Any] = {}
+
+
+def configure(api_key: Optional[str] = None, **kwargs: Any) -> None:
+    _configured.update({"api_key": api_key, **kwargs})
+
+
+def reset_stats() -> None:
+    for key in stats:
+        stats[key] = 0
+
+
+def fake_answer(model_name: str, prompt: str) -> str:
+    digest = hashlib.sha256(f"{model_name}\n{prompt}".encode("utf-8")).hexdigest()[:12]
+    return (
+        f"I am excited about this opportunity and my background fits the role well. "
+        f"In previous work I delivered measurable results on similar problems. "
+        f"I would bring the same focus and ownership to your team. (draft {digest})"
+    )
+
+
+class FakeResponse:
+    def __init__(self, text: str) -> None:
+        self.text = text
+
+
+class FakeStreamResponse:
+    """Mimics the SDK's streamed response: iterate it for chunks, each with ``.text``."""
+
+    def __init__(self, chunks: List[str], chunk_latency: float, fail_after: Optional[int] = None) -> None:
+        self._chunks = chunks
+        self._chunk_latency = chunk_latency
+        self._fail_after = fail_after
+
+    def _chunk(self, position: int) -> FakeResponse:
+        if self._fail_after is not None and position >= self._fail_after:
+            raise RuntimeError("fake stream interrupted")
+        return FakeResponse(self._chunks[position])
+
+    def __iter__(self) -> Iterator[FakeResponse]:
+        for position in range(len(self._chunks)):
+            if position:
+                time.sleep(self._chunk_latency)
+            yield self._chunk(position)
+
+    def __aiter__(self) -> AsyncIterator[FakeResponse]:
+        return self._aiterate()
+
+    async def _aiterate(self) -> AsyncIterator[FakeResponse]:
+        for position in range(len(self._chunks)):
+            if position:
+                await asyncio.sleep(self._chunk_latency)
+            yield self._chunk(position)
+
+
+class GenerativeModel:
+    """
+    Model names starting with ``fail`` raise, to exercise the fallback chain;
+    names starting with ``flaky`` stream two chunks and then raise.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        latency: Optional[float] = None,
+        chunk_latency: Optional[float] = None,
+    ) -> None:
+        self.model_name = model_name
+        self.latency = LATENCY_SECONDS if latency is None else latency
+        self.chunk_latency = CHUNK_LATENCY_SECONDS if chunk_latency is None else chunk_latency
+        self.fail = model_name.startswith("fail")
+        self.fail_after = 2 if model_name.startswith("flaky") else None
+
+    def _check(self) -> None:
+        if self.fail:
+            raise RuntimeError(f"fake model {self.model_name} is configured to fail")
+
+    def _stream(self, prompt: str) -> FakeStreamResponse:
+        words = fake_answer(self.model_name, prompt).split(" ")
+        chunks = [
+            " ".join(words[i : i + CHUNK_WORDS]) + (" " if i + CHUNK_WORDS < len(words) else "")
+            for i in range(0, len(words), CHUNK_WORDS)
+        ]
+        return FakeStreamResponse(chunks, self.chunk_latency, self.fail_after)
+
+    def generate_content(self, prompt: str, stream: bool = False) -> Any:
+        stats["stream_calls" if stream else "calls"] += 1
+        time.sleep(self.latency)
+        self._check()
+        if stream:
+            return self._stream(prompt)
+        return FakeResponse(fake_answer(self.model_name, prompt))
+
+    async def generate_content_async(self, prompt: str, stream: bool = False) -> Any:
+        stats["stream_calls" if stream else "calls"] += 1
+        await asyncio.sleep(self.latency)
+        self._check()
+        if stream:
+            return self._stream(prompt)
+        return FakeResponse(fake_answer(self.model_name, prompt))
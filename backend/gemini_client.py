@@ -0,0 +1,318 @@
+import asyncio
+import hashlib
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+
+class DraftCache:
+    """
+    Persistent, content-addressed cache of generated drafts.
+
+    Entries are keyed by sha256(model + prompt), expire after ``ttl_seconds`` and
+    are evicted least-recently-used once more than ``max_entries`` are stored.
+    Every method blocks on SQLite; async callers run them in a worker thread.
+    Writes do not evict: call evict() afterwards, off the request path.
+    """
+
+    def __init__(self, db_path: Path, ttl_seconds: float = 7 * 24 * 3600, max_entries: int = 1000) -> None:
+        self.db_path = Path(db_path)
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.db_path, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS drafts ("
+            " key TEXT PRIMARY KEY,"
+            " model TEXT NOT NULL,"
+            " draft TEXT NOT NULL,"
+            " source TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS drafts_accessed ON drafts (accessed_at)")
+
+    @staticmethod
+    def key(model: str, prompt: str) -> str:
+        return hashlib.sha256(f"{model}\x00{prompt}".encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, str]]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT draft, source, created_at FROM drafts WHERE key = ?", (key,)
+            ).fetchone()
+            if row and now - row[2] > self.ttl_seconds:
+                self._conn.execute("DELETE FROM drafts WHERE key = ?", (key,))
+                row = None
+            if not row:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE drafts SET accessed_at = ? WHERE key = ?", (now, key))
+            self.hits += 1
+            return {"draft": row[0], "source": row[1]}
+
+    def put(self, key: str, model: str, draft: str, source: str) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO drafts (key, model, draft, source, created_at, accessed_at) VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET draft = excluded.draft, source = excluded.source, "
+                "created_at = excluded.created_at, accessed_at = excluded.accessed_at",
+                (key, model, draft, source, now, now),
+            )
+
+    def evict(self) -> None:
+        """Drop expired entries, then the least recently used ones beyond ``max_entries``."""
+        now = time.time()
+        with self._lock:
+            self._evict(now)
+
+    def _evict(self, now: float) -> None:
+        expired = self._conn.execute("DELETE FROM drafts WHERE created_at < ?", (now - self.ttl_seconds,)).rowcount
+        overflow = self._conn.execute("SELECT COUNT(*) FROM drafts").fetchone()[0] - self.max_entries
+        if overflow > 0:
+            self._conn.execute(
+                "DELETE FROM drafts WHERE key IN (SELECT key FROM drafts ORDER BY accessed_at LIMIT ?)",
+                (overflow,),
+            )
+        self.evictions += max(expired, 0) + max(overflow, 0)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM drafts")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            size = self._conn.execute("SELECT COUNT(*) FROM drafts").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "size": size,
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+        }
+
+
+class GeminiClient:
+    """
+    Long-lived async Gemini client.
+
+    Model instances are created once per model name and reused, upstream calls
+    are bounded by a semaphore and a per-call timeout, finished drafts go into
+    the DraftCache, and concurrent identical prompts share one in-flight call.
+    """
+
+    def __init__(
+        self,
+        genai_module: Any,
+        api_key: Optional[str],
+        models: List[str],
+        max_concurrency: int = 4,
+        timeout: float = 30.0,
+        cache: Optional[DraftCache] = None,
+    ) -> None:
+        self.genai = genai_module
+        self.api_key = api_key
+        self.models = list(dict.fromkeys(models))
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self.cache = cache
+        self.upstream_calls = 0
+        self.deduplicated = 0
+        self._instances: Dict[str, Any] = {}
+        self._configured = False
+        # Semaphores and futures belong to one event loop; recreated if the loop changes (e.g. in tests).
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._inflight: Dict[str, "asyncio.Future[Dict[str, str]]"] = {}
+        self._eviction: Optional["asyncio.Future[None]"] = None
+
+    @property
+    def available(self) -> bool:
+        return bool(self.genai and self.api_key)
+
+    def _model(self, name: str) -> Any:
+        if not self._configured:
+            self.genai.configure(api_key=self.api_key)
+            self._configured = True
+        instance = self._instances.get(name)
+        if instance is None:
+            instance = self._instances[name] = self.genai.GenerativeModel(name)
+        return instance
+
+    def _bind_loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop = loop
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._inflight = {}
+            self._eviction = None
+
+    async def _cache_get(self, key: str) -> Optional[Dict[str, str]]:
+        # SQLite may wait up to its busy timeout, so cache I/O never runs on the event loop.
+        if self.cache is None:
+            return None
+        return await asyncio.to_thread(self.cache.get, key)
+
+    async def _cache_put(self, key: str, model_name: str, draft: str, source: str) -> None:
+        if self.cache is None:
+            return
+        await asyncio.to_thread(self.cache.put, key, model_name, draft, source)
+        # One eviction pass at a time, in the background; puts made meanwhile are covered by the next one.
+        if self._eviction is None or self._eviction.done():
+            self._eviction = asyncio.ensure_future(asyncio.to_thread(self.cache.evict))
+            self._eviction.add_done_callback(_ignore_eviction_error)
+
+    def cache_key(self, prompt: str) -> str:
+        return DraftCache.key(self.models[0], prompt)
+
+    def _cacheable(self, model_name: str) -> bool:
+        # Lookups use the primary model's key, so a fallback model's draft is not cached:
+        # it would keep being served as the primary's after the primary recovers.
+        return model_name == self.models[0]
+
+    async def generate(self, prompt: str) -> Dict[str, Any]:
+        """Return {"draft", "source", "cached"}; only the primary model's drafts are cached."""
+        if not self.available:
+            return {**unconfigured_fallback(), "cached": False}
+
+        self._bind_loop()
+        key = self.cache_key(prompt)
+        hit = await self._cache_get(key)
+        if hit is not None:
+            return {**hit, "cached": True}
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.deduplicated += 1
+        else:
+            task = asyncio.ensure_future(self._generate_uncached(key, prompt))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _done: self._inflight.pop(key, None))
+        # Shield so one caller disconnecting does not cancel the call others are waiting on.
+        result = await asyncio.shield(task)
+        return {**result, "cached": False}
+
+    async def _generate_uncached(self, key: str, prompt: str) -> Dict[str, str]:
+        errors = []
+        for model_name in self.models:
+            try:
+                model = self._model(model_name)
+                async with self._semaphore:
+                    self.upstream_calls += 1
+                    result = await asyncio.wait_for(model.generate_content_async(prompt), self.timeout)
+                text = result.text if hasattr(result, "text") else str(result)
+            except asyncio.TimeoutError:
+                errors.append(f"{model_name}: timed out after {self.timeout:g}s")
+                continue
+            except Exception as exc:  # pragma: no cover - defensive
+                errors.append(f"{model_name}: {exc}")
+                continue
+            source = f"gemini:{model_name}"
+            if self._cacheable(model_name):
+                await self._cache_put(key, model_name, text, source)
+            return {"draft": text, "source": source}
+        return failed_fallback(errors)
+
+    async def stream(self, prompt: str) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Yield ("delta", {"text"}) events as tokens arrive, then ("done", {"draft", "source", "cached"}).
+
+        Fallback semantics match generate(): models are tried in order and a failure
+        falls through to the next one. If a model fails after it already produced
+        output, a ("reset", {...}) event tells the consumer to discard the partial text.
+        Cache hits replay instantly as a single delta; completed drafts from the primary model are cached.
+        """
+        if not self.available:
+            fallback = unconfigured_fallback()
+            yield "delta", {"text": fallback["draft"]}
+            yield "done", {**fallback, "cached": False}
+            return
+
+        self._bind_loop()
+        key = self.cache_key(prompt)
+        hit = await self._cache_get(key)
+        if hit is not None:
+            yield "delta", {"text": hit["draft"]}
+            yield "done", {**hit, "cached": True}
+            return
+
+        errors = []
+        for model_name in self.models:
+            parts: List[str] = []
+            try:
+                model = self._model(model_name)
+                async with self._semaphore:
+                    self.upstream_calls += 1
+                    response = await asyncio.wait_for(
+                        model.generate_content_async(prompt, stream=True), self.timeout
+                    )
+                    chunks = response.__aiter__()
+                    while True:
+                        try:
+                            chunk = await asyncio.wait_for(chunks.__anext__(), self.timeout)
+                        except StopAsyncIteration:
+                            break
+                        text = chunk.text if hasattr(chunk, "text") else str(chunk)
+                        if text:
+                            parts.append(text)
+                            yield "delta", {"text": text}
+            except asyncio.TimeoutError:
+                errors.append(f"{model_name}: timed out after {self.timeout:g}s")
+            except Exception as exc:  # pragma: no cover - defensive
+                errors.append(f"{model_name}: {exc}")
+            else:
+                draft = "".join(parts)
+                source = f"gemini:{model_name}"
+                if self._cacheable(model_name):
+                    await self._cache_put(key, model_name, draft, source)
+                yield "done", {"draft": draft, "source": source, "cached": False}
+                return
+            if parts:
+                yield "reset", {"reason": errors[-1]}
+
+        fallback = failed_fallback(errors)
+        yield "delta", {"text": fallback["draft"]}
+        yield "done", {**fallback, "cached": False}
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "upstream_calls": self.upstream_calls,
+            "deduplicated": self.deduplicated,
+            "inflight": len(self._inflight),
+            "cache": self.cache.stats() if self.cache is not None else None,
+        }
+
+
+def _ignore_eviction_error(task: "asyncio.Future[None]") -> None:
+    # A failed pass (e.g. the database was busy) is retried after the next put.
+    if not task.cancelled():
+        task.exception()
+
+
+def unconfigured_fallback() -> Dict[str, str]:
+    return {
+        "draft": "[Fallback] Configure GEMINI_API_KEY on the backend to enable AI drafting.",
+        "source": "fallback",
+    }
+
+
+def failed_fallback(errors: List[str]) -> Dict[str, str]:
+    return {
+        "draft": f"[Fallback] Gemini call failed ({'; '.join(errors)}). "
+        "Set GEMINI_MODEL to a supported model (e.g., gemini-1.5-flash or gemini-1.5-pro) "
+        "and ensure the key is valid.",
+        "source": "fallback",
+    }
@@ -1,21 +1,53 @@
+import asyncio
+import base64
+import hashlib
 import json
 import os
 import re
-from io import BytesIO
+import time
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, AsyncIterator, Dict, Iterator, List, Literal, Optional, Tuple, Union
 
-from fastapi import FastAPI, File, HTTPException, UploadFile
+from fastapi import FastAPI, File, HTTPException, Query, Request, Response, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from PyPDF2 import PdfReader
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field, ValidationError, model_validator
+from starlette.concurrency import run_in_threadpool
 from dotenv import load_dotenv
 
+from .compaction import compact_history
+from .matching import QuestionIndex, normalize_question
+from .metrics import (
+    CONTENT_TYPE as METRICS_CONTENT_TYPE,
+    Counter,
+    Gauge,
+    ServerTimingMiddleware,
+    operation_seconds,
+    profiler,
+    registry,
+    timed,
+)
+from .profiles import (
+    DEFAULT_PROFILE,
+    ProfileMiddleware,
+    ProfileRegistry,
+    ProfileState,
+    current_profile,
+    load_profile_tokens,
+)
+from .prompting import DigestCache, JobDigest, PromptBuilder, PromptPlan, ResumeDigest, content_hash
+from .resume_parsing import ParsedResumeCache, PdfExtractionError, PdfExtractor, ResumeCache
+from .similarity import DEFAULT_THRESHOLD as NGRAM_THRESHOLD, NUMPY_AVAILABLE, SimilarityEngine
+from .store import ANY_ANSWER, KEYWORD_ANSWERS_TABLE, QA_HISTORY_TABLE, AnswerStore, FieldPlan, StoreTransaction
+
 try:
     import google.generativeai as genai  # type: ignore
 except ImportError:  # The package is optional until installed by the user.
     genai = None
 
+from . import fake_genai
+from .gemini_client import DraftCache, GeminiClient
+
 
 BASE_DIR = Path(__file__).resolve().parent
 ROOT_DIR = BASE_DIR.parent
@@ -24,15 +56,7 @@ load_dotenv(BASE_DIR / ".env")
 
 app = FastAPI(title="Job Application Autofill Backend", version="0.1.0")
 
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-DATA_DIR = BASE_DIR / "data"
+DATA_DIR = Path(os.getenv("BACKEND_DATA_DIR", BASE_DIR / "data"))
 DATA_DIR.mkdir(parents=True, exist_ok=True)
 
 RESUME_CACHE_PATH = DATA_DIR / "resume_cache.json"
@@ -42,94 +66,122 @@ KEYWORD_ANSWERS_PATH = DATA_DIR / "keyword_answers.json"
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 DEFAULT_GEMINI_MODEL = "gemini-1.5-flash"
 GEMINI_MODEL = os.getenv("GEMINI_MODEL", DEFAULT_GEMINI_MODEL)
+# "fake" swaps in the local SDK stand-in (backend/fake_genai.py) for tests and benchmarks.
+GEMINI_BACKEND = os.getenv("GEMINI_BACKEND", "google")
+GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "4"))
+GEMINI_TIMEOUT_SECONDS = float(os.getenv("GEMINI_TIMEOUT_SECONDS", "30"))
+# Batch drafting: drafts in flight per request and the per-draft timeout.
+OPEN_BATCH_CONCURRENCY = int(os.getenv("OPEN_BATCH_CONCURRENCY", str(GEMINI_MAX_CONCURRENCY)))
+OPEN_BATCH_ITEM_TIMEOUT_SECONDS = float(os.getenv("OPEN_BATCH_ITEM_TIMEOUT_SECONDS", "45"))
+# Request limits. Upstream calls are already capped by GEMINI_MAX_CONCURRENCY across all
+# requests, so a batch may use that many slots; the limits stop it queueing unbounded work.
+OPEN_BATCH_MAX_CONCURRENCY = int(os.getenv("OPEN_BATCH_MAX_CONCURRENCY", str(GEMINI_MAX_CONCURRENCY)))
+OPEN_BATCH_MAX_QUESTIONS = int(os.getenv("OPEN_BATCH_MAX_QUESTIONS", "50"))
+if not 1 <= OPEN_BATCH_CONCURRENCY <= OPEN_BATCH_MAX_CONCURRENCY:
+    raise ValueError(
+        f"OPEN_BATCH_CONCURRENCY ({OPEN_BATCH_CONCURRENCY}) must be between 1 and "
+        f"OPEN_BATCH_MAX_CONCURRENCY ({OPEN_BATCH_MAX_CONCURRENCY})."
+    )
+DRAFT_CACHE_PATH = Path(os.getenv("DRAFT_CACHE_PATH", DATA_DIR / "draft_cache.sqlite3"))
+DRAFT_CACHE_TTL_SECONDS = float(os.getenv("DRAFT_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+DRAFT_CACHE_MAX_ENTRIES = int(os.getenv("DRAFT_CACHE_MAX_ENTRIES", "1000"))
 LOCAL_RESUME_PATH = Path(os.getenv("LOCAL_RESUME_PATH", DATA_DIR / "resume.pdf"))
+PARSED_RESUMES_DIR = DATA_DIR / "parsed_resumes"
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", "0")) or None  # None: one per CPU
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "8"))
+PDF_TIMEOUT_SECONDS = float(os.getenv("PDF_TIMEOUT_SECONDS", "60"))
+PARSED_RESUMES_MAX_FILES = int(os.getenv("PARSED_RESUMES_MAX_FILES", "256"))
+PARSED_RESUMES_MAX_AGE_DAYS = float(os.getenv("PARSED_RESUMES_MAX_AGE_DAYS", "30"))
+# Layer 3 of closed-question matching: engine and default score cut-off.
+# "auto" uses the NumPy n-gram engine when NumPy is installed, "token" forces the Jaccard index.
+SIMILARITY_ENGINE = os.getenv("SIMILARITY_ENGINE", "auto")
+USE_NGRAM_ENGINE = SIMILARITY_ENGINE != "token" and NUMPY_AVAILABLE
+# Each engine scores on its own scale (see similarity.DEFAULT_THRESHOLD).
+SIMILARITY_THRESHOLD = float(
+    os.getenv("SIMILARITY_THRESHOLD_NGRAM", str(NGRAM_THRESHOLD))
+    if USE_NGRAM_ENGINE
+    else os.getenv("SIMILARITY_THRESHOLD", "0.6")
+)
+# Cached form plans kept (least recently used evicted first).
+FORM_PLAN_MAX_ENTRIES = int(os.getenv("FORM_PLAN_MAX_ENTRIES", "500"))
+# Open-question prompts: default token budget (estimated at 4 characters per token) and digests kept in memory.
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "1000"))
+PROMPT_DIGEST_CACHE_ENTRIES = int(os.getenv("PROMPT_DIGEST_CACHE_ENTRIES", "128"))
+# History sync: largest page / change batch a client may request, and records per import transaction.
+HISTORY_PAGE_MAX = int(os.getenv("HISTORY_PAGE_MAX", "1000"))
+HISTORY_IMPORT_BATCH = int(os.getenv("HISTORY_IMPORT_BATCH", "1000"))
+# History compaction: merge threshold (token Jaccard), optional age limit and
+# background interval (0 disables the background job).
+COMPACT_THRESHOLD = float(os.getenv("COMPACT_THRESHOLD", "0.75"))
+COMPACT_STALE_DAYS = float(os.getenv("COMPACT_STALE_DAYS", "0")) or None
+COMPACT_INTERVAL_SECONDS = float(os.getenv("COMPACT_INTERVAL_SECONDS", "0"))
+# Profiles: shards under DATA_DIR/profiles/<id>/ kept loaded (besides the default), and an
+# optional JSON file mapping bearer tokens to profile ids (then the X-Profile header is ignored).
+PROFILES_DIR = Path(os.getenv("PROFILES_DIR", DATA_DIR / "profiles"))
+PROFILE_MAX_RESIDENT = int(os.getenv("PROFILE_MAX_RESIDENT", "64"))
+PROFILE_TOKENS_PATH = os.getenv("PROFILE_TOKENS_PATH")
+# Comma-separated ids X-Profile may name besides the default and existing shards; "*" allows any.
+PROFILE_IDS = frozenset(filter(None, (part.strip() for part in os.getenv("PROFILE_IDS", "").split(","))))
+# Milliseconds between sampling-profiler samples when started at boot; 0 leaves it off (see /debug/profiler).
+PROFILER_INTERVAL_MS = float(os.getenv("PROFILER_INTERVAL_MS", "0"))
+# /debug/profiler exposes stacks and can start a sampler thread, so it is off unless opted in.
+PROFILER_ENDPOINTS_ENABLED = os.getenv("PROFILER_ENDPOINTS_ENABLED", "0").lower() in ("1", "true", "yes")
+
+
+ANSWER_STORE_PATH = Path(os.getenv("ANSWER_STORE_PATH", DATA_DIR / "answers.sqlite3"))
+
+# qa_history.json and keyword_answers.json now live in SQLite; these paths are only
+# read once to migrate existing data and to keep load_json/save_json callers working.
+# Both act on the active profile's store.
+STORE_BACKED_PATHS = {QA_HISTORY_PATH: QA_HISTORY_TABLE, KEYWORD_ANSWERS_PATH: KEYWORD_ANSWERS_TABLE}
+
+
+def active_profile() -> ProfileState:
+    """The profile of the request being served; the default profile outside requests."""
+    return current_profile.get() or profiles.default
 
 
 def load_json(path: Path, default: Any) -> Any:
-    if not path.exists():
-        return default
-    try:
-        return json.loads(path.read_text(encoding="utf-8"))
-    except json.JSONDecodeError:
-        return default
+    with timed("load_json"):
+        if path in STORE_BACKED_PATHS:
+            return active_profile().store.load_table(STORE_BACKED_PATHS[path]) or default
+        if not path.exists():
+            return default
+        try:
+            return json.loads(path.read_text(encoding="utf-8"))
+        except json.JSONDecodeError:
+            return default
 
 
 def save_json(path: Path, payload: Any) -> None:
-    path.parent.mkdir(parents=True, exist_ok=True)
-    path.write_text(json.dumps(payload, indent=2), encoding="utf-8")
+    with timed("save_json"):
+        if path in STORE_BACKED_PATHS:
+            active_profile().store.replace_table(STORE_BACKED_PATHS[path], payload)
+            return
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(payload, indent=2), encoding="utf-8")
 
 
-def normalize_question(text: str) -> str:
-    cleaned = re.sub(r"[^a-z0-9 ]", " ", text.lower())
-    return " ".join(cleaned.split())
+QuestionMatcher = Union[QuestionIndex, SimilarityEngine]
 
 
-def compute_token_similarity(text1: str, text2: str) -> float:
-    """
-    Compute similarity between two texts based on token overlap.
-    Returns a score between 0 and 1.
-    """
-    tokens1 = set(text1.lower().split())
-    tokens2 = set(text2.lower().split())
-    
-    if not tokens1 or not tokens2:
-        return 0.0
-    
-    # Remove common stop words that don't add meaning
-    stop_words = {"a", "an", "the", "is", "are", "was", "were", "do", "does", "did",
-                  "what", "when", "where", "who", "which", "how", "your", "you", "my",
-                  "have", "has", "had", "be", "been", "being", "of", "for", "to", "in",
-                  "on", "at", "by", "with", "from", "as", "or", "and"}
-    
-    tokens1 = tokens1 - stop_words
-    tokens2 = tokens2 - stop_words
-    
-    if not tokens1 or not tokens2:
-        return 0.0
-    
-    # Calculate Jaccard similarity (intersection / union)
-    intersection = len(tokens1 & tokens2)
-    union = len(tokens1 | tokens2)
-    
-    return intersection / union if union > 0 else 0.0
+def build_question_index(history: Dict[str, Any]) -> QuestionMatcher:
+    if USE_NGRAM_ENGINE:
+        return SimilarityEngine.from_history(history)
+    return QuestionIndex.from_history(history)
 
 
-def find_similar_question(normalized_question: str, history: Dict[str, Any], threshold: float = 0.6) -> Optional[str]:
-    """
-    Find a similar question in the history using token-based similarity matching.
-    Returns the normalized key of the most similar question if similarity exceeds threshold.
-    """
-    best_match = None
-    best_score = 0.0
-    
-    for key, entry in history.items():
-        # Compare with the normalized key
-        score = compute_token_similarity(normalized_question, key)
-        
-        # Also compare with the original question text if available
-        if "question" in entry:
-            original_score = compute_token_similarity(
-                normalized_question, 
-                normalize_question(entry["question"])
-            )
-            score = max(score, original_score)
-        
-        if score > best_score and score >= threshold:
-            best_score = score
-            best_match = key
-    
-    return best_match
+def get_question_index() -> QuestionMatcher:
+    """The active profile's similarity index (see ProfileState.question_index)."""
+    return active_profile().question_index()
 
 
-def extract_text_from_pdf(file_bytes: bytes) -> str:
-    pdf = PdfReader(BytesIO(file_bytes))
-    pages = []
-    for page in pdf.pages:
-        try:
-            pages.append(page.extract_text() or "")
-        except Exception:
-            continue
-    return "\n".join(pages)
+def sync_question_index(txn: StoreTransaction) -> None:
+    active_profile().sync_index(txn)
+
+
+def reset_question_index() -> None:
+    active_profile().reset_index()
 
 
 def extract_structured_resume(raw_text: str) -> Dict[str, Any]:
@@ -181,46 +233,150 @@ def build_resume_summary(resume: Dict[str, Any]) -> str:
     return " | ".join(parts)
 
 
-def load_local_resume_bytes() -> bytes:
-    if not LOCAL_RESUME_PATH.exists():
+def load_local_resume_bytes(path: Path) -> bytes:
+    if not path.exists():
         raise FileNotFoundError(
-            f"Local resume not found at {LOCAL_RESUME_PATH}. "
+            f"Local resume not found at {path}. "
             "Place a PDF or text resume there or set LOCAL_RESUME_PATH."
         )
-    if LOCAL_RESUME_PATH.suffix.lower() == ".pdf":
-        return LOCAL_RESUME_PATH.read_bytes()
-    return LOCAL_RESUME_PATH.read_text(encoding="utf-8", errors="ignore").encode("utf-8")
+    if path.suffix.lower() == ".pdf":
+        return path.read_bytes()
+    return path.read_text(encoding="utf-8", errors="ignore").encode("utf-8")
 
 
-def ensure_gemini_configured() -> bool:
-    if not genai or not GEMINI_API_KEY:
-        return False
-    genai.configure(api_key=GEMINI_API_KEY)
-    return True
+def local_resume_signature(path: Path) -> Optional[Dict[str, Any]]:
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    return {"path": str(path), "mtime_ns": stat.st_mtime_ns, "size": stat.st_size}
+
+
+def load_profile(profile_id: str) -> ProfileState:
+    if profile_id == DEFAULT_PROFILE:
+        # The default profile keeps the original single-user paths and the one-time JSON import.
+        store = AnswerStore(
+            ANSWER_STORE_PATH,
+            legacy_paths={QA_HISTORY_TABLE: QA_HISTORY_PATH, KEYWORD_ANSWERS_TABLE: KEYWORD_ANSWERS_PATH},
+        )
+        resume = ResumeCache(RESUME_CACHE_PATH, build_resume_summary)
+        return ProfileState(profile_id, store, resume, LOCAL_RESUME_PATH, build_question_index)
+    directory = PROFILES_DIR / profile_id
+    return ProfileState(
+        profile_id,
+        AnswerStore(directory / "answers.sqlite3"),
+        ResumeCache(directory / "resume_cache.json", build_resume_summary),
+        directory / "resume.pdf",
+        build_question_index,
+    )
 
 
-def generate_with_gemini(prompt: str) -> Dict[str, str]:
-    if not ensure_gemini_configured():
-        return {
-            "draft": "[Fallback] Configure GEMINI_API_KEY on the backend to enable AI drafting.",
-            "source": "fallback",
-        }
-    errors = []
-    for model_name in [GEMINI_MODEL, DEFAULT_GEMINI_MODEL]:
-        try:
-            model = genai.GenerativeModel(model_name)
-            result = model.generate_content(prompt)
-            text = result.text if hasattr(result, "text") else str(result)
-            return {"draft": text, "source": f"gemini:{model_name}"}
-        except Exception as exc:  # pragma: no cover - defensive
-            errors.append(f"{model_name}: {exc}")
-            continue
-    return {
-        "draft": f"[Fallback] Gemini call failed ({'; '.join(errors)}). "
-        "Set GEMINI_MODEL to a supported model (e.g., gemini-1.5-flash or gemini-1.5-pro) "
-        "and ensure the key is valid.",
-        "source": "fallback",
-    }
+def profile_is_known(profile_id: str) -> bool:
+    """Whether X-Profile may name this id: allowed by PROFILE_IDS, or its shard already exists."""
+    return "*" in PROFILE_IDS or profile_id in PROFILE_IDS or (PROFILES_DIR / profile_id).is_dir()
+
+
+profiles = ProfileRegistry(load_profile, PROFILE_MAX_RESIDENT)
+
+# Added innermost first: CORS must wrap the profile check so its errors carry CORS headers.
+app.add_middleware(
+    ProfileMiddleware,
+    registry=profiles,
+    tokens=load_profile_tokens(PROFILE_TOKENS_PATH),
+    is_known=profile_is_known,
+)
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+    expose_headers=["ETag", "Server-Timing"],
+)
+app.add_middleware(ServerTimingMiddleware)
+pdf_extractor = PdfExtractor(max_workers=PDF_WORKERS, pages_per_task=PDF_PAGES_PER_TASK, timeout=PDF_TIMEOUT_SECONDS)
+parsed_resume_cache = ParsedResumeCache(
+    PARSED_RESUMES_DIR,
+    max_files=PARSED_RESUMES_MAX_FILES,
+    max_age=PARSED_RESUMES_MAX_AGE_DAYS * 86400 if PARSED_RESUMES_MAX_AGE_DAYS > 0 else None,
+)
+
+
+def build_gemini_client() -> GeminiClient:
+    if GEMINI_BACKEND == "fake":
+        genai_module, api_key = fake_genai, GEMINI_API_KEY or "fake"
+    else:
+        genai_module, api_key = genai, GEMINI_API_KEY
+    return GeminiClient(
+        genai_module,
+        api_key,
+        models=[GEMINI_MODEL, DEFAULT_GEMINI_MODEL],
+        max_concurrency=GEMINI_MAX_CONCURRENCY,
+        timeout=GEMINI_TIMEOUT_SECONDS,
+        cache=DraftCache(DRAFT_CACHE_PATH, ttl_seconds=DRAFT_CACHE_TTL_SECONDS, max_entries=DRAFT_CACHE_MAX_ENTRIES),
+    )
+
+
+gemini_client = build_gemini_client()
+
+
+closed_question_results = registry.register(
+    Counter("backend_closed_question_results_total", "Closed-question resolutions by outcome.", ["source"])
+)
+form_plan_results = registry.register(
+    Counter("backend_form_plans_total", "Form-plan requests by status (hit, delta, miss).", ["status"])
+)
+history_compacted = registry.register(
+    Counter("backend_history_compacted_total", "History entries removed by compaction, by outcome.", ["outcome"])
+)
+history_compaction_failures = registry.register(
+    Counter("backend_history_compaction_failures_total", "Background compaction runs that raised.")
+)
+drafts_total = registry.register(
+    Counter("backend_drafts_total", "Open-question drafts by source and cache status.", ["source", "cached"])
+)
+
+
+def draft_cache_gauge() -> Dict[Tuple[str, ...], float]:
+    if gemini_client.cache is None:
+        return {}
+    stats = gemini_client.cache.stats()
+    return {(name,): stats[name] for name in ("hits", "misses", "evictions", "size")}
+
+
+registry.register(
+    Gauge("backend_draft_cache", "Draft cache counters (hits, misses, evictions, size).", draft_cache_gauge, ["stat"])
+)
+registry.register(
+    Gauge(
+        "backend_prompt_digest_cache",
+        "Job/resume digest cache counters (hits, misses, size).",
+        lambda: {(name,): value for name, value in digest_cache.stats().items()},
+        ["stat"],
+    )
+)
+registry.register(
+    Gauge(
+        "backend_similarity_index_entries",
+        "Entries in the in-memory similarity indexes of resident profiles (0 until first built).",
+        lambda: {(): sum(state.index_size for state in profiles.resident())},
+    )
+)
+registry.register(
+    Gauge(
+        "backend_profiles",
+        "Profile shards: resident now, loads and evictions so far.",
+        lambda: {(name,): profiles.stats()[name] for name in ("resident", "loads", "evictions")},
+        ["stat"],
+    )
+)
+
+
+async def generate_with_gemini(prompt: str) -> Dict[str, Any]:
+    with timed("gemini.generate"):
+        result = await gemini_client.generate(prompt)
+    drafts_total.inc(source=result["source"].split(":", 1)[0], cached=str(result["cached"]).lower())
+    return result
 
 
 class ClosedQuestionPayload(BaseModel):
@@ -228,6 +384,14 @@ class ClosedQuestionPayload(BaseModel):
     answer: Optional[str] = None
     choices: Optional[List[str]] = None
     intent: Optional[str] = None
+    # Similarity lookups only: minimum score (default SIMILARITY_THRESHOLD) and,
+    # when set, how many scored candidates to return alongside the best match.
+    threshold: Optional[float] = Field(default=None, ge=0.0, le=1.0)
+    top_k: Optional[int] = Field(default=None, ge=1, le=50)
+
+
+class ClosedQuestionBatchPayload(BaseModel):
+    items: List[ClosedQuestionPayload]
 
 
 class JobContext(BaseModel):
@@ -242,6 +406,29 @@ class OpenQuestionPayload(BaseModel):
     question: str
     job_context: Optional[JobContext] = None
     resume_summary: Optional[str] = None
+    token_budget: Optional[int] = Field(default=None, ge=128, le=32000)
+
+
+class OpenQuestionBatchPayload(BaseModel):
+    questions: List[str] = Field(min_length=1, max_length=OPEN_BATCH_MAX_QUESTIONS)
+    job_context: Optional[JobContext] = None
+    resume_summary: Optional[str] = None
+    concurrency: Optional[int] = Field(default=None, ge=1, le=OPEN_BATCH_MAX_CONCURRENCY)
+    timeout: Optional[float] = Field(default=None, ge=1.0, le=300.0)
+    stream: bool = False
+    token_budget: Optional[int] = Field(default=None, ge=128, le=32000)
+
+
+class FormField(BaseModel):
+    question: str
+    type: Optional[str] = None  # e.g. "select", "radio", "checkbox", "text", "buttons"
+    choices: Optional[List[str]] = None
+    intent: Optional[str] = None
+
+
+class FormPlanPayload(BaseModel):
+    fields: List[FormField] = Field(min_length=1)
+    threshold: Optional[float] = Field(default=None, ge=0.0, le=1.0)
 
 
 @app.get("/health")
@@ -249,59 +436,139 @@ def health() -> Dict[str, str]:
     return {"status": "ok"}
 
 
+async def parse_resume_bytes(raw: bytes, is_pdf: bool) -> Tuple[Dict[str, Any], str, bool]:
+    """
+    Parse resume bytes, reusing an earlier parse of byte-identical content.
+    Returns (resume, sha256, reused). File I/O runs in the thread pool, like
+    extraction runs in the process pool, so the event loop never waits on disk.
+    """
+    with timed("resume.cache_lookup"):
+        digest = parsed_resume_cache.digest(raw)
+        cached = await run_in_threadpool(parsed_resume_cache.get, digest)
+    if cached is not None:
+        return cached, digest, True
+
+    with timed("resume.extract"):
+        if is_pdf:
+            try:
+                raw_text = await pdf_extractor.extract(raw)
+            except asyncio.TimeoutError:
+                raise HTTPException(status_code=504, detail=f"PDF extraction timed out after {PDF_TIMEOUT_SECONDS:g}s.")
+            except PdfExtractionError as exc:
+                raise HTTPException(status_code=503, detail=f"{exc}; please retry the upload.")
+        else:
+            try:
+                raw_text = raw.decode("utf-8", errors="ignore")
+            except Exception:
+                raise HTTPException(status_code=400, detail="Unsupported file encoding.")
+
+    with timed("resume.structure"):
+        resume = extract_structured_resume(raw_text)
+        resume["summary"] = resume.get("summary") or build_resume_summary(resume)
+    await run_in_threadpool(parsed_resume_cache.put, digest, resume)
+    return resume, digest, False
+
+
 @app.post("/parse-resume")
 async def parse_resume(file: UploadFile = File(...)) -> Dict[str, Any]:
-    raw = await file.read()
+    with timed("resume.upload"):
+        raw = await file.read()
     if not raw:
         raise HTTPException(status_code=400, detail="Empty file uploaded.")
 
-    if file.filename.lower().endswith(".pdf"):
-        raw_text = extract_text_from_pdf(raw)
-    else:
-        try:
-            raw_text = raw.decode("utf-8", errors="ignore")
-        except Exception:
-            raise HTTPException(status_code=400, detail="Unsupported file encoding.")
-
-    resume = extract_structured_resume(raw_text)
+    resume, digest, reused = await parse_resume_bytes(raw, file.filename.lower().endswith(".pdf"))
     resume["filename"] = file.filename
-    resume["summary"] = resume.get("summary") or build_resume_summary(resume)
-    save_json(RESUME_CACHE_PATH, resume)
-    return {"cached": True, "resume": resume}
+    resume["sha256"] = digest
+    with timed("resume.store"):
+        await run_in_threadpool(active_profile().resume_cache.store, resume)
+    return {"cached": True, "reused": reused, "resume": resume}
 
 
 @app.post("/parse-resume-local")
-def parse_resume_local() -> Dict[str, Any]:
+async def parse_resume_local() -> Dict[str, Any]:
+    profile = active_profile()
+    # Skip all work when the local file is the one we already parsed.
+    signature = await run_in_threadpool(local_resume_signature, profile.local_resume_path)
+    current = await run_in_threadpool(profile.resume_cache.get)
+    if signature and current and current.resume.get("source_signature") == signature:
+        return {
+            "cached": True,
+            "reused": True,
+            "unchanged": True,
+            "resume": current.resume,
+            "source": str(profile.local_resume_path),
+        }
+
     try:
-        raw = load_local_resume_bytes()
+        with timed("resume.read"):
+            raw = await run_in_threadpool(load_local_resume_bytes, profile.local_resume_path)
     except FileNotFoundError as exc:
         raise HTTPException(status_code=404, detail=str(exc))
 
-    if LOCAL_RESUME_PATH.suffix.lower() == ".pdf":
-        raw_text = extract_text_from_pdf(raw)
-    else:
-        raw_text = raw.decode("utf-8", errors="ignore")
+    resume, digest, reused = await parse_resume_bytes(raw, profile.local_resume_path.suffix.lower() == ".pdf")
+    resume["filename"] = profile.local_resume_path.name
+    resume["sha256"] = digest
+    resume["source_signature"] = signature
+    with timed("resume.store"):
+        await run_in_threadpool(profile.resume_cache.store, resume)
+    return {"cached": True, "reused": reused, "unchanged": False, "resume": resume, "source": str(profile.local_resume_path)}
+
+
+@app.on_event("shutdown")
+def shutdown_pdf_extractor() -> None:
+    pdf_extractor.shutdown()
+
+
+@app.on_event("startup")
+async def warm_question_index() -> None:
+    # Build the default profile's index before serving, in a worker thread, so the first lookup does not pay for it.
+    await run_in_threadpool(profiles.default.question_index)
+
+
+@app.on_event("shutdown")
+def close_profiles() -> None:
+    profiles.close_all()
 
-    resume = extract_structured_resume(raw_text)
-    resume["filename"] = LOCAL_RESUME_PATH.name
-    resume["summary"] = resume.get("summary") or build_resume_summary(resume)
-    save_json(RESUME_CACHE_PATH, resume)
-    return {"cached": True, "resume": resume, "source": str(LOCAL_RESUME_PATH)}
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or any(tag.removeprefix("W/") == etag for tag in candidates)
 
 
 @app.get("/resume")
-def get_resume() -> Dict[str, Any]:
-    resume = load_json(RESUME_CACHE_PATH, {})
-    if not resume:
+def get_resume(request: Request, include_raw_text: bool = False) -> Response:
+    """
+    Return the cached resume. `raw_text` is left out unless requested; the
+    response carries an ETag and answers 304 when If-None-Match still matches.
+    """
+    loaded = active_profile().resume_cache.get()
+    if not loaded:
         raise HTTPException(status_code=404, detail="No resume cached. Upload via /parse-resume first.")
-    return resume
+    body, etag = (loaded.full_body, loaded.full_etag) if include_raw_text else (loaded.slim_body, loaded.slim_etag)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
 
 
-@app.post("/closed-question")
-def handle_closed_question(payload: ClosedQuestionPayload) -> Dict[str, Any]:
+def resolve_closed_question(payload: ClosedQuestionPayload) -> Dict[str, Any]:
+    """
+    Store or look up a single closed question. Stores must run inside an
+    answer store transaction (see resolve_closed_questions). Every result
+    carries `timings`: milliseconds spent per step.
+    """
+    timings: Dict[str, float] = {}
+    response = _resolve_closed_question(payload, timings)
+    response["timings"] = timings
+    closed_question_results.inc(source="stored" if response.get("stored") else response.get("source", "miss"))
+    return response
+
+
+def _resolve_closed_question(payload: ClosedQuestionPayload, timings: Dict[str, float]) -> Dict[str, Any]:
+    store = active_profile().store
     normalized = normalize_question(payload.question)
-    history = load_json(QA_HISTORY_PATH, {})
-    keyword_answers = load_json(KEYWORD_ANSWERS_PATH, {})
     response: Dict[str, Any] = {
         "question": payload.question,
         "normalized": normalized,
@@ -311,27 +578,29 @@ def handle_closed_question(payload: ClosedQuestionPayload) -> Dict[str, Any]:
 
     # If we're storing an answer, save it and return
     if payload.answer:
-        # Check if we need to update existing entry
-        existing_entry = history.get(normalized)
-        updated = False
-        if existing_entry and existing_entry.get("answer") != payload.answer.strip():
-            updated = True
-        
-        history[normalized] = {
-            "question": payload.question.strip(),
-            "answer": payload.answer.strip(),
-            "choices": payload.choices or [],
-        }
-        
-        # Update keyword answers as well
-        if payload.intent:
-            existing_intent = keyword_answers.get(payload.intent)
-            if existing_intent != payload.answer.strip():
-                keyword_answers[payload.intent] = payload.answer.strip()
+        with timed("closed.store", into=timings):
+            # Check if we need to update existing entry
+            existing_entry = store.get_entry(normalized)
+            updated = False
+            if existing_entry and existing_entry.get("answer") != payload.answer.strip():
                 updated = True
-        
-        save_json(QA_HISTORY_PATH, history)
-        save_json(KEYWORD_ANSWERS_PATH, keyword_answers)
+
+            entry = {
+                "question": payload.question.strip(),
+                "answer": payload.answer.strip(),
+                "choices": payload.choices or [],
+            }
+            index = get_question_index()
+            store.upsert_entry(normalized, entry, payload.intent)
+            index.upsert(normalized, entry)
+
+            # Update keyword answers as well
+            if payload.intent:
+                existing_intent = store.get_keyword(payload.intent)
+                if existing_intent != payload.answer.strip():
+                    store.upsert_keyword(payload.intent, payload.answer.strip())
+                    updated = True
+
         response.update({
             "answer": payload.answer.strip(), 
             "found": True, 
@@ -342,19 +611,24 @@ def handle_closed_question(payload: ClosedQuestionPayload) -> Dict[str, Any]:
 
     # Multi-layer matching strategy for lookups
     
-    # Layer 1: Exact normalized match
-    entry = history.get(normalized)
-    if entry:
+    # Layer 1: Exact normalized match (a wording merged into another entry by compaction included)
+    with timed("closed.exact", into=timings):
+        resolved = store.resolve_entries([normalized]).get(normalized)
+    if resolved:
+        key, entry = resolved
         response.update({
             "answer": entry.get("answer"), 
             "found": True,
             "source": "exact"
         })
+        if key != normalized:
+            response["alias_of"] = key
         return response
     
     # Layer 2: Intent-based lookup
     if payload.intent:
-        intent_answer = keyword_answers.get(payload.intent)
+        with timed("closed.intent", into=timings):
+            intent_answer = store.get_keyword(payload.intent)
         if intent_answer:
             response.update({
                 "answer": intent_answer, 
@@ -364,57 +638,633 @@ def handle_closed_question(payload: ClosedQuestionPayload) -> Dict[str, Any]:
             return response
     
     # Layer 3: Smart similarity matching
-    similar_key = find_similar_question(normalized, history, threshold=0.6)
-    if similar_key:
-        similar_entry = history.get(similar_key)
-        if similar_entry and similar_entry.get("answer"):
-            response.update({
-                "answer": similar_entry.get("answer"),
-                "found": True,
-                "source": "similarity",
-                "matched_question": similar_entry.get("question", similar_key)
+    with timed("closed.similarity", into=timings):
+        threshold = SIMILARITY_THRESHOLD if payload.threshold is None else payload.threshold
+        matches = get_question_index().top_k(normalized, k=payload.top_k or 1, threshold=threshold)
+        entries = store.resolve_entries([key for key, _score in matches])
+    scored: List[Dict[str, Any]] = []
+    for matched, score in matches:
+        if matched not in entries:
+            continue
+        # An alias scores like the wording it was, and answers with the entry it was merged into.
+        key, entry = entries[matched]
+        if entry.get("answer") and all(candidate["key"] != key for candidate in scored):
+            scored.append({
+                "key": key,
+                "question": entry.get("question", key),
+                "answer": entry.get("answer"),
+                "score": round(score, 4),
             })
-            return response
+    if payload.top_k:
+        response["candidates"] = scored
+    if scored:
+        best = scored[0]
+        response.update({
+            "answer": best["answer"],
+            "found": True,
+            "source": "similarity",
+            "matched_question": best["question"],
+            "matched_key": best["key"],
+            "score": best["score"],
+        })
+        return response
     
     return response
 
 
-@app.post("/open-question")
-def handle_open_question(payload: OpenQuestionPayload) -> Dict[str, Any]:
-    resume = load_json(RESUME_CACHE_PATH, {})
-    resume_summary = payload.resume_summary or build_resume_summary(resume) if resume else ""
-
-    context_bits = []
-    if payload.job_context:
-        ctx = payload.job_context
-        if ctx.company:
-            context_bits.append(f"Company: {ctx.company}")
-        if ctx.role:
-            context_bits.append(f"Role: {ctx.role}")
-        if ctx.url:
-            context_bits.append(f"Posting: {ctx.url}")
-        if ctx.job_description:
-            context_bits.append(f"Job description snippet: {ctx.job_description}")
-    context_text = "\n".join(context_bits)
-
-    prompt = (
-        "You are drafting a concise application response.\n"
-        f"Question: {payload.question}\n\n"
-        f"Candidate summary: {resume_summary or '[not provided]'}\n"
-        f"{'Context: ' + context_text if context_text else ''}\n\n"
-        "Return a short, specific answer (3-6 sentences)."
+def resolve_closed_questions(items: List[ClosedQuestionPayload]) -> List[Dict[str, Any]]:
+    """
+    Resolve items in order. If any item stores an answer, all of them run in one
+    atomic write transaction, so a batch is either fully stored or not at all.
+    """
+    if not any(item.answer for item in items):
+        return [resolve_closed_question(item) for item in items]
+    try:
+        with active_profile().store.transaction() as txn:
+            results = [resolve_closed_question(item) for item in items]
+    except Exception:
+        # The index may hold upserts that were rolled back.
+        reset_question_index()
+        raise
+    sync_question_index(txn)
+    return results
+
+
+def field_signature(field: FormField, threshold: float) -> str:
+    """Hash of everything that decides how a field resolves."""
+    spec = [
+        normalize_question(field.question),
+        (field.type or "").lower(),
+        [normalize_question(choice) for choice in field.choices or []],
+        field.intent or "",
+        threshold,
+    ]
+    return hashlib.sha256(json.dumps(spec).encode("utf-8")).hexdigest()
+
+
+def form_fingerprint(signatures: List[str]) -> str:
+    """Structural fingerprint of a form: its field signatures in order."""
+    return hashlib.sha256("\n".join(signatures).encode("utf-8")).hexdigest()
+
+
+def plan_dependencies(field: FormField, result: Dict[str, Any]) -> List[Tuple[str, str]]:
+    """The stored answers a resolved field was derived from (see the plan triggers in store.py)."""
+    if not result["found"]:
+        # Any answer written later might match a miss, so every write invalidates it.
+        return [ANY_ANSWER]
+    dependencies = [("qa", result["normalized"])]
+    if result.get("source") != "exact" and field.intent:
+        dependencies.append(("intent", field.intent))
+    if result.get("matched_key"):
+        dependencies.append(("qa", result["matched_key"]))
+    if result.get("alias_of"):
+        dependencies.append(("qa", result["alias_of"]))
+    return dependencies
+
+
+PLAN_RESULT_KEYS = ("normalized", "found", "answer", "source", "alias_of", "matched_question", "matched_key", "score")
+
+
+def resolve_form_plan(payload: FormPlanPayload) -> Dict[str, Any]:
+    """
+    Resolve a whole form through the plan cache. A known form is one lookup of
+    its fingerprint; fields whose plan was invalidated, or that are new to this
+    form, are looked up among other forms' field plans and only then resolved
+    through the matching layers.
+    """
+    store = active_profile().store
+    threshold = SIMILARITY_THRESHOLD if payload.threshold is None else payload.threshold
+    signatures = [field_signature(field, threshold) for field in payload.fields]
+    fingerprint = form_fingerprint(signatures)
+
+    with timed("plan.lookup"):
+        cached = store.get_form_plan(fingerprint)
+        plans = {signature: plan for signature, plan in cached or [] if plan is not None}
+        missing = [signature for signature in dict.fromkeys(signatures) if signature not in plans]
+        if missing:
+            plans.update(store.get_field_plans(missing))
+
+    # Read before resolving: put_form_plan refuses to cache if answers changed meanwhile.
+    revision = store.revision()
+    fresh: Dict[str, FieldPlan] = {}
+    resolved = 0
+    with timed("plan.resolve"):
+        for field, signature in zip(payload.fields, signatures):
+            if signature in plans:
+                continue
+            result = resolve_closed_question(
+                ClosedQuestionPayload(
+                    question=field.question, choices=field.choices, intent=field.intent, threshold=threshold
+                )
+            )
+            resolved += 1
+            plans[signature] = {key: result[key] for key in PLAN_RESULT_KEYS if key in result}
+            fresh[signature] = FieldPlan(plans[signature], plan_dependencies(field, result))
+
+    if cached is None or fresh:
+        with timed("plan.store"):
+            store.put_form_plan(fingerprint, signatures, fresh, revision, FORM_PLAN_MAX_ENTRIES)
+
+    status = "hit" if cached is not None and not resolved else "delta" if resolved < len(signatures) else "miss"
+    form_plan_results.inc(status=status)
+    return {
+        "fingerprint": fingerprint,
+        "status": status,
+        "resolved": resolved,
+        "reused": len(signatures) - resolved,
+        "fields": [
+            {"index": index, "question": field.question, "intent": field.intent, **plans[signature]}
+            for index, (field, signature) in enumerate(zip(payload.fields, signatures))
+        ],
+    }
+
+
+@app.post("/form-plan")
+def handle_form_plan(payload: FormPlanPayload) -> Dict[str, Any]:
+    """
+    Resolve every field of a form at once, cached under the form's structural
+    fingerprint (ordered normalized questions, field types and choices).
+    """
+    return resolve_form_plan(payload)
+
+
+@app.get("/form-plan/stats")
+def form_plan_stats() -> Dict[str, int]:
+    return active_profile().store.form_plan_stats()
+
+
+@app.post("/closed-question")
+def handle_closed_question(payload: ClosedQuestionPayload) -> Dict[str, Any]:
+    return resolve_closed_questions([payload])[0]
+
+
+@app.post("/closed-question/batch")
+def handle_closed_question_batch(payload: ClosedQuestionBatchPayload) -> Dict[str, Any]:
+    """
+    Resolve many closed questions in one round trip. Items are processed in order,
+    so a store earlier in the batch is visible to later lookups.
+    """
+    return {"results": resolve_closed_questions(payload.items)}
+
+
+digest_cache = DigestCache(PROMPT_DIGEST_CACHE_ENTRIES)
+
+
+def job_digest(job_context: Optional[JobContext]) -> Optional[JobDigest]:
+    """The posting's digest, built once per distinct company/role/URL/description."""
+    if job_context is None:
+        return None
+    ctx = job_context
+    if not any((ctx.company, ctx.role, ctx.url, ctx.job_description)):
+        return None
+    key = "job:" + content_hash(ctx.company, ctx.role, ctx.url, ctx.job_description)
+    return digest_cache.get_or_build(
+        key, lambda: JobDigest.build(ctx.company or "", ctx.role or "", ctx.url or "", ctx.job_description or "")
     )
 
-    result = generate_with_gemini(prompt)
+
+def resume_digest(resume_summary: Optional[str]) -> Optional[ResumeDigest]:
+    """A client-supplied summary if given, else the cached resume; built once per content."""
+    if resume_summary and resume_summary.strip():
+        key = "summary:" + content_hash(resume_summary)
+        return digest_cache.get_or_build(key, lambda: ResumeDigest.from_text(resume_summary))
+    loaded = active_profile().resume_cache.get()
+    if not loaded:
+        return None
+    # The full-body ETag is already a hash of the whole resume.
+    return digest_cache.get_or_build("resume:" + loaded.full_etag, lambda: ResumeDigest.from_resume(loaded.resume))
+
+
+def build_prompt_builder(
+    job_context: Optional[JobContext], resume_summary: Optional[str], token_budget: Optional[int]
+) -> PromptBuilder:
+    """The prompt builder for one page: digests are shared by every question drafted for it."""
+    with timed("open.prompt"):
+        return PromptBuilder(
+            token_budget or PROMPT_TOKEN_BUDGET, job_digest(job_context), resume_digest(resume_summary)
+        )
+
+
+def build_question_prompt(builder: PromptBuilder, question: str) -> PromptPlan:
+    with timed("open.prompt"):
+        return builder.build(question)
+
+
+def prompt_summary(builder: PromptBuilder) -> Dict[str, bool]:
+    return {"resume_included": builder.resume_included, "context_included": builder.context_included}
+
+
+def build_open_question_prompt(payload: OpenQuestionPayload) -> Tuple[PromptPlan, PromptBuilder]:
+    builder = build_prompt_builder(payload.job_context, payload.resume_summary, payload.token_budget)
+    return build_question_prompt(builder, payload.question), builder
+
+
+@app.post("/open-question")
+async def handle_open_question(payload: OpenQuestionPayload) -> Dict[str, Any]:
+    """Draft one answer. `prompt_budget` reports the token budget and how the prompt used it."""
+    plan, builder = build_open_question_prompt(payload)
+    result = await generate_with_gemini(plan.prompt)
     return {
         "question": payload.question,
         "draft": result["draft"],
         "source": result["source"],
-        "resume_included": bool(resume_summary),
-        "context_included": bool(context_text),
+        "cached": result["cached"],
+        **prompt_summary(builder),
+        "prompt_budget": plan.usage,
     }
 
 
+def sse_event(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@app.post("/open-question/stream")
+async def handle_open_question_stream(payload: OpenQuestionPayload) -> StreamingResponse:
+    """
+    Server-Sent Events variant of /open-question. Emits `meta`, then `delta`
+    events with partial text as the model produces it (`reset` means discard
+    what was received so far; the next model in the fallback chain follows),
+    and finally `done` with the assembled draft and first-token latency.
+    """
+    plan, builder = build_open_question_prompt(payload)
+    started = time.perf_counter()
+
+    async def events() -> AsyncIterator[str]:
+        first_token_ms: Optional[float] = None
+        yield sse_event("meta", {
+            "question": payload.question,
+            **prompt_summary(builder),
+            "prompt_budget": plan.usage,
+        })
+        async for event, data in gemini_client.stream(plan.prompt):
+            if event == "delta" and first_token_ms is None:
+                first_token_ms = (time.perf_counter() - started) * 1000
+                operation_seconds.observe(first_token_ms / 1000, operation="gemini.stream.first_token")
+            if event == "done":
+                operation_seconds.observe(time.perf_counter() - started, operation="gemini.stream")
+                drafts_total.inc(source=data["source"].split(":", 1)[0], cached=str(data["cached"]).lower())
+                data = {
+                    **data,
+                    "question": payload.question,
+                    "first_token_ms": first_token_ms,
+                    "total_ms": (time.perf_counter() - started) * 1000,
+                }
+            yield sse_event(event, data)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def draft_open_questions(
+    questions: List[str], builder: PromptBuilder, concurrency: int, timeout: float
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Draft every question concurrently (at most `concurrency` at a time, each
+    bounded by `timeout` seconds) and yield results as they complete.
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def draft(index: int, question: str) -> Dict[str, Any]:
+        started = time.perf_counter()
+        plan = build_question_prompt(builder, question)
+        async with semaphore:
+            try:
+                result = await asyncio.wait_for(generate_with_gemini(plan.prompt), timeout)
+            except asyncio.TimeoutError:
+                result = {
+                    "draft": None,
+                    "source": "timeout",
+                    "cached": False,
+                    "error": f"Draft timed out after {timeout:g}s.",
+                }
+        return {
+            "index": index,
+            "question": question,
+            **result,
+            "prompt_budget": plan.usage,
+            "elapsed_ms": (time.perf_counter() - started) * 1000,
+        }
+
+    tasks = [asyncio.ensure_future(draft(index, question)) for index, question in enumerate(questions)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+@app.post("/open-question/batch")
+async def handle_open_question_batch(payload: OpenQuestionBatchPayload) -> Any:
+    """
+    Draft several open-ended questions that share one job context. The job and
+    resume digests are looked up once; each question gets the resume sections
+    most relevant to it within the token budget. Drafts run concurrently. With
+    `stream` the response is NDJSON, one line per draft as it completes, then a
+    final `{"done": true}` line; otherwise all results are returned in input order.
+    """
+    started = time.perf_counter()
+    builder = build_prompt_builder(payload.job_context, payload.resume_summary, payload.token_budget)
+    concurrency = payload.concurrency or OPEN_BATCH_CONCURRENCY
+    timeout = payload.timeout or OPEN_BATCH_ITEM_TIMEOUT_SECONDS
+    drafts = draft_open_questions(payload.questions, builder, concurrency, timeout)
+
+    # The summary is read once every prompt is built: resume_included depends on what they rendered.
+    if payload.stream:
+        async def lines() -> AsyncIterator[str]:
+            async for result in drafts:
+                yield json.dumps(result) + "\n"
+            total_ms = (time.perf_counter() - started) * 1000
+            yield json.dumps({"done": True, "total_ms": total_ms, **prompt_summary(builder)}) + "\n"
+
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+    results = [result async for result in drafts]
+    results.sort(key=lambda result: result["index"])
+    return {"results": results, "total_ms": (time.perf_counter() - started) * 1000, **prompt_summary(builder)}
+
+
 @app.get("/qa-history")
-def qa_history() -> Dict[str, Any]:
-    return load_json(QA_HISTORY_PATH, {})
+def qa_history(request: Request) -> Response:
+    """
+    The whole history as one object. Its ETag follows the store revision, so
+    an unchanged history answers 304; large histories are better read through
+    /qa-history/entries and kept current with /qa-history/changes.
+    """
+    profile = active_profile()
+    etag = f'"qa-history-{profile.profile_id}-{profile.store.revision()}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    body = json.dumps(load_json(QA_HISTORY_PATH, {}))
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def encode_cursor(key: str) -> str:
+    return base64.urlsafe_b64encode(key.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> str:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        return base64.b64decode(padded, altchars=b"-_", validate=True).decode("utf-8")
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor.")
+
+
+@app.get("/qa-history/entries")
+def qa_history_entries(
+    cursor: Optional[str] = None,
+    limit: int = Query(default=100, ge=1),
+    prefix: Optional[str] = None,
+    intent: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    One page of the history ordered by normalized question. `prefix` is
+    normalized like a question; pass `next_cursor` back to get the next page.
+    `version` is the change version before the page was read: a mirror built
+    from these pages stays current by polling /qa-history/changes from it.
+    """
+    store = active_profile().store
+    version = store.version()
+    limit = min(limit, HISTORY_PAGE_MAX)
+    with timed("history.page"):
+        items = store.page_history(
+            limit,
+            after=decode_cursor(cursor) if cursor else None,
+            prefix=normalize_question(prefix) if prefix else None,
+            intent=intent,
+        )
+    next_cursor = encode_cursor(items[-1]["key"]) if len(items) == limit else None
+    return {"items": items, "next_cursor": next_cursor, "version": version}
+
+
+@app.get("/qa-history/changes")
+def qa_history_changes(since: int = Query(default=0, ge=0), limit: int = Query(default=500, ge=1)) -> Dict[str, Any]:
+    """
+    Changes after version `since`, oldest first: QA entries, keyword answers
+    and `deleted` tombstones. Poll again with `next_since` while `has_more`.
+    A `version` below `since` means the store was replaced; resync from 0.
+    """
+    store = active_profile().store
+    version = store.version()
+    limit = min(limit, HISTORY_PAGE_MAX)
+    with timed("history.changes"):
+        changes = store.changes_since(since, limit)
+    return {
+        "changes": changes,
+        "next_since": changes[-1]["version"] if changes else since,
+        "has_more": len(changes) == limit,
+        "version": version,
+    }
+
+
+@app.get("/qa-history/export")
+def qa_history_export() -> StreamingResponse:
+    """
+    Stream every QA entry and keyword answer as NDJSON, after a header line
+    with the change version the export started at. Rows are read in batches;
+    replay /qa-history/changes from that version to catch writes made meanwhile.
+    """
+    store = active_profile().store
+    version = store.version()
+
+    def lines() -> Iterator[str]:
+        yield json.dumps({"kind": "header", "format": 1, "version": version}) + "\n"
+        for record in store.iter_records():
+            yield json.dumps(record) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+class SyncRecord(BaseModel):
+    kind: Literal["qa", "keyword"]
+    key: str = Field(min_length=1)
+    entry: Optional[Dict[str, Any]] = None
+    intent: Optional[str] = None
+    answer: Optional[Any] = None
+    deleted: bool = False
+
+    @model_validator(mode="after")
+    def check_value(self) -> "SyncRecord":
+        if not self.deleted and self.kind == "qa" and self.entry is None:
+            raise ValueError("qa records need an entry")
+        if not self.deleted and self.kind == "keyword" and self.answer is None:
+            raise ValueError("keyword records need an answer")
+        return self
+
+
+@app.post("/qa-history/import")
+async def qa_history_import(request: Request) -> Dict[str, Any]:
+    """
+    Apply an NDJSON stream in the /qa-history/export (or /changes) record
+    format. The body is read incrementally and applied in transactions of
+    HISTORY_IMPORT_BATCH records; header and blank lines are skipped. Re-running
+    an import is harmless because identical records are left untouched. On a bad
+    line, the batches before it stay applied and the error names the line.
+    """
+    store = active_profile().store
+    totals = {"applied": 0, "unchanged": 0}
+    batch: List[Dict[str, Any]] = []
+
+    async def flush() -> None:
+        if batch:
+            with timed("history.import"):
+                counts = await run_in_threadpool(store.apply_records, list(batch))
+            batch.clear()
+            for name, count in counts.items():
+                totals[name] += count
+
+    line_number = 0
+    buffer = b""
+
+    async def handle(line: bytes) -> None:
+        if not line.strip():
+            return
+        try:
+            raw = json.loads(line)
+            if isinstance(raw, dict) and raw.get("kind") == "header":
+                return
+            batch.append(SyncRecord.model_validate(raw).model_dump())
+        except (ValueError, ValidationError) as exc:
+            await flush()
+            raise HTTPException(
+                status_code=400,
+                detail={"line": line_number, "error": str(exc), **totals},
+            )
+        if len(batch) >= HISTORY_IMPORT_BATCH:
+            await flush()
+
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            line_number += 1
+            await handle(line)
+    if buffer:
+        line_number += 1
+        await handle(buffer)
+    await flush()
+    return {**totals, "lines": line_number, "version": store.version()}
+
+
+class CompactPayload(BaseModel):
+    dry_run: bool = False
+    # Minimum token similarity for two wordings with the same answer to be merged.
+    threshold: Optional[float] = Field(default=None, ge=0.3, le=1.0)
+    # Also drop entries not written for this many days (default COMPACT_STALE_DAYS, off when unset).
+    stale_days: Optional[float] = Field(default=None, gt=0)
+    examples: int = Field(default=10, ge=0, le=200)
+
+
+def compact_profile(profile: ProfileState, payload: CompactPayload) -> Dict[str, Any]:
+    report = compact_history(
+        profile.store,
+        threshold=COMPACT_THRESHOLD if payload.threshold is None else payload.threshold,
+        stale_days=payload.stale_days or COMPACT_STALE_DAYS,
+        dry_run=payload.dry_run,
+        examples=payload.examples,
+    )
+    if not payload.dry_run:
+        for outcome in ("merged", "dropped_empty", "dropped_stale"):
+            history_compacted.inc(report[outcome], outcome=outcome)
+    return report
+
+
+@app.post("/qa-history/compact")
+def qa_history_compact(payload: CompactPayload) -> Dict[str, Any]:
+    """
+    Merge near-duplicate questions that share an answer into one entry with
+    aliases, drop empty (and optionally stale) entries, and report how much
+    the history shrank. `dry_run` only reports what would change.
+    """
+    return compact_profile(active_profile(), payload)
+
+
+async def compact_resident_profiles() -> None:
+    """Background compaction: every COMPACT_INTERVAL_SECONDS, compact each resident profile."""
+    while True:
+        await asyncio.sleep(COMPACT_INTERVAL_SECONDS)
+        for profile_id in profiles.stats()["profiles"]:
+            profile = profiles.try_acquire(profile_id)
+            if profile is None:
+                continue
+            try:
+                await run_in_threadpool(compact_profile, profile, CompactPayload(examples=0))
+            except Exception:
+                # A failed run (e.g. the store was busy) is retried on the next tick.
+                history_compaction_failures.inc()
+            finally:
+                profiles.release(profile)
+
+
+compaction_task: Dict[str, asyncio.Task] = {}
+
+
+@app.on_event("startup")
+async def start_compaction() -> None:
+    if COMPACT_INTERVAL_SECONDS > 0:
+        compaction_task["task"] = asyncio.create_task(compact_resident_profiles())
+
+
+@app.on_event("shutdown")
+async def stop_compaction() -> None:
+    task = compaction_task.pop("task", None)
+    if task is not None:
+        task.cancel()
+
+
+@app.get("/profiles/stats")
+def profile_stats() -> Dict[str, Any]:
+    """Resident profile shards (least recently used first) and load/eviction counts."""
+    return profiles.stats()
+
+
+@app.get("/draft-cache/stats")
+def draft_cache_stats() -> Dict[str, Any]:
+    return gemini_client.stats()
+
+
+@app.get("/metrics")
+def metrics() -> Response:
+    """Prometheus text exposition of request and per-operation timings."""
+    return PlainTextResponse(registry.render(), media_type=METRICS_CONTENT_TYPE)
+
+
+class ProfilerToggle(BaseModel):
+    enabled: bool
+    interval_ms: float = Field(default=5.0, ge=1.0, le=1000.0)
+    reset: bool = True
+
+
+def require_profiler_endpoints() -> None:
+    if not PROFILER_ENDPOINTS_ENABLED:
+        raise HTTPException(status_code=404, detail="Not Found")
+
+
+@app.get("/debug/profiler")
+def profiler_report(format: str = "json", limit: int = 50) -> Any:
+    """Sampled stacks so far; `format=collapsed` returns flame-graph input."""
+    require_profiler_endpoints()
+    if format == "collapsed":
+        return PlainTextResponse(profiler.collapsed())
+    return profiler.report(limit)
+
+
+@app.on_event("startup")
+def start_profiler() -> None:
+    if PROFILER_INTERVAL_MS > 0:
+        profiler.start(PROFILER_INTERVAL_MS / 1000)
+
+
+@app.post("/debug/profiler")
+def toggle_profiler(payload: ProfilerToggle) -> Dict[str, Any]:
+    require_profiler_endpoints()
+    if payload.enabled:
+        profiler.start(payload.interval_ms / 1000, reset=payload.reset)
+    else:
+        profiler.stop()
+    return profiler.report(limit=0)
@@ -0,0 +1,210 @@
+import math
+import re
+import threading
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+
+# Common stop words that don't add meaning when comparing questions.
+STOP_WORDS = frozenset({
+    "a", "an", "the", "is", "are", "was", "were", "do", "does", "did",
+    "what", "when", "where", "who", "which", "how", "your", "you", "my",
+    "have", "has", "had", "be", "been", "being", "of", "for", "to", "in",
+    "on", "at", "by", "with", "from", "as", "or", "and",
+})
+
+
+def normalize_question(text: str) -> str:
+    cleaned = re.sub(r"[^a-z0-9 ]", " ", text.lower())
+    return " ".join(cleaned.split())
+
+
+def question_tokens(text: str) -> FrozenSet[str]:
+    """Token set used by the similarity metric (lowercased, stop words removed)."""
+    return frozenset(text.lower().split()) - STOP_WORDS
+
+
+def jaccard(tokens1: FrozenSet[str], tokens2: FrozenSet[str]) -> float:
+    if not tokens1 or not tokens2:
+        return 0.0
+    intersection = len(tokens1 & tokens2)
+    union = len(tokens1) + len(tokens2) - intersection
+    return intersection / union if union > 0 else 0.0
+
+
+def compute_token_similarity(text1: str, text2: str) -> float:
+    """
+    Compute similarity between two texts based on token overlap.
+    Returns a score between 0 and 1.
+    """
+    return jaccard(question_tokens(text1), question_tokens(text2))
+
+
+def find_similar_question(normalized_question: str, history: Dict[str, Any], threshold: float = 0.6) -> Optional[str]:
+    """
+    Find a similar question in the history using token-based similarity matching.
+    Returns the normalized key of the most similar question if similarity exceeds threshold.
+
+    This is the reference linear scan; request handlers use QuestionIndex instead.
+    """
+    best_match = None
+    best_score = 0.0
+
+    for key, entry in history.items():
+        # Compare with the normalized key
+        score = compute_token_similarity(normalized_question, key)
+
+        # Also compare with the original question text if available
+        if "question" in entry:
+            original_score = compute_token_similarity(
+                normalized_question,
+                normalize_question(entry["question"])
+            )
+            score = max(score, original_score)
+
+        if score > best_score and score >= threshold:
+            best_score = score
+            best_match = key
+
+    return best_match
+
+
+class QuestionIndex:
+    """
+    Inverted token index over the QA history.
+
+    Every history entry contributes up to two token sets (its normalized key and
+    its normalized original question), pre-filtered for stop words. Lookups only
+    score entries that share a token with the query, and use the Jaccard size
+    bound plus prefix filtering to skip candidates that cannot reach the
+    threshold. Ties resolve to the earliest inserted key, so results match
+    find_similar_question exactly.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.RLock()
+        self._variants: Dict[str, Tuple[FrozenSet[str], ...]] = {}
+        self._order: Dict[str, int] = {}
+        self._postings: Dict[str, Dict[str, None]] = {}
+        self._next_order = 0
+
+    def __len__(self) -> int:
+        return len(self._variants)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._variants
+
+    @classmethod
+    def from_history(cls, history: Dict[str, Any]) -> "QuestionIndex":
+        index = cls()
+        for key, entry in history.items():
+            index.upsert(key, entry)
+        return index
+
+    @staticmethod
+    def _entry_variants(key: str, entry: Dict[str, Any]) -> Tuple[FrozenSet[str], ...]:
+        variants = [question_tokens(key)]
+        if "question" in entry:
+            original = question_tokens(normalize_question(entry["question"]))
+            if original != variants[0]:
+                variants.append(original)
+        return tuple(tokens for tokens in variants if tokens)
+
+    def upsert(self, key: str, entry: Dict[str, Any]) -> None:
+        with self._lock:
+            self._upsert(key, entry)
+
+    def _upsert(self, key: str, entry: Dict[str, Any]) -> None:
+        if key in self._variants:
+            self._unlink(key)
+        else:
+            # Re-assigning an existing dict key keeps its position, so only new keys advance the order.
+            self._order[key] = self._next_order
+            self._next_order += 1
+        variants = self._entry_variants(key, entry)
+        self._variants[key] = variants
+        for tokens in variants:
+            for token in tokens:
+                self._postings.setdefault(token, {})[key] = None
+
+    def remove(self, key: str) -> None:
+        with self._lock:
+            self._remove(key)
+
+    def _remove(self, key: str) -> None:
+        if key not in self._variants:
+            return
+        self._unlink(key)
+        del self._variants[key]
+        del self._order[key]
+
+    def _unlink(self, key: str) -> None:
+        for tokens in self._variants[key]:
+            for token in tokens:
+                posting = self._postings.get(token)
+                if posting is None:
+                    continue
+                posting.pop(key, None)
+                if not posting:
+                    del self._postings[token]
+
+    def find_similar(self, normalized_question: str, threshold: float = 0.6) -> Optional[str]:
+        match = self.best_match(normalized_question, threshold)
+        return match[0] if match else None
+
+    def best_match(self, normalized_question: str, threshold: float = 0.6) -> Optional[Tuple[str, float]]:
+        with self._lock:
+            return self._best_match(normalized_question, threshold)
+
+    def _best_match(self, normalized_question: str, threshold: float) -> Optional[Tuple[str, float]]:
+        matches = self._scored(normalized_question, threshold)
+        if not matches:
+            return None
+        return min(matches, key=lambda match: (-match[1], self._order[match[0]]))
+
+    def top_k(self, normalized_question: str, k: int = 5, threshold: float = 0.0) -> List[Tuple[str, float]]:
+        """Best `k` (key, score) pairs scoring at least `threshold`, highest first."""
+        with self._lock:
+            matches = self._scored(normalized_question, threshold)
+            matches.sort(key=lambda match: (-match[1], self._order[match[0]]))
+            return matches[: max(k, 0)]
+
+    def _scored(self, normalized_question: str, threshold: float) -> List[Tuple[str, float]]:
+        query = question_tokens(normalized_question)
+        if not query:
+            return []
+        size = len(query)
+
+        # Any entry with Jaccard >= threshold shares at least ceil(threshold * |q|) tokens with
+        # the query, so it must contain one of the |q| - that + 1 rarest query tokens.
+        min_overlap = max(1, math.ceil(threshold * size - 1e-9))
+        if min_overlap > size:
+            return []
+        ranked = sorted(query, key=lambda token: len(self._postings.get(token, ())))
+        prefix = ranked[: size - min_overlap + 1]
+
+        # Candidate sizes outside [threshold * |q|, |q| / threshold] cannot reach the threshold.
+        min_size = threshold * size - 1e-9
+        max_size = size / threshold + 1e-9 if threshold > 0 else math.inf
+
+        matches: List[Tuple[str, float]] = []
+        seen: Dict[str, None] = {}
+        for token in prefix:
+            for key in self._postings.get(token, ()):
+                if key in seen:
+                    continue
+                seen[key] = None
+                score = 0.0
+                for tokens in self._variants[key]:
+                    if not min_size <= len(tokens) <= max_size:
+                        continue
+                    score = max(score, jaccard(query, tokens))
+                if score < threshold or score <= 0.0:
+                    continue
+                matches.append((key, score))
+        return matches
+
+    def candidates(self, normalized_question: str) -> List[str]:
+        """Keys sharing at least one token with the query, in insertion order."""
+        query = question_tokens(normalized_question)
+        with self._lock:
+            keys = {key for token in query for key in self._postings.get(token, ())}
+            return sorted(keys, key=self._order.__getitem__)
@@ -0,0 +1,357 @@
+"""
+Request-level timing: Prometheus-format counters and histograms for /metrics,
+per-request ``Server-Timing`` headers and an optional sampling profiler.
+
+Wrap any step in ``timed("name")``. The duration is observed in the
+``backend_operation_seconds`` histogram and, when the call happens inside a
+request, added to that request's Server-Timing header.
+"""
+
+import bisect
+import contextvars
+import math
+import sys
+import threading
+import time
+from collections import Counter as TallyCounter
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return self.header() + [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in values
+        ]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: non-cumulative bucket counts (last slot is +Inf), sum, count.
+        self._series: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        slot = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = ([0] * (len(self.buckets) + 1), [0.0])
+            series[0][slot] += 1
+            series[1][0] += value
+
+    def render(self) -> List[str]:
+        with self._lock:
+            series = sorted((key, (list(counts), total[0])) for key, (counts, total) in self._series.items())
+        lines = self.header()
+        for key, (counts, total) in series:
+            cumulative = 0
+            for bound, count in zip((*self.buckets, math.inf), counts):
+                cumulative += count
+                le = _format_labels(self.labelnames, key, f'le="{_format_value(bound)}"')
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Gauge(_Metric):
+    """A value read at scrape time from ``callback`` (returns {label values: value})."""
+
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        callback: Callable[[], Dict[LabelValues, float]],
+        labelnames: Sequence[str] = (),
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.callback = callback
+
+    def render(self) -> List[str]:
+        try:
+            values = self.callback()
+        except Exception:  # pragma: no cover - a broken gauge must not break /metrics
+            values = {}
+        return self.header() + [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in sorted(values.items())
+        ]
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> Any:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+registry = Registry()
+operation_seconds: Histogram = registry.register(
+    Histogram("backend_operation_seconds", "Time spent in instrumented backend operations.", ["operation"])
+)
+request_seconds: Histogram = registry.register(
+    Histogram("backend_http_request_seconds", "HTTP request latency by route.", ["method", "route", "status"])
+)
+requests_in_progress = {"value": 0}
+registry.register(
+    Gauge(
+        "backend_http_requests_in_progress",
+        "HTTP requests currently being served.",
+        lambda: {(): requests_in_progress["value"]},
+    )
+)
+
+
+class RequestTimings:
+    """Durations recorded while serving one request, summed per operation name."""
+
+    def __init__(self) -> None:
+        self.started = time.perf_counter()
+        self.durations: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def add(self, name: str, seconds: float) -> None:
+        with self._lock:
+            self.durations[name] = self.durations.get(name, 0.0) + seconds
+
+    def server_timing(self) -> str:
+        with self._lock:
+            items = list(self.durations.items())
+        entries = [f"{_metric_token(name)};dur={seconds * 1000:.2f}" for name, seconds in items]
+        entries.append(f"total;dur={(time.perf_counter() - self.started) * 1000:.2f}")
+        return ", ".join(entries)
+
+
+def _metric_token(name: str) -> str:
+    # Server-Timing metric names are HTTP tokens: no spaces or separators like "/" or ":".
+    return "".join(char if char.isalnum() or char in "-_." else "_" for char in name)
+
+
+current_timings: "contextvars.ContextVar[Optional[RequestTimings]]" = contextvars.ContextVar(
+    "current_timings", default=None
+)
+
+
+@contextmanager
+def timed(name: str, into: Optional[Dict[str, float]] = None) -> Iterator[None]:
+    """
+    Time the block as operation ``name``. Milliseconds are also added to
+    ``into`` when given, e.g. to report per-item timings in a batch response.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        operation_seconds.observe(elapsed, operation=name)
+        timings = current_timings.get()
+        if timings is not None:
+            timings.add(name, elapsed)
+        if into is not None:
+            into[name] = round(into.get(name, 0.0) + elapsed * 1000, 3)
+
+
+class ServerTimingMiddleware:
+    """
+    ASGI middleware that opens a RequestTimings for every HTTP request, sends
+    it as a ``Server-Timing`` header and records the request latency. For
+    streamed responses the header covers the work done before the first byte.
+    """
+
+    def __init__(self, app: Any) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings()
+        token = current_timings.set(timings)
+        status = {"code": 500}
+
+        async def send_with_timing(message: Dict[str, Any]) -> None:
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", timings.server_timing().encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        requests_in_progress["value"] += 1
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            requests_in_progress["value"] -= 1
+            current_timings.reset(token)
+            route = scope.get("route")
+            request_seconds.observe(
+                time.perf_counter() - timings.started,
+                method=scope.get("method", ""),
+                # The route template keeps label cardinality bounded; unmatched paths share one label.
+                route=getattr(route, "path", "unmatched"),
+                status=str(status["code"]),
+            )
+
+
+class SamplingProfiler:
+    """
+    Samples every thread's Python stack at a fixed interval and counts
+    collapsed stacks (``outer;inner;leaf``), the input format of flame graph tools.
+    """
+
+    def __init__(self) -> None:
+        self.interval = 0.005
+        self.samples = 0
+        self.started_at: Optional[float] = None
+        self._stacks: "TallyCounter[str]" = TallyCounter()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        # _control serializes start/stop; _lock guards the tallies the sampler thread writes.
+        self._control = threading.Lock()
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, interval: float = 0.005, reset: bool = True) -> None:
+        with self._control:
+            self._stop_thread()
+            if reset:
+                with self._lock:
+                    self._stacks.clear()
+                    self.samples = 0
+            self.interval = max(interval, 0.001)
+            self.started_at = time.time()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        with self._control:
+            self._stop_thread()
+
+    def _stop_thread(self) -> None:
+        thread, self._thread = self._thread, None
+        if thread is not None:
+            self._stop.set()
+            thread.join()
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            sampled = []
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_filename.rsplit('/', 1)[-1]}:{code.co_name}")
+                    frame = frame.f_back
+                sampled.append(";".join(reversed(stack)))
+            with self._lock:
+                self._stacks.update(sampled)
+                self.samples += 1
+
+    def _snapshot(self) -> "Tuple[int, TallyCounter[str]]":
+        # Readers run on request threads while the sampler writes; they work on a copy.
+        with self._lock:
+            return self.samples, self._stacks.copy()
+
+    def report(self, limit: int = 50) -> Dict[str, Any]:
+        samples, stacks = self._snapshot()
+        return {
+            "running": self.running,
+            "interval_ms": self.interval * 1000,
+            "samples": samples,
+            "started_at": self.started_at,
+            "top_stacks": [
+                {"stack": stack, "count": count} for stack, count in stacks.most_common(limit)
+            ],
+        }
+
+    def collapsed(self) -> str:
+        _samples, stacks = self._snapshot()
+        return "\n".join(f"{stack} {count}" for stack, count in stacks.most_common()) + "\n"
+
+
+profiler = SamplingProfiler()
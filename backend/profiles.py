@@ -0,0 +1,318 @@
+"""
+Profile-scoped state for shared deployments.
+
+Each profile (one person's answers and resume) is a shard with its own SQLite
+store, resume cache and similarity index. Shards are loaded on first use and
+kept in a bounded LRU; the default profile keeps the original single-user
+paths and is always resident. Writes go straight to the shard's store, so
+evicting a shard only checkpoints its WAL and closes its connections.
+"""
+
+import contextvars
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+
+from .metrics import timed
+from .resume_parsing import ResumeCache
+from .store import AnswerStore, StoreTransaction
+
+DEFAULT_PROFILE = "default"
+PROFILE_HEADER = "x-profile"
+PROFILE_ID_PATTERN = re.compile(r"[A-Za-z0-9][A-Za-z0-9_-]{0,63}")
+# Changes read per query when catching the similarity index up with the store.
+INDEX_REFRESH_BATCH = 1000
+
+
+def valid_profile_id(profile_id: str) -> bool:
+    # Profile ids become directory names, so nothing that could escape PROFILES_DIR.
+    return bool(PROFILE_ID_PATTERN.fullmatch(profile_id))
+
+
+class ProfileState:
+    """One profile's store, resume cache and lazily built similarity index."""
+
+    def __init__(
+        self,
+        profile_id: str,
+        store: AnswerStore,
+        resume_cache: ResumeCache,
+        local_resume_path: Path,
+        build_index: Callable[[Dict[str, Any]], Any],
+    ) -> None:
+        self.profile_id = profile_id
+        self.store = store
+        self.resume_cache = resume_cache
+        self.local_resume_path = local_resume_path
+        self.build_index = build_index
+        self.loaded_at = time.time()
+        # Requests currently holding this state, and whether the LRU already let go of it.
+        self.active = 0
+        self.evicted = False
+        self._index: Any = None
+        self._index_revision: Optional[int] = None
+        self._index_version = 0
+        self._index_lock = threading.Lock()
+
+    def question_index(self) -> Any:
+        """
+        The in-memory similarity index for this profile's history (aliases
+        included). Built once; after that, writes made without us (another
+        worker, an import, a compaction) are applied from the change feed
+        instead of rebuilding the whole index.
+        """
+        revision = self.store.revision()
+        with self._index_lock:
+            if self._index is None:
+                # Read the version first: changes racing the load are applied again later, which is harmless.
+                version = self.store.version()
+                with timed("similarity.build"):
+                    self._index = self.build_index(self.store.load_lookup_entries())
+                self._index_version = version
+            elif revision != self._index_revision:
+                with timed("similarity.refresh"):
+                    self._apply_changes()
+            self._index_revision = revision
+            return self._index
+
+    def _apply_changes(self) -> None:
+        while True:
+            changes = self.store.changes_since(self._index_version, INDEX_REFRESH_BATCH)
+            removed: List[str] = []
+            aliases: Dict[str, str] = {}
+            for change in changes:
+                if change["kind"] != "qa":
+                    continue
+                if change.get("deleted"):
+                    self._index.remove(change["key"])
+                    removed.append(change["key"])
+                    continue
+                self._index.upsert(change["key"], change["entry"])
+                aliases.update(_alias_questions(change["key"], change["entry"]))
+            # A removed key may still be an alias of another entry, so it keeps matching as one.
+            for key, (canonical, entry) in self.store.resolve_entries(removed).items():
+                if key != canonical:
+                    aliases.setdefault(key, _alias_questions(canonical, entry).get(key, key))
+            # Stored entries answer for themselves; only the other aliases are indexed as questions.
+            stored = self.store.get_entries(list(aliases))
+            for key, question in aliases.items():
+                if key not in stored:
+                    self._index.upsert(key, {"question": question})
+            if changes:
+                self._index_version = changes[-1]["version"]
+            if len(changes) < INDEX_REFRESH_BATCH:
+                return
+
+    def sync_index(self, txn: StoreTransaction) -> None:
+        """Record a committed write transaction whose changes were already applied to the index."""
+        with self._index_lock:
+            if self._index_revision == txn.base_revision:
+                self._index_revision = txn.revision
+                if txn.version is not None:
+                    self._index_version = max(self._index_version, txn.version)
+
+    def reset_index(self) -> None:
+        with self._index_lock:
+            self._index = None
+
+    @property
+    def index_size(self) -> int:
+        index = self._index
+        return len(index) if index is not None else 0
+
+    def close(self) -> None:
+        try:
+            self.store.checkpoint()
+        finally:
+            self.store.close()
+            self.reset_index()
+            self.resume_cache.invalidate()
+
+
+def _alias_questions(key: str, entry: Dict[str, Any]) -> Dict[str, str]:
+    """Alias key -> question for the wordings compaction merged into ``entry``."""
+    aliases = entry.get("aliases")
+    if not isinstance(aliases, list):
+        return {}
+    return {
+        alias["key"]: alias.get("question") or alias["key"]
+        for alias in aliases
+        if isinstance(alias, dict) and isinstance(alias.get("key"), str) and alias["key"] != key
+    }
+
+
+class ProfileRegistry:
+    """
+    Resident profiles in least-recently-used order, at most ``max_resident``
+    besides the default. An evicted profile still serving requests is closed
+    when its last request releases it.
+    """
+
+    def __init__(self, load: Callable[[str], ProfileState], max_resident: int = 64) -> None:
+        self.load = load
+        self.max_resident = max(1, max_resident)
+        self.default = load(DEFAULT_PROFILE)
+        self.loads = 0
+        self.evictions = 0
+        self._resident: "OrderedDict[str, ProfileState]" = OrderedDict()
+        self._loading: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def try_acquire(self, profile_id: str) -> Optional[ProfileState]:
+        """The profile's state if it is resident (no I/O), marked in use; else None."""
+        with self._lock:
+            if profile_id == DEFAULT_PROFILE:
+                state = self.default
+            else:
+                state = self._resident.get(profile_id)
+                if state is None:
+                    return None
+                self._resident.move_to_end(profile_id)
+            state.active += 1
+            return state
+
+    def acquire(self, profile_id: str) -> ProfileState:
+        """The profile's state, loading it if needed; pair with release()."""
+        state = self.try_acquire(profile_id)
+        if state is not None:
+            return state
+        with self._lock:
+            loading = self._loading.setdefault(profile_id, threading.Lock())
+        # One thread loads a profile; others asking for it at the same time wait for that load.
+        with loading:
+            state = self.try_acquire(profile_id)
+            if state is not None:
+                return state
+            with timed("profile.load"):
+                state = self.load(profile_id)
+            with self._lock:
+                self._loading.pop(profile_id, None)
+                self._resident[profile_id] = state
+                self.loads += 1
+                state.active += 1
+                evicted = self._evict()
+        for idle in evicted:
+            idle.close()
+        return state
+
+    def release(self, state: ProfileState) -> None:
+        with self._lock:
+            state.active -= 1
+            close = state.evicted and state.active == 0
+        if close:
+            state.close()
+
+    def _evict(self) -> List[ProfileState]:
+        """Drop least recently used profiles over the limit; returns those already idle."""
+        idle = []
+        while len(self._resident) > self.max_resident:
+            _profile_id, state = self._resident.popitem(last=False)
+            state.evicted = True
+            self.evictions += 1
+            if state.active == 0:
+                idle.append(state)
+        return idle
+
+    def resident(self) -> List[ProfileState]:
+        with self._lock:
+            return [self.default, *self._resident.values()]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "resident": len(self._resident) + 1,
+                "max_resident": self.max_resident,
+                "loads": self.loads,
+                "evictions": self.evictions,
+                "profiles": [DEFAULT_PROFILE, *self._resident],
+            }
+
+    def close_all(self) -> None:
+        with self._lock:
+            states = [self.default, *self._resident.values()]
+            self._resident.clear()
+        for state in states:
+            state.close()
+
+
+current_profile: "contextvars.ContextVar[Optional[ProfileState]]" = contextvars.ContextVar(
+    "current_profile", default=None
+)
+
+
+def load_profile_tokens(path: Optional[str]) -> Optional[Dict[str, str]]:
+    """Bearer token -> profile id, from a JSON object file; None when not configured."""
+    if not path:
+        return None
+    tokens = json.loads(Path(path).read_text(encoding="utf-8"))
+    invalid = [profile_id for profile_id in tokens.values() if not valid_profile_id(profile_id)]
+    if invalid:
+        raise ValueError(f"Invalid profile ids in {path}: {', '.join(invalid)}")
+    return tokens
+
+
+class ProfileMiddleware:
+    """
+    ASGI middleware that picks the request's profile and holds it in
+    ``current_profile`` until the response is finished. The profile comes from
+    the ``X-Profile`` header (default profile when absent) and must pass
+    ``is_known``, so a made-up id never creates a shard on disk; when ``tokens``
+    is set it comes from the bearer token instead and the header is ignored.
+    Public paths skip all of this and run outside any profile.
+    """
+
+    def __init__(
+        self,
+        app: Any,
+        registry: ProfileRegistry,
+        tokens: Optional[Dict[str, str]] = None,
+        public_paths: Tuple[str, ...] = ("/health", "/metrics"),
+        is_known: Optional[Callable[[str], bool]] = None,
+    ) -> None:
+        self.app = app
+        self.registry = registry
+        self.tokens = tokens
+        self.public_paths = public_paths
+        self.is_known = is_known
+
+    def resolve(self, scope: Dict[str, Any]) -> Tuple[Optional[str], Optional[Tuple[int, str]]]:
+        """Return (profile id, None) or (None, (status, error detail))."""
+        headers = Headers(scope=scope)
+        if self.tokens is not None:
+            scheme, _, token = headers.get("authorization", "").partition(" ")
+            profile_id = self.tokens.get(token.strip()) if scheme.lower() == "bearer" else None
+            if profile_id:
+                return profile_id, None
+            return None, (401, "Missing or unknown profile token.")
+        profile_id = headers.get(PROFILE_HEADER, "").strip() or DEFAULT_PROFILE
+        if not valid_profile_id(profile_id):
+            return None, (400, "Invalid profile id: use 1-64 letters, digits, '-' or '_'.")
+        if profile_id != DEFAULT_PROFILE and self.is_known is not None and not self.is_known(profile_id):
+            return None, (404, f"Unknown profile '{profile_id}'.")
+        return profile_id, None
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] != "http" or scope.get("path") in self.public_paths:
+            await self.app(scope, receive, send)
+            return
+        profile_id, error = self.resolve(scope)
+        if error is not None:
+            status, detail = error
+            await JSONResponse({"detail": detail}, status_code=status)(scope, receive, send)
+            return
+        # Loading a shard opens (and may migrate) its database, so it runs off the event loop.
+        state = self.registry.try_acquire(profile_id) or await run_in_threadpool(self.registry.acquire, profile_id)
+        token = current_profile.set(state)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_profile.reset(token)
+            self.registry.release(state)
@@ -0,0 +1,366 @@
+"""
+Prompt assembly under a token budget.
+
+The job posting and the resume are each reduced once to a digest (scored
+sentences and sections), cached by content hash. Each prompt then picks
+what fits: the most informative lines of the posting, and the resume sections
+most relevant to the question. Tokens are estimated at four characters each.
+"""
+
+import hashlib
+import math
+import re
+import threading
+from collections import Counter, OrderedDict
+from typing import Any, Callable, Dict, FrozenSet, List, NamedTuple, Optional, Tuple
+
+from .matching import STOP_WORDS
+
+CHARS_PER_TOKEN = 4
+# Sections are split into chunks of about this many tokens so ranking can pick the relevant part.
+SECTION_CHUNK_TOKENS = 120
+# A truncated section shorter than this is dropped rather than included.
+MIN_SECTION_TOKENS = 24
+
+INSTRUCTIONS = "You are drafting a concise application response.\n"
+ANSWER_INSTRUCTIONS = "\n\nReturn a short, specific answer (3-6 sentences)."
+
+RESUME_HEADINGS = frozenset({
+    "summary", "profile", "objective", "about", "about me", "experience", "work experience",
+    "professional experience", "employment", "employment history", "relevant experience", "education",
+    "skills", "technical skills", "core competencies", "projects", "selected projects", "certifications",
+    "awards", "honors", "publications", "leadership", "activities", "volunteer", "volunteering", "interests",
+})
+# Used to order sections when a question shares no terms with any of them.
+SECTION_PRIORITY = ("summary", "profile", "experience", "project", "skill", "education")
+
+BOILERPLATE = re.compile(
+    r"equal (employment )?opportunity|\beeo\b|affirmative action|reasonable accommodation|"
+    r"without regard to|privacy (policy|notice)|cookie|e-verify|background check|401\(?k\)?|"
+    r"paid time off|\bpto\b|dental|vision insurance|health insurance|apply now|click here",
+    re.IGNORECASE,
+)
+REQUIREMENT_HINTS = re.compile(
+    r"\b(requir|qualif|experience|responsib|you will|you'll|must|proficien|skill|knowledge|familiar|"
+    r"degree|years|build|design|develop|lead|own|mission|team)",
+    re.IGNORECASE,
+)
+TERM_PATTERN = re.compile(r"[a-z0-9][a-z0-9+#]*")
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def truncate_to_tokens(text: str, tokens: int) -> str:
+    """Cut ``text`` to about ``tokens`` tokens at a word boundary."""
+    limit = tokens * CHARS_PER_TOKEN
+    if len(text) <= limit:
+        return text
+    cut = text[: max(limit - 1, 0)]
+    if " " in cut:
+        cut = cut[: cut.rindex(" ")]
+    return cut.rstrip(" ,;:-") + "…"
+
+
+def terms(text: str) -> List[str]:
+    """Lowercased content words with a light plural strip, for relevance scoring."""
+    words = TERM_PATTERN.findall(text.lower())
+    return [word[:-1] if len(word) > 3 and word.endswith("s") and not word.endswith("ss") else word
+            for word in words if word not in STOP_WORDS and len(word) > 1]
+
+
+def content_hash(*parts: Optional[str]) -> str:
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update((part or "").encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class Section(NamedTuple):
+    name: str
+    text: str
+    tokens: int
+    term_counts: Dict[str, int]
+    order: int
+
+
+class JobDigest:
+    """A posting reduced to its header and its scored sentences (boilerplate dropped)."""
+
+    def __init__(self, header: str, sentences: List[Tuple[float, int, str]], keywords: FrozenSet[str]) -> None:
+        self.header = header
+        # (score, position, text); rendering keeps the best that fit, in posting order.
+        self.sentences = sentences
+        self.keywords = keywords
+
+    @classmethod
+    def build(cls, company: str, role: str, url: str, description: str) -> "JobDigest":
+        header_bits = [f"Company: {company}" if company else "", f"Role: {role}" if role else ""]
+        header_bits.append(f"Posting: {url}" if url else "")
+        header = "\n".join(bit for bit in header_bits if bit)
+
+        pieces = [
+            " ".join(piece.split()).lstrip("-*•· ")
+            for line in description.splitlines()
+            for piece in re.split(r"(?<=[.!?])\s+(?=[A-Z])", line)
+        ]
+        seen = set()
+        candidates = []
+        for piece in pieces:
+            # Templated lines that differ only in numbers count as duplicates.
+            key = re.sub(r"\d+", "#", piece.lower())
+            if len(piece) < 12 or key in seen or BOILERPLATE.search(piece):
+                continue
+            seen.add(key)
+            candidates.append(piece)
+
+        piece_terms = [set(terms(piece)) for piece in candidates]
+        frequencies = Counter(term for found in piece_terms for term in found)
+        total = len(candidates) or 1
+        idf = {term: math.log(1 + total / count) for term, count in frequencies.items()}
+        sentences = []
+        requirement_terms: Counter = Counter()
+        for position, (piece, found) in enumerate(zip(candidates, piece_terms)):
+            # Rare terms carry the information; lines repeated in spirit across the posting score low.
+            score = sum(idf[term] for term in found) / math.sqrt(len(found) + 1) / math.log(1 + total)
+            if REQUIREMENT_HINTS.search(piece):
+                score += 1.0
+                requirement_terms.update(found)
+            sentences.append((score, position, piece))
+        # What the role asks for, used to favour matching resume sections.
+        keywords = frozenset(term for term, _count in requirement_terms.most_common(40))
+        return cls(header, sentences, keywords)
+
+    def render(self, max_tokens: int) -> Tuple[str, bool]:
+        """The header plus the best sentences within ``max_tokens``; also whether anything was left out."""
+        used = estimate_tokens(self.header)
+        chosen = []
+        for score, position, text in sorted(self.sentences, key=lambda item: (-item[0], item[1])):
+            cost = estimate_tokens(text) + 1
+            if used + cost <= max_tokens:
+                chosen.append((position, text))
+                used += cost
+        lines = [self.header] if self.header else []
+        if chosen:
+            lines.append("Job description highlights:")
+            lines.extend(f"- {text}" for _position, text in sorted(chosen))
+        return "\n".join(lines), len(chosen) < len(self.sentences)
+
+
+class ResumeDigest:
+    """A resume split into sections (chunked to SECTION_CHUNK_TOKENS) with term statistics for ranking."""
+
+    def __init__(self, header: str, sections: List[Section]) -> None:
+        self.header = header
+        self.sections = sections
+        document_frequency = Counter(term for section in sections for term in section.term_counts)
+        total = len(sections) or 1
+        self.idf = {term: math.log(1 + total / count) for term, count in document_frequency.items()}
+
+    @classmethod
+    def from_resume(cls, resume: Dict[str, Any]) -> "ResumeDigest":
+        raw_text = resume.get("raw_text") or ""
+        named: List[Tuple[str, List[str]]] = []
+        if raw_text.strip():
+            named = _split_sections(raw_text, skip_first=bool(resume.get("full_name")))
+        if not named:
+            for key in ("experience", "skills", "education"):
+                if resume.get(key):
+                    named.append((key.title(), list(resume[key])))
+        if not named and resume.get("summary"):
+            named.append(("Summary", [resume["summary"]]))
+        return cls(resume.get("full_name") or "", _chunk_sections(named))
+
+    @classmethod
+    def from_text(cls, text: str) -> "ResumeDigest":
+        """A client-supplied summary: one section, chunked like any other."""
+        sentences = [piece.strip() for piece in re.split(r"\n+|(?<=[.!?])\s+", text) if piece.strip()]
+        return cls("", _chunk_sections([("Summary", sentences)]))
+
+    def rank(self, question: str, job_keywords: FrozenSet[str] = frozenset()) -> List[Section]:
+        """Sections by relevance: idf-weighted question-term matches, then overlap with the posting."""
+        question_terms = set(terms(question))
+
+        def score(section: Section) -> Tuple[float, int, int]:
+            relevance = sum(
+                self.idf.get(term, 0.0) * (1 + math.log(section.term_counts[term]))
+                for term in question_terms if term in section.term_counts
+            ) / math.sqrt(section.tokens + 1) * 10
+            relevance += 0.3 * len(job_keywords.intersection(section.term_counts)) / math.sqrt(section.tokens + 1)
+            return (-relevance, _priority(section.name), section.order)
+
+        return sorted(self.sections, key=score)
+
+    def render(
+        self, question: str, max_tokens: int, job_keywords: FrozenSet[str] = frozenset()
+    ) -> Tuple[str, List[str], bool]:
+        """Ranked sections within ``max_tokens``; returns (text, section names used, truncated)."""
+        lines = [f"Candidate: {self.header}"] if self.header else []
+        used = sum(estimate_tokens(line) + 1 for line in lines)
+        names: List[str] = []
+        truncated = False
+        for section in self.rank(question, job_keywords):
+            line = f"[{section.name}] {section.text}"
+            cost = estimate_tokens(line) + 1
+            if used + cost > max_tokens:
+                truncated = True
+                room = max_tokens - used - 1
+                if room >= MIN_SECTION_TOKENS:
+                    lines.append(truncate_to_tokens(line, room))
+                    names.append(section.name)
+                break
+            lines.append(line)
+            names.append(section.name)
+            used += cost
+        return "\n".join(lines), names, truncated
+
+
+def _priority(name: str) -> int:
+    lowered = name.lower()
+    for rank, hint in enumerate(SECTION_PRIORITY):
+        if hint in lowered:
+            return rank
+    return len(SECTION_PRIORITY)
+
+
+def _is_heading(line: str) -> bool:
+    stripped = line.strip().rstrip(":").strip()
+    if not stripped or len(stripped) > 40:
+        return False
+    if stripped.lower() in RESUME_HEADINGS:
+        return True
+    return stripped.isupper() and len(stripped.split()) <= 4 and any(char.isalpha() for char in stripped)
+
+
+def _split_sections(raw_text: str, skip_first: bool) -> List[Tuple[str, List[str]]]:
+    lines = [" ".join(line.split()) for line in raw_text.splitlines() if line.strip()]
+    if skip_first and lines:
+        lines = lines[1:]  # the name, reported separately
+    sections: List[Tuple[str, List[str]]] = []
+    current: Tuple[str, List[str]] = ("Profile", [])
+    for line in lines:
+        if _is_heading(line):
+            if current[1]:
+                sections.append(current)
+            current = (line.rstrip(":").strip().title(), [])
+        else:
+            current[1].append(line)
+    if current[1]:
+        sections.append(current)
+    return sections
+
+
+def _chunk_sections(named: List[Tuple[str, List[str]]]) -> List[Section]:
+    sections: List[Section] = []
+    for name, lines in named:
+        chunks: List[List[str]] = [[]]
+        size = 0
+        for line in lines:
+            cost = estimate_tokens(line) + 1
+            if chunks[-1] and size + cost > SECTION_CHUNK_TOKENS:
+                chunks.append([])
+                size = 0
+            chunks[-1].append(line)
+            size += cost
+        for part, chunk in enumerate(chunk for chunk in chunks if chunk):
+            text = "; ".join(chunk)
+            label = name if part == 0 else f"{name} ({part + 1})"
+            counts = Counter(terms(text))
+            counts.update(terms(name))
+            sections.append(Section(label, text, estimate_tokens(text), counts, len(sections)))
+    return sections
+
+
+class DigestCache:
+    """Small thread-safe LRU of digests keyed by content hash."""
+
+    def __init__(self, max_entries: int = 128) -> None:
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_build(self, key: str, build: Callable[[], Any]) -> Any:
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+        value = build()
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._entries)}
+
+
+class PromptPlan(NamedTuple):
+    prompt: str
+    usage: Dict[str, Any]
+
+
+class PromptBuilder:
+    """
+    Builds prompts for one page: the shared prefix (instructions and job
+    digest) once, then per question the resume sections that fit the rest of
+    ``budget``. The job digest gets at most ``job_share`` of the budget so the
+    prefix does not depend on the question.
+    """
+
+    def __init__(
+        self,
+        budget: int,
+        job: Optional[JobDigest],
+        resume: Optional[ResumeDigest],
+        job_share: float = 0.35,
+    ) -> None:
+        self.budget = budget
+        self.job = job
+        self.resume = resume
+        self.job_truncated = False
+        self.sections_rendered = False
+        context = ""
+        if job is not None:
+            context, self.job_truncated = job.render(int(budget * job_share))
+        self.prefix = INSTRUCTIONS + (f"Context:\n{context}\n" if context else "")
+        self.parts = {"instructions": estimate_tokens(INSTRUCTIONS), "job": estimate_tokens(context)}
+
+    @property
+    def context_included(self) -> bool:
+        return self.parts["job"] > 0
+
+    @property
+    def resume_included(self) -> bool:
+        """Whether a prompt built so far carried at least one resume section."""
+        return self.sections_rendered
+
+    def build(self, question: str) -> PromptPlan:
+        suffix = f"\nQuestion: {question}{ANSWER_INSTRUCTIONS}"
+        question_tokens = estimate_tokens(suffix)
+        resume_text, sections, resume_truncated = "", [], False
+        if self.resume is not None:
+            room = self.budget - estimate_tokens(self.prefix) - question_tokens
+            keywords = self.job.keywords if self.job is not None else frozenset()
+            resume_text, sections, resume_truncated = self.resume.render(question, room, keywords)
+        self.sections_rendered = self.sections_rendered or bool(sections)
+        body = f"Relevant resume excerpts:\n{resume_text}\n" if resume_text else "Candidate summary: [not provided]\n"
+        prompt = self.prefix + body + suffix
+        used = estimate_tokens(prompt)
+        return PromptPlan(prompt, {
+            "budget": self.budget,
+            "used": used,
+            "parts": {**self.parts, "resume": estimate_tokens(body), "question": question_tokens},
+            "resume_sections": sections,
+            "resume_included": bool(sections),
+            "truncated": [name for name, flag in (("job", self.job_truncated), ("resume", resume_truncated)) if flag],
+            "over_budget": used > self.budget,
+        })
@@ -0,0 +1,299 @@
+import asyncio
+import hashlib
+import json
+import multiprocessing
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from PyPDF2 import PdfReader
+
+
+def extract_text_from_pdf(file_bytes: bytes) -> str:
+    return "\n".join(extract_pdf_pages(file_bytes))
+
+
+def extract_pdf_head(file_bytes: bytes, stop: int) -> Tuple[int, List[str]]:
+    """Return the page count and the text of the first ``stop`` pages in one pass."""
+    pdf = PdfReader(BytesIO(file_bytes))
+    return len(pdf.pages), extract_reader_pages(pdf, 0, stop)
+
+
+def extract_pdf_pages(file_bytes: bytes, start: int = 0, stop: Optional[int] = None) -> List[str]:
+    return extract_reader_pages(PdfReader(BytesIO(file_bytes)), start, stop)
+
+
+def extract_reader_pages(pdf: PdfReader, start: int, stop: Optional[int]) -> List[str]:
+    pages = []
+    for page in pdf.pages[start:stop]:
+        try:
+            pages.append(page.extract_text() or "")
+        except Exception:
+            continue
+    return pages
+
+
+class PdfExtractionError(RuntimeError):
+    """Extraction failed for a reason other than the document itself, e.g. a crashed worker."""
+
+
+class PdfExtractor:
+    """
+    Runs PyPDF2 text extraction in a process pool so it never blocks the event
+    loop. Documents longer than ``pages_per_task`` pages are split into page
+    ranges extracted in parallel; the whole document is bounded by ``timeout``.
+
+    A document that times out has its queued tasks cancelled, and the pool is
+    retired: new documents go to a fresh pool while the ones already running in
+    the old pool finish there. The last of them to finish terminates the old
+    pool's processes, including any worker still stuck on the timed-out document.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, pages_per_task: int = 8, timeout: float = 60.0) -> None:
+        self.max_workers = max_workers
+        self.pages_per_task = max(1, pages_per_task)
+        self.timeout = timeout
+        self._pool: Optional[ProcessPoolExecutor] = None
+        # Documents in flight per pool, and pools that take no new documents.
+        self._active: Dict[ProcessPoolExecutor, int] = {}
+        self._retired: set = set()
+        self._lock = threading.Lock()
+
+    def _acquire(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                # spawn: forking a process that runs an event loop and SQLite connections is unsafe.
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn")
+                )
+            self._active[self._pool] = self._active.get(self._pool, 0) + 1
+            return self._pool
+
+    def _release(self, pool: ProcessPoolExecutor) -> None:
+        with self._lock:
+            self._active[pool] -= 1
+            idle = self._active[pool] == 0
+            if idle:
+                del self._active[pool]
+            close = idle and pool in self._retired
+            if close:
+                self._retired.discard(pool)
+        if close:
+            _kill_pool(pool)
+
+    def _retire(self, pool: ProcessPoolExecutor) -> None:
+        with self._lock:
+            if self._pool is pool:
+                self._pool = None
+            if pool in self._active:
+                self._retired.add(pool)
+                return
+        _kill_pool(pool)
+
+    async def extract(self, file_bytes: bytes) -> str:
+        """
+        Extract text from a PDF. Raises asyncio.TimeoutError after ``timeout``
+        seconds and PdfExtractionError if the worker pool failed.
+        """
+        pool = self._acquire()
+        try:
+            return await asyncio.wait_for(self._extract(pool, file_bytes), self.timeout)
+        except asyncio.TimeoutError:
+            # A worker stuck on a pathological document must not keep taking new work.
+            self._retire(pool)
+            raise
+        except BrokenProcessPool as exc:
+            self._retire(pool)
+            raise PdfExtractionError("PDF worker process died") from exc
+        except asyncio.CancelledError:
+            task = asyncio.current_task()
+            if task is not None and task.cancelling():
+                raise
+            # Not our request being cancelled: the pool cancelled the work (e.g. during shutdown).
+            raise PdfExtractionError("PDF extraction was cancelled") from None
+        finally:
+            self._release(pool)
+
+    async def _extract(self, pool: ProcessPoolExecutor, file_bytes: bytes) -> str:
+        loop = asyncio.get_running_loop()
+        # The first task also reports the page count, so short documents take a single round trip.
+        total, head = await loop.run_in_executor(pool, extract_pdf_head, file_bytes, self.pages_per_task)
+        ranges = [
+            (start, min(start + self.pages_per_task, total))
+            for start in range(self.pages_per_task, total, self.pages_per_task)
+        ]
+        rest = await asyncio.gather(
+            *(loop.run_in_executor(pool, extract_pdf_pages, file_bytes, start, stop) for start, stop in ranges)
+        )
+        return "\n".join(page for chunk in [head, *rest] for page in chunk)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            pools = {self._pool, *self._retired} - {None}
+            self._pool = None
+            self._retired.clear()
+        for pool in pools:
+            _kill_pool(pool)
+
+
+def _kill_pool(pool: ProcessPoolExecutor) -> None:
+    for process in list((getattr(pool, "_processes", None) or {}).values()):
+        process.terminate()
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+class ParsedResumeCache:
+    """
+    Parsed resumes keyed by the SHA-256 of the uploaded bytes, persisted as one
+    JSON file per digest with a small in-memory LRU in front.
+
+    The directory keeps at most ``max_files`` files, dropping the least recently
+    used first (a hit refreshes the file's mtime), and files untouched for
+    ``max_age`` seconds are dropped as well.
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        max_in_memory: int = 16,
+        max_files: int = 256,
+        max_age: Optional[float] = None,
+    ) -> None:
+        self.directory = Path(directory)
+        self.max_in_memory = max_in_memory
+        self.max_files = max(1, max_files)
+        self.max_age = max_age
+        self._memory: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def digest(file_bytes: bytes) -> str:
+        return hashlib.sha256(file_bytes).hexdigest()
+
+    def _path(self, digest: str) -> Path:
+        return self.directory / f"{digest}.json"
+
+    def get(self, digest: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            if digest in self._memory:
+                self._memory.move_to_end(digest)
+                return dict(self._memory[digest])
+        path = self._path(digest)
+        if not path.exists():
+            return None
+        try:
+            resume = json.loads(path.read_text(encoding="utf-8"))
+            os.utime(path)
+        except (OSError, json.JSONDecodeError):
+            return None
+        self._remember(digest, resume)
+        return dict(resume)
+
+    def put(self, digest: str, resume: Dict[str, Any]) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._path(digest).write_text(json.dumps(resume), encoding="utf-8")
+        self._remember(digest, resume)
+        self.prune()
+
+    def prune(self) -> int:
+        """Delete files beyond ``max_files`` or older than ``max_age``; returns how many went."""
+        entries = []
+        for path in self.directory.glob("*.json"):
+            try:
+                entries.append((path.stat().st_mtime, path))
+            except OSError:
+                continue
+        entries.sort(reverse=True)
+        cutoff = time.time() - self.max_age if self.max_age else None
+        doomed = [
+            path for index, (mtime, path) in enumerate(entries)
+            if index >= self.max_files or (cutoff is not None and mtime < cutoff)
+        ]
+        for path in doomed:
+            path.unlink(missing_ok=True)
+            with self._lock:
+                self._memory.pop(path.stem, None)
+        return len(doomed)
+
+    def _remember(self, digest: str, resume: Dict[str, Any]) -> None:
+        with self._lock:
+            self._memory[digest] = dict(resume)
+            self._memory.move_to_end(digest)
+            while len(self._memory) > self.max_in_memory:
+                self._memory.popitem(last=False)
+
+
+class LoadedResume:
+    """A parsed resume held in memory with its summary and pre-serialized responses."""
+
+    def __init__(self, resume: Dict[str, Any], summary: str) -> None:
+        self.resume = resume
+        self.summary = summary
+        self.slim = {key: value for key, value in resume.items() if key != "raw_text"}
+        self.full_body = json.dumps(resume).encode("utf-8")
+        self.slim_body = json.dumps(self.slim).encode("utf-8")
+        self.full_etag = _etag(self.full_body)
+        self.slim_etag = _etag(self.slim_body)
+
+
+def _etag(body: bytes) -> str:
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+class ResumeCache:
+    """
+    Keeps the cached resume, its summary and a projection without ``raw_text``
+    in memory. Writes go through ``store``; the file's mtime/size is checked on
+    every read so edits made outside this process are picked up.
+    """
+
+    def __init__(self, path: Path, summarize: Callable[[Dict[str, Any]], str]) -> None:
+        self.path = Path(path)
+        self.summarize = summarize
+        self._loaded: Optional[LoadedResume] = None
+        self._signature: Optional[Tuple[int, int]] = None
+        self._lock = threading.Lock()
+
+    def _file_signature(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = self.path.stat()
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def get(self) -> Optional[LoadedResume]:
+        signature = self._file_signature()
+        with self._lock:
+            if signature != self._signature:
+                self._loaded = self._read() if signature else None
+                self._signature = signature
+            return self._loaded
+
+    def _read(self) -> Optional[LoadedResume]:
+        try:
+            resume = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError):
+            return None
+        if not resume:
+            return None
+        return LoadedResume(resume, self.summarize(resume))
+
+    def store(self, resume: Dict[str, Any]) -> LoadedResume:
+        loaded = LoadedResume(resume, self.summarize(resume))
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self.path.write_text(json.dumps(resume, indent=2), encoding="utf-8")
+            self._loaded = loaded
+            self._signature = self._file_signature()
+        return loaded
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._loaded = None
+            self._signature = None
@@ -0,0 +1,216 @@
+import math
+import threading
+from array import array
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # Optional: without NumPy the token index in matching.py is used instead.
+    np = None
+
+from .matching import STOP_WORDS, normalize_question
+
+NUMPY_AVAILABLE = np is not None
+
+NGRAM_SIZE = 3
+
+# Weight of each whole (non stop) word relative to one character n-gram. Words
+# dominate the vector, so questions that differ in a content word ("Canada" vs
+# "US", "competitor" vs "company") stay apart however many n-grams they share,
+# while n-grams still absorb spelling and inflection differences.
+WORD_WEIGHT = 8.0
+
+# Default cut-off. Scores run higher than token Jaccard for the same pair of
+# questions; 0.72 here accepts and rejects the same paraphrases that 0.6 does there.
+DEFAULT_THRESHOLD = 0.72
+
+
+def similarity_text(normalized: str) -> str:
+    """Drop stop words (like the token metric does) so n-grams describe the meaningful words."""
+    meaningful = " ".join(token for token in normalized.split() if token not in STOP_WORDS)
+    return meaningful or normalized
+
+
+def char_ngrams(text: str, n: int = NGRAM_SIZE) -> Counter:
+    """Character n-gram counts, padded so word edges count."""
+    padded = f" {text} "
+    if len(padded) < n:
+        return Counter([padded])
+    return Counter(padded[i : i + n] for i in range(len(padded) - n + 1))
+
+
+def question_features(normalized: str, ngram: int = NGRAM_SIZE) -> Dict[str, float]:
+    """Feature weights of a question: its character n-grams plus its whole words."""
+    text = similarity_text(normalized)
+    features: Dict[str, float] = dict(char_ngrams(text, ngram))
+    for word in text.split():
+        features["\0" + word] = features.get("\0" + word, 0.0) + WORD_WEIGHT
+    return features
+
+
+class SimilarityEngine:
+    """
+    Vectorized top-k question matching.
+
+    Each stored question contributes two rows to a sparse matrix: its normalized
+    key and its normalized original text, as L2-normalized vectors of character
+    n-grams and whole words (see question_features). The matrix is stored
+    column-wise (one posting array of rows/weights per feature), so a query is
+    scored against every row with a single ``np.bincount`` over the postings of
+    its features; an entry scores the better of its two rows (cosine similarity
+    in [0, 1]).
+
+    Weights depend only on the question itself, never on the rest of the
+    history, so a score is the same however the index was built: incrementally,
+    in another order, or from scratch after a compaction. Equal scores resolve
+    to the smallest key. Updates give an upserted key a fresh slot and mask out
+    its old one; dead slots are dropped by a rebuild once they outnumber live ones.
+    The engine has its own threshold scale (DEFAULT_THRESHOLD).
+    """
+
+    def __init__(self, ngram: int = NGRAM_SIZE) -> None:
+        if np is None:
+            raise RuntimeError("SimilarityEngine requires numpy; install it with `pip install numpy`.")
+        self.ngram = ngram
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self) -> None:
+        self._vocab: Dict[str, int] = {}
+        self._rows: List[array] = []  # per n-gram: row ids ("i")
+        self._weights: List[array] = []  # per n-gram: weights ("f")
+        self._keys: List[Optional[str]] = []
+        self._slot_of: Dict[str, int] = {}
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._alive = np.zeros(0, dtype=bool)
+        self._dead = 0
+
+    def __len__(self) -> int:
+        return len(self._slot_of)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._slot_of
+
+    @classmethod
+    def from_history(cls, history: Dict[str, Any]) -> "SimilarityEngine":
+        engine = cls()
+        engine._rebuild(history.items())
+        return engine
+
+    def _variant_features(self, key: str, entry: Dict[str, Any]) -> List[Dict[str, float]]:
+        variants = [key]
+        if "question" in entry:
+            original = normalize_question(entry["question"])
+            if original and original != key:
+                variants.append(original)
+        return [question_features(text, self.ngram) if text else {} for text in variants]
+
+    def _feature(self, gram: str) -> int:
+        feature = self._vocab.get(gram)
+        if feature is None:
+            feature = self._vocab[gram] = len(self._rows)
+            self._rows.append(array("i"))
+            self._weights.append(array("f"))
+        return feature
+
+    def _add_slot(self, key: str, entry: Dict[str, Any]) -> None:
+        slot = len(self._keys)
+        self._keys.append(key)
+        self._slot_of[key] = slot
+        self._entries[key] = entry
+        if slot >= len(self._alive):
+            self._alive = np.resize(self._alive, max(16, slot * 2))
+            self._alive[slot:] = False
+        self._alive[slot] = True
+        for offset, weighted in enumerate(self._variant_features(key, entry)):
+            norm = math.sqrt(sum(weight * weight for weight in weighted.values()))
+            if not norm:
+                continue
+            row = slot * 2 + offset
+            for gram, weight in weighted.items():
+                feature = self._feature(gram)
+                self._rows[feature].append(row)
+                self._weights[feature].append(weight / norm)
+
+    def _rebuild(self, items: Iterable[Tuple[str, Dict[str, Any]]]) -> None:
+        items = list(items)
+        self._reset()
+        for key, entry in items:
+            self._add_slot(key, entry)
+
+    def upsert(self, key: str, entry: Dict[str, Any]) -> None:
+        with self._lock:
+            if key in self._slot_of:
+                self._kill(self._slot_of.pop(key))
+            self._add_slot(key, entry)
+            self._maybe_rebuild()
+
+    def remove(self, key: str) -> None:
+        with self._lock:
+            slot = self._slot_of.pop(key, None)
+            if slot is not None:
+                self._kill(slot)
+                self._maybe_rebuild()
+
+    def _kill(self, slot: int) -> None:
+        key = self._keys[slot]
+        self._keys[slot] = None
+        self._alive[slot] = False
+        self._dead += 1
+        if key is not None and key not in self._slot_of:
+            self._entries.pop(key, None)
+
+    def _maybe_rebuild(self) -> None:
+        if self._dead > 1024 and self._dead > len(self._slot_of):
+            self._rebuild([(key, self._entries[key]) for key in self._keys if key is not None])
+
+    def scores(self, normalized_question: str) -> "np.ndarray":
+        """Similarity of the query to every slot (dead slots score 0)."""
+        with self._lock:
+            slots = len(self._keys)
+            if not slots or not normalized_question:
+                return np.zeros(slots, dtype=np.float64)
+            total_rows = slots * 2
+            rows_parts = []
+            weight_parts = []
+            query_norm = 0.0
+            for gram, weight in question_features(normalized_question, self.ngram).items():
+                query_norm += weight * weight
+                feature = self._vocab.get(gram)
+                if feature is None or not self._rows[feature]:
+                    continue
+                rows_parts.append(np.frombuffer(self._rows[feature], dtype=np.int32))
+                weight_parts.append(np.frombuffer(self._weights[feature], dtype=np.float32) * weight)
+            if not rows_parts:
+                return np.zeros(slots, dtype=np.float64)
+            row_scores = np.bincount(
+                np.concatenate(rows_parts), weights=np.concatenate(weight_parts), minlength=total_rows
+            )
+            del rows_parts  # release buffer views so the posting arrays can grow again
+            slot_scores = np.maximum(row_scores[0:total_rows:2], row_scores[1:total_rows:2]) / math.sqrt(query_norm)
+            slot_scores[~self._alive[:slots]] = 0.0
+            return slot_scores
+
+    def top_k(self, normalized_question: str, k: int = 5, threshold: float = 0.0) -> List[Tuple[str, float]]:
+        """Best `k` (key, score) pairs scoring at least `threshold`, highest first."""
+        with self._lock:
+            scores = self.scores(normalized_question)
+            candidates = np.flatnonzero(scores >= max(threshold, 1e-9))
+            if not len(candidates) or k <= 0:
+                return []
+            if len(candidates) > k:
+                # Keep everything tied with the k-th best so the tie-break below sees all of them.
+                kth = -np.partition(-scores[candidates], k - 1)[k - 1]
+                candidates = candidates[scores[candidates] >= kth]
+            # Highest score first; equal scores resolve to the smallest key, whatever the slot order.
+            ordered = sorted(candidates.tolist(), key=lambda slot: (-scores[slot], self._keys[slot]))[:k]
+            return [(self._keys[slot], float(min(scores[slot], 1.0))) for slot in ordered]
+
+    def best_match(self, normalized_question: str, threshold: float = DEFAULT_THRESHOLD) -> Optional[Tuple[str, float]]:
+        matches = self.top_k(normalized_question, k=1, threshold=threshold)
+        return matches[0] if matches else None
+
+    def find_similar(self, normalized_question: str, threshold: float = DEFAULT_THRESHOLD) -> Optional[str]:
+        match = self.best_match(normalized_question, threshold)
+        return match[0] if match else None
@@ -0,0 +1,750 @@
+import json
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# Tables backing the JSON stores the API has always exposed.
+QA_HISTORY_TABLE = "qa_history"
+KEYWORD_ANSWERS_TABLE = "keyword_answers"
+
+SCHEMA = [
+    # Version 1: key/value tables plus a global revision counter.
+    """
+    CREATE TABLE IF NOT EXISTS qa_history (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        key TEXT NOT NULL UNIQUE,
+        entry TEXT NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS keyword_answers (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        intent TEXT NOT NULL UNIQUE,
+        answer TEXT NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS meta (
+        name TEXT PRIMARY KEY,
+        value TEXT NOT NULL
+    );
+    INSERT OR IGNORE INTO meta (name, value) VALUES ('revision', '0');
+    """,
+    # Version 2: cached form plans. A field plan is the resolved answer for one
+    # field signature; field_plan_deps lists the history keys / intents it was
+    # resolved from, and the triggers drop it as soon as one of those answers changes.
+    """
+    CREATE TABLE IF NOT EXISTS field_plans (
+        signature TEXT PRIMARY KEY,
+        result TEXT NOT NULL,
+        created_at REAL NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS field_plan_deps (
+        kind TEXT NOT NULL,
+        key TEXT NOT NULL,
+        signature TEXT NOT NULL,
+        PRIMARY KEY (kind, key, signature)
+    ) WITHOUT ROWID;
+    CREATE INDEX IF NOT EXISTS field_plan_deps_signature ON field_plan_deps (signature);
+    CREATE TABLE IF NOT EXISTS form_plans (
+        fingerprint TEXT PRIMARY KEY,
+        signatures TEXT NOT NULL,
+        created_at REAL NOT NULL,
+        accessed_at REAL NOT NULL,
+        hits INTEGER NOT NULL DEFAULT 0
+    );
+    CREATE INDEX IF NOT EXISTS form_plans_accessed ON form_plans (accessed_at);
+    CREATE TRIGGER IF NOT EXISTS qa_history_insert_plans AFTER INSERT ON qa_history BEGIN
+        DELETE FROM field_plans WHERE signature IN
+            (SELECT signature FROM field_plan_deps WHERE kind = 'qa' AND key = new.key);
+    END;
+    CREATE TRIGGER IF NOT EXISTS qa_history_update_plans AFTER UPDATE OF entry ON qa_history
+    WHEN json_extract(old.entry, '$.answer') IS NOT json_extract(new.entry, '$.answer') BEGIN
+        DELETE FROM field_plans WHERE signature IN
+            (SELECT signature FROM field_plan_deps WHERE kind = 'qa' AND key = new.key);
+    END;
+    CREATE TRIGGER IF NOT EXISTS qa_history_delete_plans AFTER DELETE ON qa_history BEGIN
+        DELETE FROM field_plans WHERE signature IN
+            (SELECT signature FROM field_plan_deps WHERE kind = 'qa' AND key = old.key);
+    END;
+    CREATE TRIGGER IF NOT EXISTS keyword_answers_insert_plans AFTER INSERT ON keyword_answers BEGIN
+        DELETE FROM field_plans WHERE signature IN
+            (SELECT signature FROM field_plan_deps WHERE kind = 'intent' AND key = new.intent);
+    END;
+    CREATE TRIGGER IF NOT EXISTS keyword_answers_update_plans AFTER UPDATE OF answer ON keyword_answers
+    WHEN old.answer IS NOT new.answer BEGIN
+        DELETE FROM field_plans WHERE signature IN
+            (SELECT signature FROM field_plan_deps WHERE kind = 'intent' AND key = new.intent);
+    END;
+    CREATE TRIGGER IF NOT EXISTS keyword_answers_delete_plans AFTER DELETE ON keyword_answers BEGIN
+        DELETE FROM field_plans WHERE signature IN
+            (SELECT signature FROM field_plan_deps WHERE kind = 'intent' AND key = old.intent);
+    END;
+    CREATE TRIGGER IF NOT EXISTS field_plans_delete_deps AFTER DELETE ON field_plans BEGIN
+        DELETE FROM field_plan_deps WHERE signature = old.signature;
+    END;
+    """,
+    # Version 3: change versions for incremental sync. Every insert, real change
+    # or delete takes the next value of the global 'version' counter; deletes
+    # leave a tombstone in deleted_answers so mirrors can drop the row too.
+    # Existing rows are numbered in insertion order.
+    """
+    ALTER TABLE qa_history ADD COLUMN version INTEGER NOT NULL DEFAULT 0;
+    ALTER TABLE qa_history ADD COLUMN intent TEXT;
+    ALTER TABLE keyword_answers ADD COLUMN version INTEGER NOT NULL DEFAULT 0;
+    UPDATE qa_history SET version = seq;
+    UPDATE keyword_answers SET version = seq + (SELECT COALESCE(MAX(seq), 0) FROM qa_history);
+    INSERT OR REPLACE INTO meta (name, value) VALUES ('version', (
+        SELECT COALESCE(MAX(version), 0) FROM (
+            SELECT version FROM qa_history UNION ALL SELECT version FROM keyword_answers
+        )
+    ));
+    CREATE INDEX IF NOT EXISTS qa_history_version ON qa_history (version);
+    CREATE INDEX IF NOT EXISTS qa_history_intent ON qa_history (intent, key);
+    CREATE INDEX IF NOT EXISTS keyword_answers_version ON keyword_answers (version);
+    CREATE TABLE IF NOT EXISTS deleted_answers (
+        kind TEXT NOT NULL,
+        key TEXT NOT NULL,
+        version INTEGER NOT NULL,
+        PRIMARY KEY (kind, key)
+    ) WITHOUT ROWID;
+    CREATE INDEX IF NOT EXISTS deleted_answers_version ON deleted_answers (version);
+    CREATE TRIGGER IF NOT EXISTS qa_history_version_insert AFTER INSERT ON qa_history BEGIN
+        UPDATE meta SET value = CAST(value AS INTEGER) + 1 WHERE name = 'version';
+        UPDATE qa_history SET version =
+            (SELECT CAST(value AS INTEGER) FROM meta WHERE name = 'version') WHERE seq = new.seq;
+        DELETE FROM deleted_answers WHERE kind = 'qa' AND key = new.key;
+    END;
+    CREATE TRIGGER IF NOT EXISTS qa_history_version_update AFTER UPDATE OF entry, intent ON qa_history
+    WHEN old.entry IS NOT new.entry OR old.intent IS NOT new.intent BEGIN
+        UPDATE meta SET value = CAST(value AS INTEGER) + 1 WHERE name = 'version';
+        UPDATE qa_history SET version =
+            (SELECT CAST(value AS INTEGER) FROM meta WHERE name = 'version') WHERE seq = new.seq;
+    END;
+    CREATE TRIGGER IF NOT EXISTS qa_history_version_delete AFTER DELETE ON qa_history BEGIN
+        UPDATE meta SET value = CAST(value AS INTEGER) + 1 WHERE name = 'version';
+        INSERT OR REPLACE INTO deleted_answers (kind, key, version) VALUES
+            ('qa', old.key, (SELECT CAST(value AS INTEGER) FROM meta WHERE name = 'version'));
+    END;
+    CREATE TRIGGER IF NOT EXISTS keyword_answers_version_insert AFTER INSERT ON keyword_answers BEGIN
+        UPDATE meta SET value = CAST(value AS INTEGER) + 1 WHERE name = 'version';
+        UPDATE keyword_answers SET version =
+            (SELECT CAST(value AS INTEGER) FROM meta WHERE name = 'version') WHERE seq = new.seq;
+        DELETE FROM deleted_answers WHERE kind = 'keyword' AND key = new.intent;
+    END;
+    CREATE TRIGGER IF NOT EXISTS keyword_answers_version_update AFTER UPDATE OF answer ON keyword_answers
+    WHEN old.answer IS NOT new.answer BEGIN
+        UPDATE meta SET value = CAST(value AS INTEGER) + 1 WHERE name = 'version';
+        UPDATE keyword_answers SET version =
+            (SELECT CAST(value AS INTEGER) FROM meta WHERE name = 'version') WHERE seq = new.seq;
+    END;
+    CREATE TRIGGER IF NOT EXISTS keyword_answers_version_delete AFTER DELETE ON keyword_answers BEGIN
+        UPDATE meta SET value = CAST(value AS INTEGER) + 1 WHERE name = 'version';
+        INSERT OR REPLACE INTO deleted_answers (kind, key, version) VALUES
+            ('keyword', old.intent, (SELECT CAST(value AS INTEGER) FROM meta WHERE name = 'version'));
+    END;
+    """,
+    # Version 4: aliases left behind by history compaction, and write times.
+    # A merged entry lists the questions folded into it under "aliases"
+    # ([{key, question}]); qa_aliases mirrors those lists so exact lookups can
+    # resolve an alias key with one indexed read. updated_at is the last time
+    # an entry's answer or intent was written (migration time for older rows).
+    """
+    CREATE TABLE IF NOT EXISTS qa_aliases (
+        alias TEXT PRIMARY KEY,
+        key TEXT NOT NULL,
+        question TEXT NOT NULL
+    ) WITHOUT ROWID;
+    CREATE INDEX IF NOT EXISTS qa_aliases_key ON qa_aliases (key);
+    ALTER TABLE qa_history ADD COLUMN updated_at REAL;
+    UPDATE qa_history SET updated_at = (julianday('now') - 2440587.5) * 86400.0;
+    CREATE TRIGGER IF NOT EXISTS qa_history_touch_insert AFTER INSERT ON qa_history BEGIN
+        UPDATE qa_history SET updated_at = (julianday('now') - 2440587.5) * 86400.0 WHERE seq = new.seq;
+    END;
+    CREATE TRIGGER IF NOT EXISTS qa_history_touch_update AFTER UPDATE OF entry, intent ON qa_history
+    WHEN old.entry IS NOT new.entry OR old.intent IS NOT new.intent BEGIN
+        UPDATE qa_history SET updated_at = (julianday('now') - 2440587.5) * 86400.0 WHERE seq = new.seq;
+    END;
+    CREATE TRIGGER IF NOT EXISTS qa_history_aliases_insert AFTER INSERT ON qa_history
+    WHEN json_type(new.entry, '$.aliases') IS NOT NULL BEGIN
+        INSERT OR REPLACE INTO qa_aliases (alias, key, question)
+            SELECT alias, new.key, COALESCE(question, alias) FROM (
+                SELECT json_extract(new.entry, '$.aliases[' || item.key || '].key') AS alias,
+                       json_extract(new.entry, '$.aliases[' || item.key || '].question') AS question
+                FROM json_each(CASE json_type(new.entry, '$.aliases')
+                    WHEN 'array' THEN json_extract(new.entry, '$.aliases') ELSE '[]' END) AS item
+            ) WHERE alias IS NOT NULL AND alias IS NOT new.key;
+    END;
+    CREATE TRIGGER IF NOT EXISTS qa_history_aliases_update AFTER UPDATE OF entry ON qa_history
+    WHEN old.entry IS NOT new.entry BEGIN
+        DELETE FROM qa_aliases WHERE key = new.key;
+        INSERT OR REPLACE INTO qa_aliases (alias, key, question)
+            SELECT alias, new.key, COALESCE(question, alias) FROM (
+                SELECT json_extract(new.entry, '$.aliases[' || item.key || '].key') AS alias,
+                       json_extract(new.entry, '$.aliases[' || item.key || '].question') AS question
+                FROM json_each(CASE json_type(new.entry, '$.aliases')
+                    WHEN 'array' THEN json_extract(new.entry, '$.aliases') ELSE '[]' END) AS item
+            ) WHERE alias IS NOT NULL AND alias IS NOT new.key;
+    END;
+    CREATE TRIGGER IF NOT EXISTS qa_history_aliases_delete AFTER DELETE ON qa_history BEGIN
+        DELETE FROM qa_aliases WHERE key = old.key;
+    END;
+    """,
+    # Version 5: cached misses. A field that resolved to no answer depends on
+    # ('any', '*'): any new or changed answer or intent answer might now match
+    # it, so every such write drops those plans. Deletes cannot, so they don't.
+    """
+    CREATE TRIGGER IF NOT EXISTS qa_history_insert_miss_plans AFTER INSERT ON qa_history BEGIN
+        DELETE FROM field_plans WHERE signature IN
+            (SELECT signature FROM field_plan_deps WHERE kind = 'any' AND key = '*');
+    END;
+    CREATE TRIGGER IF NOT EXISTS qa_history_update_miss_plans AFTER UPDATE OF entry ON qa_history
+    WHEN old.entry IS NOT new.entry BEGIN
+        DELETE FROM field_plans WHERE signature IN
+            (SELECT signature FROM field_plan_deps WHERE kind = 'any' AND key = '*');
+    END;
+    CREATE TRIGGER IF NOT EXISTS keyword_answers_insert_miss_plans AFTER INSERT ON keyword_answers BEGIN
+        DELETE FROM field_plans WHERE signature IN
+            (SELECT signature FROM field_plan_deps WHERE kind = 'any' AND key = '*');
+    END;
+    CREATE TRIGGER IF NOT EXISTS keyword_answers_update_miss_plans AFTER UPDATE OF answer ON keyword_answers
+    WHEN old.answer IS NOT new.answer BEGIN
+        DELETE FROM field_plans WHERE signature IN
+            (SELECT signature FROM field_plan_deps WHERE kind = 'any' AND key = '*');
+    END;
+    """,
+]
+
+# Dependency of a cached miss: invalidated by any answer written (see version 5).
+ANY_ANSWER = ("any", "*")
+
+
+class StoreTransaction:
+    """
+    Handle for an open write transaction; after exit `revision` is the committed
+    revision and `version` the change version it committed at (None if nothing was written).
+    """
+
+    def __init__(self, base_revision: int) -> None:
+        self.base_revision = base_revision
+        self.revision = base_revision
+        self.version: Optional[int] = None
+        self.writes = 0
+
+
+class FieldPlan:
+    """A resolved field ready to cache: its result and the (kind, key) answers it depends on."""
+
+    def __init__(self, result: Dict[str, Any], dependencies: List[Tuple[str, str]]) -> None:
+        self.result = result
+        self.dependencies = dependencies
+
+
+class AnswerStore:
+    """
+    SQLite (WAL mode) storage for the QA history and keyword answers.
+
+    Every thread gets its own connection, writes happen inside BEGIN IMMEDIATE
+    transactions so concurrent uvicorn workers serialize instead of losing
+    updates, and each committed write transaction bumps a global revision that
+    in-memory caches use to detect changes made by other processes.
+    """
+
+    def __init__(self, db_path: Path, legacy_paths: Optional[Dict[str, Path]] = None, timeout: float = 10.0) -> None:
+        self.db_path = Path(db_path)
+        self.timeout = timeout
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._apply_schema()
+        if legacy_paths:
+            self._import_legacy_json(legacy_paths)
+
+    # -- connection handling -------------------------------------------------
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(
+                self.db_path,
+                timeout=self.timeout,
+                isolation_level=None,  # transactions are managed explicitly
+                check_same_thread=False,
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(f"PRAGMA busy_timeout={int(self.timeout * 1000)}")
+            self._local.conn = conn
+            self._local.txn = None
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    def close(self) -> None:
+        """Close every thread's connection; only call once no thread uses the store any more."""
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+        self._local = threading.local()
+
+    def checkpoint(self) -> None:
+        """Fold the WAL back into the database file, e.g. before a store goes idle."""
+        self._connection().execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def _apply_schema(self) -> None:
+        conn = self._connection()
+        current = conn.execute("PRAGMA user_version").fetchone()[0]
+        for version, script in enumerate(SCHEMA, start=1):
+            if version <= current:
+                continue
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Re-check under the write lock in case another worker migrated first.
+                if conn.execute("PRAGMA user_version").fetchone()[0] < version:
+                    for statement in _statements(script):
+                        conn.execute(statement)
+                    conn.execute(f"PRAGMA user_version={version}")
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def _import_legacy_json(self, legacy_paths: Dict[str, Path]) -> None:
+        """One-time migration from qa_history.json / keyword_answers.json."""
+        if self._meta("legacy_imported") is not None:
+            return
+        with self.transaction() as txn:
+            if self._meta("legacy_imported") is not None:
+                return
+            for table, path in legacy_paths.items():
+                payload = _read_json(path)
+                if isinstance(payload, dict) and payload:
+                    self._replace(table, payload)
+                    txn.writes += 1
+            self._set_meta("legacy_imported", "1")
+
+    def _meta(self, name: str) -> Optional[str]:
+        row = self._connection().execute("SELECT value FROM meta WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, name: str, value: str) -> None:
+        self._connection().execute(
+            "INSERT INTO meta (name, value) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET value = excluded.value",
+            (name, value),
+        )
+
+    # -- transactions --------------------------------------------------------
+
+    @contextmanager
+    def transaction(self) -> Iterator[StoreTransaction]:
+        """
+        Group writes into one atomic transaction. Nested calls join the outer
+        transaction. The revision is bumped once on commit if anything was written.
+        """
+        conn = self._connection()
+        txn = getattr(self._local, "txn", None)
+        if txn is not None:
+            yield txn
+            return
+        conn.execute("BEGIN IMMEDIATE")
+        txn = StoreTransaction(int(self._meta("revision") or 0))
+        self._local.txn = txn
+        try:
+            yield txn
+            if txn.writes:
+                txn.revision = txn.base_revision + 1
+                txn.version = self.version()
+                self._set_meta("revision", str(txn.revision))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            txn.revision = txn.base_revision
+            txn.version = None
+            raise
+        finally:
+            self._local.txn = None
+
+    def revision(self) -> int:
+        return int(self._meta("revision") or 0)
+
+    def version(self) -> int:
+        """The latest change version; unlike the revision it moves once per changed row."""
+        return int(self._meta("version") or 0)
+
+    # -- reads ---------------------------------------------------------------
+
+    def load_history(self) -> Dict[str, Any]:
+        rows = self._connection().execute("SELECT key, entry FROM qa_history ORDER BY seq")
+        return {key: json.loads(entry) for key, entry in rows}
+
+    def load_keyword_answers(self) -> Dict[str, Any]:
+        rows = self._connection().execute("SELECT intent, answer FROM keyword_answers ORDER BY seq")
+        return {intent: json.loads(answer) for intent, answer in rows}
+
+    def load_table(self, table: str) -> Dict[str, Any]:
+        if table == QA_HISTORY_TABLE:
+            return self.load_history()
+        if table == KEYWORD_ANSWERS_TABLE:
+            return self.load_keyword_answers()
+        raise KeyError(table)
+
+    def get_entry(self, key: str) -> Optional[Dict[str, Any]]:
+        row = self._connection().execute("SELECT entry FROM qa_history WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def get_entries(self, keys: List[str]) -> Dict[str, Dict[str, Any]]:
+        found: Dict[str, Dict[str, Any]] = {}
+        conn = self._connection()
+        for start in range(0, len(keys), 500):
+            chunk = keys[start : start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            rows = conn.execute(f"SELECT key, entry FROM qa_history WHERE key IN ({placeholders})", chunk)
+            found.update({key: json.loads(entry) for key, entry in rows})
+        return found
+
+    def resolve_entries(self, keys: List[str]) -> Dict[str, Tuple[str, Dict[str, Any]]]:
+        """
+        (stored key, entry) answering each of ``keys``: the key's own entry, or
+        for an alias left by compaction, the entry it was merged into. Keys
+        that are neither are left out.
+        """
+        found = {key: (key, entry) for key, entry in self.get_entries(keys).items()}
+        missing = [key for key in dict.fromkeys(keys) if key not in found]
+        conn = self._connection()
+        for start in range(0, len(missing), 500):
+            chunk = missing[start : start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            rows = conn.execute(
+                "SELECT aliases.alias, history.key, history.entry FROM qa_aliases AS aliases"
+                f" JOIN qa_history AS history ON history.key = aliases.key WHERE aliases.alias IN ({placeholders})",
+                chunk,
+            )
+            found.update({alias: (key, json.loads(entry)) for alias, key, entry in rows})
+        return found
+
+    def load_lookup_entries(self) -> Dict[str, Any]:
+        """
+        History entries plus a ``{"question"}`` entry per alias key that is not
+        stored itself: every question the similarity index should match.
+        """
+        entries = self.load_history()
+        for alias, question in self._connection().execute("SELECT alias, question FROM qa_aliases ORDER BY key"):
+            entries.setdefault(alias, {"question": question})
+        return entries
+
+    def load_aliases(self) -> Dict[str, Tuple[str, str]]:
+        """Alias key -> (key of the entry it was merged into, original question)."""
+        rows = self._connection().execute("SELECT alias, key, question FROM qa_aliases")
+        return {alias: (key, question) for alias, key, question in rows}
+
+    def history_rows(self) -> List[Tuple[str, Dict[str, Any], Optional[str], int, Optional[float]]]:
+        """Every entry as (key, entry, intent, version, updated_at), in insertion order."""
+        rows = self._connection().execute(
+            "SELECT key, entry, intent, version, updated_at FROM qa_history ORDER BY seq"
+        )
+        return [(key, json.loads(entry), intent, version, updated_at) for key, entry, intent, version, updated_at in rows]
+
+    def entry_versions(self, keys: List[str]) -> Dict[str, int]:
+        found: Dict[str, int] = {}
+        conn = self._connection()
+        for start in range(0, len(keys), 500):
+            chunk = keys[start : start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            rows = conn.execute(f"SELECT key, version FROM qa_history WHERE key IN ({placeholders})", chunk)
+            found.update(dict(rows))
+        return found
+
+    def get_keyword(self, intent: str) -> Optional[Any]:
+        row = self._connection().execute(
+            "SELECT answer FROM keyword_answers WHERE intent = ?", (intent,)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    # -- sync ----------------------------------------------------------------
+
+    def page_history(
+        self,
+        limit: int,
+        after: Optional[str] = None,
+        prefix: Optional[str] = None,
+        intent: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Up to ``limit`` history rows ordered by key, starting after the key
+        ``after``. ``prefix`` filters on the normalized key (a range scan of the
+        key index) and ``intent`` on the intent the answer was stored with.
+        """
+        clauses, params = [], []
+        if after is not None:
+            clauses.append("key > ?")
+            params.append(after)
+        if prefix:
+            clauses.append("key >= ? AND key < ?")
+            params.extend([prefix, prefix + "\U0010ffff"])
+        if intent is not None:
+            clauses.append("intent = ?")
+            params.append(intent)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = self._connection().execute(
+            f"SELECT key, entry, intent, version FROM qa_history{where} ORDER BY key LIMIT ?", (*params, limit)
+        )
+        return [_qa_record(*row) for row in rows]
+
+    def changes_since(self, since: int, limit: int) -> List[Dict[str, Any]]:
+        """
+        Rows changed after version ``since``, oldest first: current QA entries,
+        keyword answers and tombstones (``deleted: true``) for removed ones.
+        Only the latest state of a row is reported, at its latest version.
+        """
+        # Each branch is limited on its own version index, so a client far
+        # behind never makes SQLite sort the whole table.
+        rows = self._connection().execute(
+            "SELECT * FROM ("
+            " SELECT * FROM (SELECT 'qa', key, entry, intent, version FROM qa_history"
+            "  WHERE version > :since ORDER BY version LIMIT :limit)"
+            " UNION ALL SELECT * FROM (SELECT 'keyword', intent, answer, NULL, version FROM keyword_answers"
+            "  WHERE version > :since ORDER BY version LIMIT :limit)"
+            " UNION ALL SELECT * FROM (SELECT kind, key, NULL, NULL, version FROM deleted_answers"
+            "  WHERE version > :since ORDER BY version LIMIT :limit)"
+            ") ORDER BY 5 LIMIT :limit",
+            {"since": since, "limit": limit},
+        )
+        changes = []
+        for kind, key, value, intent, version in rows:
+            if value is None:
+                changes.append({"kind": kind, "key": key, "version": version, "deleted": True})
+            elif kind == "qa":
+                changes.append(_qa_record(key, value, intent, version))
+            else:
+                changes.append(_keyword_record(key, value, version))
+        return changes
+
+    def iter_records(self, batch: int = 1000) -> Iterator[Dict[str, Any]]:
+        """
+        Every QA entry and keyword answer as sync records, read in batches so a
+        large export never sits in memory. Not a snapshot: rows written while
+        iterating may or may not appear, so follow up with changes_since().
+        """
+        for table, columns, record in (
+            (QA_HISTORY_TABLE, "key, entry, intent, version", _qa_record),
+            (KEYWORD_ANSWERS_TABLE, "intent, answer, version", _keyword_record),
+        ):
+            last_seq = 0
+            while True:
+                rows = self._connection().execute(
+                    f"SELECT seq, {columns} FROM {table} WHERE seq > ? ORDER BY seq LIMIT ?", (last_seq, batch)
+                ).fetchall()
+                for row in rows:
+                    yield record(*row[1:])
+                if len(rows) < batch:
+                    break
+                last_seq = rows[-1][0]
+
+    def apply_records(self, records: List[Dict[str, Any]]) -> Dict[str, int]:
+        """
+        Apply sync records (as produced by iter_records/changes_since) in one
+        transaction. Versions are local, so incoming ones are ignored; records
+        that match what is stored already count as unchanged.
+        """
+        counts = {"applied": 0, "unchanged": 0}
+        with self.transaction():
+            for record in records:
+                kind, key = record["kind"], record["key"]
+                if record.get("deleted"):
+                    changed = self.delete_entry(key) if kind == "qa" else self.delete_keyword(key)
+                elif kind == "qa":
+                    changed = self.upsert_entry(key, record["entry"], record.get("intent"))
+                else:
+                    changed = self.upsert_keyword(key, record["answer"])
+                counts["applied" if changed else "unchanged"] += 1
+        return counts
+
+    # -- writes --------------------------------------------------------------
+
+    # Writes return whether a row actually changed. Rewriting identical data
+    # is a no-op, so it neither takes a new version nor bumps the revision.
+
+    def upsert_entry(self, key: str, entry: Dict[str, Any], intent: Optional[str] = None) -> bool:
+        """Insert or replace a history entry; ``intent`` is kept from before when not given."""
+        with self.transaction() as txn:
+            cursor = self._connection().execute(
+                "INSERT INTO qa_history (key, entry, intent) VALUES (:key, :entry, :intent) "
+                "ON CONFLICT(key) DO UPDATE SET entry = excluded.entry, "
+                "intent = COALESCE(excluded.intent, qa_history.intent) "
+                "WHERE qa_history.entry IS NOT excluded.entry "
+                "OR qa_history.intent IS NOT COALESCE(excluded.intent, qa_history.intent)",
+                {"key": key, "entry": json.dumps(entry), "intent": intent},
+            )
+            txn.writes += cursor.rowcount
+        return cursor.rowcount > 0
+
+    def delete_entry(self, key: str) -> bool:
+        with self.transaction() as txn:
+            cursor = self._connection().execute("DELETE FROM qa_history WHERE key = ?", (key,))
+            txn.writes += cursor.rowcount
+        return cursor.rowcount > 0
+
+    def upsert_keyword(self, intent: str, answer: Any) -> bool:
+        with self.transaction() as txn:
+            cursor = self._connection().execute(
+                "INSERT INTO keyword_answers (intent, answer) VALUES (?, ?) "
+                "ON CONFLICT(intent) DO UPDATE SET answer = excluded.answer "
+                "WHERE keyword_answers.answer IS NOT excluded.answer",
+                (intent, json.dumps(answer)),
+            )
+            txn.writes += cursor.rowcount
+        return cursor.rowcount > 0
+
+    def delete_keyword(self, intent: str) -> bool:
+        with self.transaction() as txn:
+            cursor = self._connection().execute("DELETE FROM keyword_answers WHERE intent = ?", (intent,))
+            txn.writes += cursor.rowcount
+        return cursor.rowcount > 0
+
+    # -- form plans ------------------------------------------------------------
+
+    def get_form_plan(self, fingerprint: str) -> Optional[List[Tuple[str, Optional[Dict[str, Any]]]]]:
+        """
+        The cached form's field signatures in order, each with its field plan
+        (None once invalidated), in one query; None if the form is unknown.
+        """
+        conn = self._connection()
+        rows = conn.execute(
+            "SELECT fields.value, plans.result"
+            " FROM form_plans AS forms, json_each(forms.signatures) AS fields"
+            " LEFT JOIN field_plans AS plans ON plans.signature = fields.value"
+            " WHERE forms.fingerprint = ? ORDER BY fields.key",
+            (fingerprint,),
+        ).fetchall()
+        if not rows:
+            return None
+        conn.execute(
+            "UPDATE form_plans SET accessed_at = ?, hits = hits + 1 WHERE fingerprint = ?", (time.time(), fingerprint)
+        )
+        return [(signature, json.loads(result) if result else None) for signature, result in rows]
+
+    def get_field_plans(self, signatures: List[str]) -> Dict[str, Dict[str, Any]]:
+        found: Dict[str, Dict[str, Any]] = {}
+        conn = self._connection()
+        for start in range(0, len(signatures), 500):
+            chunk = signatures[start : start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            rows = conn.execute(f"SELECT signature, result FROM field_plans WHERE signature IN ({placeholders})", chunk)
+            found.update({signature: json.loads(result) for signature, result in rows})
+        return found
+
+    def put_form_plan(
+        self,
+        fingerprint: str,
+        signatures: List[str],
+        plans: Dict[str, FieldPlan],
+        revision: int,
+        max_forms: int = 500,
+    ) -> bool:
+        """
+        Cache a form's signature list and newly resolved field plans. Skipped
+        (returns False) if any answer changed since ``revision``, the revision
+        the plans were resolved at, because the triggers could not see them yet.
+        Plan writes do not bump the revision.
+        """
+        conn = self._connection()
+        now = time.time()
+        with self.transaction() as txn:
+            if txn.base_revision != revision:
+                return False
+            conn.executemany("DELETE FROM field_plan_deps WHERE signature = ?", [(signature,) for signature in plans])
+            conn.executemany(
+                "INSERT INTO field_plans (signature, result, created_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(signature) DO UPDATE SET result = excluded.result, created_at = excluded.created_at",
+                [(signature, json.dumps(plan.result), now) for signature, plan in plans.items()],
+            )
+            conn.executemany(
+                "INSERT OR IGNORE INTO field_plan_deps (kind, key, signature) VALUES (?, ?, ?)",
+                [(kind, key, signature) for signature, plan in plans.items() for kind, key in plan.dependencies],
+            )
+            conn.execute(
+                "INSERT INTO form_plans (fingerprint, signatures, created_at, accessed_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(fingerprint) DO UPDATE SET signatures = excluded.signatures, accessed_at = excluded.accessed_at",
+                (fingerprint, json.dumps(signatures), now, now),
+            )
+            self._evict_form_plans(max_forms)
+        return True
+
+    def _evict_form_plans(self, max_forms: int) -> None:
+        conn = self._connection()
+        overflow = conn.execute("SELECT COUNT(*) FROM form_plans").fetchone()[0] - max_forms
+        if overflow <= 0:
+            return
+        conn.execute(
+            "DELETE FROM form_plans WHERE fingerprint IN "
+            "(SELECT fingerprint FROM form_plans ORDER BY accessed_at LIMIT ?)",
+            (overflow,),
+        )
+        # Field plans are shared between forms; drop the ones no remaining form uses.
+        conn.execute(
+            "DELETE FROM field_plans WHERE signature NOT IN "
+            "(SELECT fields.value FROM form_plans, json_each(form_plans.signatures) AS fields)"
+        )
+
+    def form_plan_stats(self) -> Dict[str, int]:
+        conn = self._connection()
+        forms, hits = conn.execute("SELECT COUNT(*), COALESCE(SUM(hits), 0) FROM form_plans").fetchone()
+        fields = conn.execute("SELECT COUNT(*) FROM field_plans").fetchone()[0]
+        return {"forms": forms, "field_plans": fields, "form_hits": hits}
+
+    def replace_table(self, table: str, payload: Dict[str, Any]) -> None:
+        """Replace a whole table (the save_json compatibility path)."""
+        with self.transaction() as txn:
+            self._replace(table, payload)
+            txn.writes += 1
+
+    def _replace(self, table: str, payload: Dict[str, Any]) -> None:
+        # Only rows that differ are touched, so unchanged rows keep their version
+        # and mirrors are not sent the whole table again.
+        conn = self._connection()
+        if table == QA_HISTORY_TABLE:
+            key_column, value_column = "key", "entry"
+        elif table == KEYWORD_ANSWERS_TABLE:
+            key_column, value_column = "intent", "answer"
+        else:
+            raise KeyError(table)
+        stored = [key for (key,) in conn.execute(f"SELECT {key_column} FROM {table}")]
+        conn.executemany(
+            f"DELETE FROM {table} WHERE {key_column} = ?", [(key,) for key in stored if key not in payload]
+        )
+        conn.executemany(
+            f"INSERT INTO {table} ({key_column}, {value_column}) VALUES (?, ?) "
+            f"ON CONFLICT({key_column}) DO UPDATE SET {value_column} = excluded.{value_column} "
+            f"WHERE {table}.{value_column} IS NOT excluded.{value_column}",
+            [(key, json.dumps(value)) for key, value in payload.items()],
+        )
+
+
+def _statements(script: str) -> Iterator[str]:
+    """Split a schema script into statements; trigger bodies contain ';' themselves."""
+    pending = ""
+    for piece in script.split(";"):
+        pending += piece + ";"
+        if sqlite3.complete_statement(pending):
+            if pending.strip(" \n;"):
+                yield pending
+            pending = ""
+
+
+def _qa_record(key: str, entry: str, intent: Optional[str], version: int) -> Dict[str, Any]:
+    return {"kind": "qa", "key": key, "version": version, "entry": json.loads(entry), "intent": intent}
+
+
+def _keyword_record(intent: str, answer: str, version: int) -> Dict[str, Any]:
+    return {"kind": "keyword", "key": intent, "version": version, "answer": json.loads(answer)}
+
+
+def _read_json(path: Path) -> Any:
+    if not path.exists():
+        return None
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except json.JSONDecodeError:
+        return None
@@ -0,0 +1,211 @@
+"""
+Benchmark CLI.
+
+    python -m benchmarks run --sizes 1000,10000,100000 --mode both --save-baseline main
+    python -m benchmarks run --compare benchmarks/baselines/main.json
+    python -m benchmarks compare benchmarks/baselines/main.json results.json
+"""
+
+import argparse
+import asyncio
+import fnmatch
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+from .datasets import make_history, make_keyword_answers, make_queries
+from .harness import InProcessTarget, UvicornTarget, peak_rss_mb, reset_peak_rss, run_load
+from .scenarios import BenchContext, function_benchmarks, http_scenarios
+
+BASELINES_DIR = Path(__file__).resolve().parent / "baselines"
+LATENCY_METRICS = ("p50_ms", "p95_ms", "p99_ms")
+
+
+def _int_list(value: str) -> List[int]:
+    return [int(float(part)) for part in value.split(",") if part.strip()]
+
+
+async def run_target(mode: str, args: argparse.Namespace) -> Dict[str, Dict[str, Any]]:
+    data_dir = Path(tempfile.mkdtemp(prefix=f"job-app-filler-bench-{mode}-"))
+    if mode == "inprocess":
+        target: Any = InProcessTarget(data_dir, args.gemini_latency_ms)
+    else:
+        target = UvicornTarget(data_dir, args.gemini_latency_ms, workers=args.workers)
+    scenarios = [
+        scenario
+        for scenario in http_scenarios(args.pdf_pages)
+        if not args.scenarios or any(fnmatch.fnmatch(scenario.name, pattern) for pattern in args.scenarios)
+    ]
+    results: Dict[str, Dict[str, Any]] = {}
+    try:
+        for size in args.sizes:
+            print(f"[{mode}] history={size:,}: generating data", file=sys.stderr)
+            history = make_history(size, seed=args.seed)
+            target.seed(history, make_keyword_answers(args.keywords, seed=args.seed))
+            if mode == "uvicorn":
+                await target.start()
+            ctx = BenchContext(
+                history=history,
+                queries=make_queries(history, max(args.requests, 300), seed=args.seed),
+                requests=args.requests,
+                pdf_pages=args.pdf_pages,
+                seed=args.seed,
+                tag=f"{mode}-{size}-{time.time_ns()}",
+            )
+            size_results: Dict[str, Any] = {}
+
+            # The first lookup builds the similarity index; report it instead of letting it skew a scenario.
+            started = time.perf_counter()
+            (await target.client.post("/closed-question", json={"question": "warm up"})).raise_for_status()
+            size_results["startup_index_build"] = {"seconds": round(time.perf_counter() - started, 3)}
+
+            for scenario in scenarios:
+                total = min(args.requests, scenario.max_requests or args.requests)
+                scenario_ctx = ctx._replace(requests=total)
+                if scenario.setup is not None:
+                    await scenario.setup(target.client, scenario_ctx)
+                request = scenario.build(scenario_ctx)
+                reset_peak_rss(target.pid)
+                stats = await run_load(target.client, request, total, args.concurrency)
+                stats["peak_rss_mb"] = peak_rss_mb(target.pid)
+                size_results[scenario.name] = stats
+                print(
+                    f"[{mode}] history={size:,} {scenario.name:<24} p50={stats['p50_ms']:>9.2f}ms "
+                    f"p95={stats['p95_ms']:>9.2f}ms p99={stats['p99_ms']:>9.2f}ms "
+                    f"{stats['throughput_rps']:>8.1f} req/s errors={stats['errors']} rss={stats['peak_rss_mb']}MiB",
+                    file=sys.stderr,
+                )
+
+            if mode == "inprocess" and not args.skip_functions:
+                functions = function_benchmarks(target.main, ctx, args.requests, args.linear_max)
+                for name, stats in functions.items():
+                    print(f"[{mode}] history={size:,} {name:<24} p50={stats['p50_ms']:>9.2f}ms", file=sys.stderr)
+                size_results.update(functions)
+            results[str(size)] = size_results
+    finally:
+        await target.close()
+        shutil.rmtree(data_dir, ignore_errors=True)
+    return results
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], tolerance: float, min_delta_ms: float) -> List[str]:
+    """Print a per-scenario comparison and return the regressions."""
+    regressions = []
+    for mode, sizes in current.get("results", {}).items():
+        for size, scenarios in sizes.items():
+            for name, stats in scenarios.items():
+                before = baseline.get("results", {}).get(mode, {}).get(size, {}).get(name)
+                if not before:
+                    continue
+                changes = []
+                for metric in LATENCY_METRICS:
+                    if metric not in stats or not before.get(metric):
+                        continue
+                    ratio = stats[metric] / before[metric]
+                    changes.append(f"{metric}={stats[metric]:.2f} ({ratio - 1:+.0%})")
+                    if ratio > 1 + tolerance and stats[metric] - before[metric] > min_delta_ms:
+                        regressions.append(f"{mode}/{size}/{name}: {metric} {before[metric]:.2f} -> {stats[metric]:.2f}ms")
+                if before.get("throughput_rps") and "throughput_rps" in stats:
+                    ratio = stats["throughput_rps"] / before["throughput_rps"]
+                    changes.append(f"rps={stats['throughput_rps']:.1f} ({ratio - 1:+.0%})")
+                    if ratio < 1 - tolerance:
+                        regressions.append(
+                            f"{mode}/{size}/{name}: throughput {before['throughput_rps']:.1f} -> "
+                            f"{stats['throughput_rps']:.1f} req/s"
+                        )
+                if changes:
+                    print(f"{mode:<9} {size:>8} {name:<28} " + "  ".join(changes))
+    return regressions
+
+
+def _report_regressions(regressions: List[str], tolerance: float) -> int:
+    if not regressions:
+        print(f"\nNo regressions beyond {tolerance:.0%}.")
+        return 0
+    print(f"\n{len(regressions)} regression(s) beyond {tolerance:.0%}:")
+    for line in regressions:
+        print(f"  {line}")
+    return 1
+
+
+def command_run(args: argparse.Namespace) -> int:
+    modes = ["inprocess", "uvicorn"] if args.mode == "both" else [args.mode]
+    report: Dict[str, Any] = {
+        "meta": {
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "config": {
+                key: value for key, value in vars(args).items() if key not in {"func", "output", "compare"}
+            },
+        },
+        "results": {},
+    }
+    for mode in modes:
+        report["results"][mode] = asyncio.run(run_target(mode, args))
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.output).write_text(text, encoding="utf-8")
+    if args.save_baseline:
+        BASELINES_DIR.mkdir(parents=True, exist_ok=True)
+        (BASELINES_DIR / f"{args.save_baseline}.json").write_text(text, encoding="utf-8")
+    if not args.output and not args.save_baseline:
+        print(text)
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text(encoding="utf-8"))
+        return _report_regressions(compare(baseline, report, args.tolerance, args.min_delta_ms), args.tolerance)
+    return 0
+
+
+def command_compare(args: argparse.Namespace) -> int:
+    baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+    current = json.loads(Path(args.current).read_text(encoding="utf-8"))
+    return _report_regressions(compare(baseline, current, args.tolerance, args.min_delta_ms), args.tolerance)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Backend benchmarks and load tests.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="run the benchmarks")
+    run.add_argument("--mode", choices=["inprocess", "uvicorn", "both"], default="inprocess")
+    run.add_argument("--sizes", type=_int_list, default=[1000, 10000, 100000], help="QA history sizes, e.g. 1e3,1e6")
+    run.add_argument("--keywords", type=int, default=50, help="keyword-answer entries")
+    run.add_argument("--requests", type=int, default=200, help="requests per scenario")
+    run.add_argument("--concurrency", type=int, default=8, help="requests in flight")
+    run.add_argument("--gemini-latency-ms", type=float, default=50.0, help="fake Gemini response latency")
+    run.add_argument("--pdf-pages", type=_int_list, default=[1, 10, 50], help="resume PDF page counts")
+    run.add_argument("--scenarios", type=lambda value: value.split(","), help="glob filter, e.g. closed_*,health")
+    run.add_argument("--workers", type=int, default=1, help="uvicorn workers (uvicorn mode)")
+    run.add_argument("--seed", type=int, default=0)
+    run.add_argument("--skip-functions", action="store_true", help="skip the in-process function benchmarks")
+    run.add_argument("--linear-max", type=int, default=100000, help="largest history for the linear-scan benchmark")
+    run.add_argument("--output", help="write the JSON report here")
+    run.add_argument("--save-baseline", metavar="NAME", help=f"also save the report as {BASELINES_DIR.name}/NAME.json")
+    run.add_argument("--compare", metavar="BASELINE", help="compare against a saved report; exit 1 on regressions")
+    run.set_defaults(func=command_run)
+
+    diff = commands.add_parser("compare", help="compare two saved reports")
+    diff.add_argument("baseline")
+    diff.add_argument("current")
+    diff.set_defaults(func=command_compare)
+
+    for command in (run, diff):
+        command.add_argument("--tolerance", type=float, default=0.15, help="allowed relative slowdown")
+        command.add_argument("--min-delta-ms", type=float, default=1.0, help="ignore latency changes smaller than this")
+
+    args = parser.parse_args()
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
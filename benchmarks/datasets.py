@@ -0,0 +1,153 @@
+"""Synthetic data for the benchmarks: QA histories, keyword answers, resume PDFs and query mixes."""
+
+import random
+from typing import Any, Dict, List, Union
+
+from backend.matching import normalize_question
+
+# Question shapes seen on real application forms; {topic} and {detail} are filled in per entry.
+TEMPLATES = [
+    "Are you authorized to work in {topic}?",
+    "Will you now or in the future require sponsorship for {topic}?",
+    "How many years of experience do you have with {topic}?",
+    "Are you willing to relocate to {topic}?",
+    "Have you previously worked for {topic}?",
+    "Do you have a valid {topic} certification?",
+    "What is your expected salary for {topic} roles?",
+    "Are you comfortable with {topic} on a {detail} basis?",
+    "How did you hear about our {topic} opening?",
+    "Do you consent to {topic} background checks?",
+    "Which {topic} tools have you used in {detail} settings?",
+    "Can you start {topic} work within {detail} weeks?",
+]
+TOPICS = [
+    "the united states", "canada", "the european union", "python", "java", "kubernetes",
+    "machine learning", "customer support", "sql databases", "remote work", "on call rotations",
+    "our company", "a government agency", "security clearance", "aws", "react", "data analysis",
+    "project management", "travel", "night shifts", "sales", "cloud infrastructure", "mobile apps",
+]
+DETAILS = ["regular", "part time", "full time", "contract", "hybrid", "two", "four", "six", "weekly"]
+ANSWERS = ["Yes", "No", "Prefer not to say", "1-2 years", "3-5 years", "5+ years", "LinkedIn", "Referral"]
+INTENTS = [
+    "work_authorization", "sponsorship", "relocation", "gender", "veteran_status", "disability",
+    "race", "years_experience", "salary", "start_date", "referral_source", "background_check",
+]
+_LETTERS = "abcdefghijklmnopqrstuvwxyz"
+
+
+def _word(rng: random.Random) -> str:
+    return "".join(rng.choice(_LETTERS) for _ in range(rng.randint(3, 9)))
+
+
+def make_question(rng: random.Random) -> str:
+    question = rng.choice(TEMPLATES).format(topic=rng.choice(TOPICS), detail=rng.choice(DETAILS))
+    # A made-up qualifier keeps large histories from collapsing onto a few hundred keys.
+    return question.replace("?", f" ({_word(rng)} {_word(rng)})?")
+
+
+def make_history(size: int, seed: int = 0) -> Dict[str, Dict[str, Any]]:
+    """A QA history of exactly ``size`` entries, shaped like qa_history.json."""
+    rng = random.Random(seed)
+    history: Dict[str, Dict[str, Any]] = {}
+    while len(history) < size:
+        question = make_question(rng)
+        answer = rng.choice(ANSWERS)
+        history[normalize_question(question)] = {
+            "question": question,
+            "answer": answer,
+            "choices": rng.sample(ANSWERS, 3) if rng.random() < 0.5 else [],
+        }
+    return history
+
+
+def make_keyword_answers(size: int, seed: int = 0) -> Dict[str, str]:
+    """Intent -> answer map; the canonical intents come first, then generated ones."""
+    rng = random.Random(seed)
+    answers = {intent: rng.choice(ANSWERS) for intent in INTENTS[:size]}
+    while len(answers) < size:
+        answers[f"{rng.choice(INTENTS)}_{_word(rng)}"] = rng.choice(ANSWERS)
+    return answers
+
+
+def make_queries(history: Dict[str, Dict[str, Any]], count: int, seed: int = 0) -> List[str]:
+    """
+    Lookup questions: a third asked verbatim, a third reworded (a word dropped
+    or swapped, so only the similarity layer can answer) and a third unseen.
+    """
+    rng = random.Random(seed)
+    stored = [entry["question"] for entry in _sample_entries(history, min(count, len(history)), rng)]
+    queries = []
+    for position in range(count):
+        kind = position % 3
+        if kind == 0 and stored:
+            queries.append(rng.choice(stored))
+        elif kind == 1 and stored:
+            words = rng.choice(stored).rstrip("?").split()
+            if len(words) > 3:
+                words.pop(rng.randrange(len(words)))
+            words[rng.randrange(len(words))] = _word(rng)
+            queries.append(" ".join(words) + "?")
+        else:
+            queries.append(f"What is your {_word(rng)} {_word(rng)} preference?")
+    return queries
+
+
+def _sample_entries(history: Dict[str, Dict[str, Any]], count: int, rng: random.Random) -> List[Dict[str, Any]]:
+    values = list(history.values())
+    return rng.sample(values, count) if count < len(values) else values
+
+
+def make_pdf(pages: List[List[str]]) -> bytes:
+    """A minimal PDF with one Helvetica text page per list of lines."""
+    objects = []
+    count = len(pages)
+    kids = " ".join(f"{3 + 2 * i} 0 R" for i in range(count))
+    objects.append("<< /Type /Catalog /Pages 2 0 R >>")
+    objects.append(f"<< /Type /Pages /Kids [{kids}] /Count {count} >>")
+    font_id = 3 + 2 * count
+    for i, lines in enumerate(pages):
+        text = " ".join("(%s) '" % line.replace("(", "").replace(")", "").replace("\\", "") for line in lines)
+        content = f"BT /F1 11 Tf 50 780 Td 14 TL {text} ET"
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 {font_id} 0 R >> >> /Contents {4 + 2 * i} 0 R >>"
+        )
+        objects.append(f"<< /Length {len(content)} >>\nstream\n{content}\nendstream")
+    objects.append("<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+    out = b"%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("latin-1")
+    out += b"".join(f"{offset:010d} 00000 n \n".encode("latin-1") for offset in offsets)
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode("latin-1")
+    return out
+
+
+def make_resume_pdf(page_count: int, seed: Union[int, str] = 0) -> bytes:
+    """A resume-like PDF: contact details and sections on page one, experience filler after."""
+    rng = random.Random(seed)
+    first = [
+        f"Jordan {_word(rng).title()}",
+        f"jordan.{_word(rng)}@example.com | (555) {rng.randint(100, 999)}-{rng.randint(1000, 9999)}",
+        "linkedin.com/in/jordan-example | github.com/jordan-example",
+        "Summary",
+        f"Engineer with {rng.randint(2, 12)} years of experience in {rng.choice(TOPICS)}.",
+        "Skills",
+        ", ".join(rng.sample(TOPICS, 6)),
+        "Education",
+        f"B.S. Computer Science, {_word(rng).title()} University",
+    ]
+    pages = [first]
+    for number in range(1, page_count):
+        lines = [f"Experience (continued, page {number + 1})"]
+        lines += [
+            f"- Delivered {rng.choice(TOPICS)} work for {_word(rng)} team, improving {_word(rng)} by {rng.randint(5, 90)}%"
+            for _ in range(40)
+        ]
+        pages.append(lines)
+    return make_pdf(pages)
+
@@ -0,0 +1,225 @@
+"""Load generation, latency statistics and the two ways of hosting the app (in-process ASGI or uvicorn)."""
+
+import asyncio
+import os
+import resource
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import httpx
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+
+# One request: takes the request number, returns the HTTP status code.
+Request = Callable[[httpx.AsyncClient, int], Awaitable[int]]
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+
+def summarize(latencies: List[float], errors: int, elapsed: float) -> Dict[str, Any]:
+    ordered = sorted(latencies)
+    count = len(ordered)
+    return {
+        "requests": count + errors,
+        "errors": errors,
+        "p50_ms": round(percentile(ordered, 50) * 1000, 3),
+        "p95_ms": round(percentile(ordered, 95) * 1000, 3),
+        "p99_ms": round(percentile(ordered, 99) * 1000, 3),
+        "mean_ms": round(sum(ordered) / count * 1000, 3) if count else 0.0,
+        "max_ms": round(ordered[-1] * 1000, 3) if count else 0.0,
+        "throughput_rps": round(count / elapsed, 2) if elapsed > 0 else 0.0,
+    }
+
+
+def process_tree(pid: int) -> List[int]:
+    """``pid`` and all its descendants (Linux /proc only; elsewhere just ``pid``)."""
+    children: Dict[int, List[int]] = {}
+    for stat in Path("/proc").glob("[0-9]*/stat"):
+        try:
+            # The command name may contain spaces, so read the fields after its closing parenthesis.
+            parent = int(stat.read_text().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(parent, []).append(int(stat.parent.name))
+    tree = [pid]
+    for current in tree:
+        tree.extend(children.get(current, []))
+    return tree
+
+
+def _vm_hwm_kib(pid: int) -> Optional[int]:
+    try:
+        for line in Path(f"/proc/{pid}/status").read_text().splitlines():
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def peak_rss_mb(pid: Optional[int] = None) -> Optional[float]:
+    """
+    Peak resident set size in MiB of this process, or of ``pid`` together with
+    its descendants, if the platform reports it. With ``uvicorn --workers N``
+    the server pid is only a supervisor, so its workers (and their PDF pools)
+    are summed in; that is an upper bound, since their peaks need not coincide.
+    """
+    if pid is None or pid == os.getpid():
+        own = _vm_hwm_kib(os.getpid())
+        if own is None:
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            # ru_maxrss is KiB on Linux and bytes on macOS.
+            return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+        return round(own / 1024, 1)
+    peaks = [_vm_hwm_kib(member) for member in process_tree(pid)]
+    if peaks[0] is None:
+        return None
+    return round(sum(peak for peak in peaks if peak is not None) / 1024, 1)
+
+
+def reset_peak_rss(pid: Optional[int] = None) -> None:
+    """Restart the VmHWM high-water marks (Linux only) so the next reading covers one scenario."""
+    members = [os.getpid()] if pid is None or pid == os.getpid() else process_tree(pid)
+    for member in members:
+        try:
+            Path(f"/proc/{member}/clear_refs").write_text("5")
+        except OSError:
+            pass
+
+
+async def run_load(client: httpx.AsyncClient, request: Request, total: int, concurrency: int) -> Dict[str, Any]:
+    """Issue ``total`` requests with at most ``concurrency`` in flight; non-2xx/3xx responses count as errors."""
+    latencies: List[float] = []
+    errors = 0
+    counter = iter(range(total))
+
+    async def worker() -> None:
+        nonlocal errors
+        for number in counter:
+            started = time.perf_counter()
+            try:
+                status = await request(client, number)
+            except httpx.HTTPError:
+                status = 0
+            if 200 <= status < 400:
+                latencies.append(time.perf_counter() - started)
+            else:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(max(1, min(concurrency, total)))))
+    return summarize(latencies, errors, time.perf_counter() - started)
+
+
+def bench_environment(data_dir: Path, gemini_latency_ms: float) -> Dict[str, str]:
+    """Environment for a benchmarked backend: isolated data dir and the fake Gemini SDK."""
+    return {
+        "BACKEND_DATA_DIR": str(data_dir),
+        "GEMINI_BACKEND": "fake",
+        "GEMINI_API_KEY": "benchmark",
+        "FAKE_GEMINI_LATENCY_MS": str(gemini_latency_ms),
+        "FAKE_GEMINI_CHUNK_LATENCY_MS": str(gemini_latency_ms / 10),
+    }
+
+
+class InProcessTarget:
+    """Drives ``backend.main.app`` through httpx's ASGI transport in this process."""
+
+    name = "inprocess"
+
+    def __init__(self, data_dir: Path, gemini_latency_ms: float) -> None:
+        os.environ.update(bench_environment(data_dir, gemini_latency_ms))
+        # Imported late so the environment above decides where the app keeps its data.
+        from backend import main
+
+        self.main = main
+        self.pid = os.getpid()
+        self.client = httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=main.app), base_url="http://bench", timeout=120
+        )
+
+    def seed(self, history: Dict[str, Any], keyword_answers: Dict[str, Any]) -> None:
+        store = self.main.profiles.default.store
+        store.replace_table(self.main.QA_HISTORY_TABLE, history)
+        store.replace_table(self.main.KEYWORD_ANSWERS_TABLE, keyword_answers)
+        self.main.reset_question_index()
+
+    async def close(self) -> None:
+        await self.client.aclose()
+        self.main.pdf_extractor.shutdown()
+
+
+class UvicornTarget:
+    """Runs the app under uvicorn in a subprocess and drives it over HTTP."""
+
+    name = "uvicorn"
+
+    def __init__(self, data_dir: Path, gemini_latency_ms: float, workers: int = 1) -> None:
+        self.data_dir = data_dir
+        self.env = {**os.environ, **bench_environment(data_dir, gemini_latency_ms)}
+        self.workers = workers
+        self.process: Optional[subprocess.Popen] = None
+        self.client: Optional[httpx.AsyncClient] = None
+        self.pid: Optional[int] = None
+
+    def seed(self, history: Dict[str, Any], keyword_answers: Dict[str, Any]) -> None:
+        """Write the stores directly; the server (re)starts afterwards so it starts from this data."""
+        from backend.store import KEYWORD_ANSWERS_TABLE, QA_HISTORY_TABLE, AnswerStore
+
+        store = AnswerStore(self.data_dir / "answers.sqlite3")
+        store.replace_table(QA_HISTORY_TABLE, history)
+        store.replace_table(KEYWORD_ANSWERS_TABLE, keyword_answers)
+        store.close()
+
+    async def start(self) -> None:
+        await self.stop()
+        with socket.socket() as probe:
+            probe.bind(("127.0.0.1", 0))
+            port = probe.getsockname()[1]
+        self.process = subprocess.Popen(
+            [
+                sys.executable, "-m", "uvicorn", "backend.main:app",
+                "--host", "127.0.0.1", "--port", str(port),
+                "--workers", str(self.workers), "--log-level", "warning",
+            ],
+            cwd=ROOT_DIR,
+            env=self.env,
+        )
+        self.pid = self.process.pid
+        self.client = httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=120)
+        deadline = time.monotonic() + 60
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"uvicorn exited with code {self.process.returncode}")
+            try:
+                if (await self.client.get("/health")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.1)
+        raise RuntimeError("uvicorn did not become healthy within 60s")
+
+    async def stop(self) -> None:
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+        if self.process is not None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+            self.process = None
+
+    async def close(self) -> None:
+        await self.stop()
@@ -0,0 +1,211 @@
+"""
+What gets measured. HTTP scenarios run through either target; function
+scenarios time backend internals directly and only run in-process.
+"""
+
+import json
+import time
+from typing import Any, Awaitable, Callable, Dict, List, NamedTuple, Optional
+
+import httpx
+
+from backend.compaction import plan_compaction
+from backend.matching import QuestionIndex, find_similar_question, normalize_question
+
+from .datasets import make_queries, make_resume_pdf
+from .harness import Request, summarize
+
+
+class BenchContext(NamedTuple):
+    history: Dict[str, Dict[str, Any]]
+    queries: List[str]
+    requests: int
+    pdf_pages: List[int]
+    seed: int
+    # Distinguishes runs that share a data dir, so "unique" requests never hit earlier caches.
+    tag: str
+
+
+class Scenario(NamedTuple):
+    name: str
+    build: Callable[[BenchContext], Request]
+    # Cap for expensive endpoints (e.g. dumping a 1M-entry history).
+    max_requests: Optional[int] = None
+    # Runs once before the load, e.g. to make sure a resume is cached.
+    setup: Optional[Callable[[httpx.AsyncClient, BenchContext], Awaitable[None]]] = None
+
+
+def _post_json(path: str, body: Callable[[int], Dict[str, Any]]) -> Request:
+    async def request(client: httpx.AsyncClient, number: int) -> int:
+        return (await client.post(path, json=body(number))).status_code
+
+    return request
+
+
+def _get(path: str) -> Request:
+    async def request(client: httpx.AsyncClient, number: int) -> int:
+        return (await client.get(path)).status_code
+
+    return request
+
+
+def _closed_lookup(top_k: Optional[int] = None) -> Callable[[BenchContext], Request]:
+    def build(ctx: BenchContext) -> Request:
+        def body(number: int) -> Dict[str, Any]:
+            payload: Dict[str, Any] = {"question": ctx.queries[number % len(ctx.queries)]}
+            if top_k:
+                payload["top_k"] = top_k
+            return payload
+
+        return _post_json("/closed-question", body)
+
+    return build
+
+
+def _closed_batch(ctx: BenchContext) -> Request:
+    def body(number: int) -> Dict[str, Any]:
+        start = number * 20
+        return {"items": [{"question": ctx.queries[(start + i) % len(ctx.queries)]} for i in range(20)]}
+
+    return _post_json("/closed-question/batch", body)
+
+
+def _closed_store(ctx: BenchContext) -> Request:
+    return _post_json(
+        "/closed-question",
+        lambda number: {"question": f"Benchmark stored question {ctx.tag} {number}?", "answer": "Yes"},
+    )
+
+
+def _open_question(unique: bool) -> Callable[[BenchContext], Request]:
+    def build(ctx: BenchContext) -> Request:
+        def body(number: int) -> Dict[str, Any]:
+            suffix = f" ({ctx.tag}-{number})" if unique else ""
+            return {
+                "question": f"Why do you want to work here?{suffix}",
+                "job_context": {"company": "Example Corp", "role": "Software Engineer"},
+            }
+
+        return _post_json("/open-question", body)
+
+    return build
+
+
+def _open_stream(ctx: BenchContext) -> Request:
+    async def request(client: httpx.AsyncClient, number: int) -> int:
+        body = {"question": f"Describe a project you are proud of ({ctx.tag}-{number})"}
+        async with client.stream("POST", "/open-question/stream", json=body) as response:
+            async for _chunk in response.aiter_bytes():
+                pass
+            return response.status_code
+
+    return request
+
+
+def _open_batch(ctx: BenchContext) -> Request:
+    return _post_json(
+        "/open-question/batch",
+        lambda number: {"questions": [f"Tell us about strength {i} ({ctx.tag}-{number})" for i in range(5)]},
+    )
+
+
+def _parse_resume(pages: int, unique: bool) -> Callable[[BenchContext], Request]:
+    def build(ctx: BenchContext) -> Request:
+        # Generated up front so PDF construction is not part of the measured latency.
+        variants = ctx.requests if unique else 1
+        pdfs = [make_resume_pdf(pages, seed=f"{ctx.tag}-{pages}-{number}") for number in range(variants)]
+
+        async def request(client: httpx.AsyncClient, number: int) -> int:
+            files = {"file": ("resume.pdf", pdfs[number % len(pdfs)], "application/pdf")}
+            return (await client.post("/parse-resume", files=files)).status_code
+
+        return request
+
+    return build
+
+
+async def _ensure_resume(client: httpx.AsyncClient, ctx: BenchContext) -> None:
+    files = {"file": ("resume.pdf", make_resume_pdf(2, seed=ctx.tag), "application/pdf")}
+    (await client.post("/parse-resume", files=files)).raise_for_status()
+
+
+def _resume_conditional(ctx: BenchContext) -> Request:
+    etag: Dict[str, str] = {}
+
+    async def request(client: httpx.AsyncClient, number: int) -> int:
+        headers = {"If-None-Match": etag["value"]} if "value" in etag else {}
+        response = await client.get("/resume", headers=headers)
+        if "etag" in response.headers:
+            etag["value"] = response.headers["etag"]
+        return response.status_code
+
+    return request
+
+
+def http_scenarios(pdf_pages: List[int]) -> List[Scenario]:
+    scenarios = [
+        Scenario("health", lambda ctx: _get("/health")),
+        Scenario("closed_lookup", _closed_lookup()),
+        Scenario("closed_lookup_top5", _closed_lookup(top_k=5)),
+        Scenario("closed_batch_20", _closed_batch),
+        Scenario("closed_store", _closed_store),
+        Scenario("open_question", _open_question(unique=True)),
+        Scenario("open_question_cached", _open_question(unique=False)),
+        Scenario("open_question_stream", _open_stream),
+        Scenario("open_batch_5", _open_batch),
+        Scenario("resume_get", lambda ctx: _get("/resume"), setup=_ensure_resume),
+        Scenario("resume_get_etag", _resume_conditional, setup=_ensure_resume),
+        Scenario("qa_history", lambda ctx: _get("/qa-history"), max_requests=20),
+        Scenario("qa_history_page", lambda ctx: _get("/qa-history/entries?limit=100&prefix=are%20you")),
+        Scenario("qa_history_changes", lambda ctx: _get("/qa-history/changes?since=0&limit=500")),
+    ]
+    for pages in pdf_pages:
+        scenarios.append(Scenario(f"parse_resume_{pages}p", _parse_resume(pages, unique=True), max_requests=50))
+    scenarios.append(Scenario("parse_resume_reused", _parse_resume(pdf_pages[0] if pdf_pages else 1, unique=False)))
+    return scenarios
+
+
+def _time_calls(call: Callable[[int], Any], count: int) -> Dict[str, Any]:
+    latencies = []
+    started = time.perf_counter()
+    for number in range(count):
+        began = time.perf_counter()
+        call(number)
+        latencies.append(time.perf_counter() - began)
+    return summarize(latencies, 0, time.perf_counter() - started)
+
+
+def function_benchmarks(main: Any, ctx: BenchContext, requests: int, linear_max: int) -> Dict[str, Dict[str, Any]]:
+    """Time backend internals directly against the seeded history (``main`` is backend.main)."""
+    history = ctx.history
+    normalized = [normalize_question(query) for query in make_queries(history, requests, seed=ctx.seed + 1)]
+    results: Dict[str, Dict[str, Any]] = {}
+
+    if len(history) <= linear_max:
+        results["fn:find_similar_question"] = _time_calls(
+            lambda n: find_similar_question(normalized[n], history), min(requests, 20)
+        )
+
+    def rebuild(_number: int) -> None:
+        main.reset_question_index()
+        main.get_question_index()
+
+    results["fn:question_index_build"] = _time_calls(rebuild, 3 if len(history) <= 100_000 else 1)
+    index = main.get_question_index()
+    results["fn:question_index_top1"] = _time_calls(
+        lambda n: index.top_k(normalized[n], k=1, threshold=main.SIMILARITY_THRESHOLD), requests
+    )
+    results["fn:question_index_top5"] = _time_calls(lambda n: index.top_k(normalized[n], k=5, threshold=0.3), requests)
+    if not isinstance(index, QuestionIndex):
+        token_index = QuestionIndex.from_history(history)
+        results["fn:token_index_top1"] = _time_calls(
+            lambda n: token_index.find_similar(normalized[n], threshold=0.6), requests
+        )
+
+    results["fn:load_json_history"] = _time_calls(lambda n: main.load_json(main.QA_HISTORY_PATH, {}), 3)
+    results["fn:save_json_history"] = _time_calls(lambda n: main.save_json(main.QA_HISTORY_PATH, history), 3)
+    results["fn:history_json_dumps"] = _time_calls(lambda n: json.dumps(history), 3)
+    rows = main.profiles.default.store.history_rows()
+    results["fn:compaction_plan"] = _time_calls(lambda n: plan_compaction(rows), 1)
+    main.reset_question_index()
+    return results
@@ -1,6 +1,7 @@
 const DEFAULT_CONFIG = {
   backendUrl: "http://localhost:8000",
-  autoDraftOpenEnded: true
+  autoDraftOpenEnded: true,
+  profile: ""
 };
 
 chrome.runtime.onInstalled.addListener(async () => {
@@ -20,7 +21,7 @@ chrome.runtime.onInstalled.addListener(async () => {
 chrome.runtime.onMessage.addListener((message, sender, sendResponse) => {
   if (message.type === "get-config") {
     chrome.storage.sync
-      .get(["backendUrl", "autoDraftOpenEnded"])
+      .get(["backendUrl", "autoDraftOpenEnded", "profile"])
       .then((config) => sendResponse({ ...DEFAULT_CONFIG, ...config }));
     return true; // async
   }
@@ -1,19 +1,29 @@
 const STATE = {
   backendUrl: null,
+  profile: "",
   resume: null,
-  qaCache: {}
+  qaCache: {},
+  mirror: null
 };
 
 let INITIALIZED = false;
 
 const BUTTON_ID = "job-app-filler-button";
 const NOTIFICATION_ID = "job-app-filler-notification";
+// Questions per /open-question/batch request; matches the backend's default OPEN_BATCH_MAX_QUESTIONS.
+const OPEN_BATCH_MAX_QUESTIONS = 50;
 
 async function getConfig() {
-  const fromStorage = await chrome.storage.sync.get(["backendUrl", "autoDraftOpenEnded"]);
+  const fromStorage = await chrome.storage.sync.get(["backendUrl", "autoDraftOpenEnded", "profile"]);
   const backendUrl = (fromStorage.backendUrl || "http://localhost:8000").replace(/\/$/, "");
   const autoDraftOpenEnded = fromStorage.autoDraftOpenEnded !== false;
-  return { backendUrl, autoDraftOpenEnded };
+  const profile = (fromStorage.profile || "").trim();
+  return { backendUrl, autoDraftOpenEnded, profile };
+}
+
+function backendHeaders(headers = {}) {
+  // A shared backend keeps one answer store per profile; without the header the default profile is used.
+  return STATE.profile ? { ...headers, "X-Profile": STATE.profile } : headers;
 }
 
 function ensureButton() {
@@ -98,19 +108,93 @@ function showNotification(message, type = "success") {
   }, 4000);
 }
 
+const RESUME_STORAGE_KEY = "resumeCache";
+
 async function fetchResume() {
   if (STATE.resume) return STATE.resume;
   if (!STATE.backendUrl) return null;
   try {
-    const res = await fetch(`${STATE.backendUrl}/resume`);
+    // Revalidate the locally stored copy with its ETag so an unchanged resume is not downloaded again.
+    const stored = (await chrome.storage.local.get(RESUME_STORAGE_KEY))[RESUME_STORAGE_KEY];
+    const usable =
+      stored && stored.backendUrl === STATE.backendUrl && stored.profile === STATE.profile && stored.etag && stored.resume;
+    const headers = usable ? { "If-None-Match": stored.etag } : {};
+    const res = await fetch(`${STATE.backendUrl}/resume`, { headers: backendHeaders(headers) });
+    if (res.status === 304 && usable) {
+      STATE.resume = stored.resume;
+      return STATE.resume;
+    }
     if (!res.ok) throw new Error("resume missing");
     STATE.resume = await res.json();
+    const etag = res.headers.get("ETag");
+    if (etag) {
+      await chrome.storage.local.set({
+        [RESUME_STORAGE_KEY]: { backendUrl: STATE.backendUrl, profile: STATE.profile, etag, resume: STATE.resume }
+      });
+    }
     return STATE.resume;
   } catch (_err) {
     return null;
   }
 }
 
+const MIRROR_STORAGE_KEY = "qaMirror";
+
+function normalizeQuestion(text) {
+  // Same normalization as the backend's normalize_question, so mirror keys match history keys.
+  return (text || "").toLowerCase().replace(/[^a-z0-9 ]/g, " ").split(" ").filter(Boolean).join(" ");
+}
+
+async function syncHistoryMirror() {
+  // Keep a local copy of stored answers by pulling only what changed since the last sync.
+  const stored = (await chrome.storage.local.get(MIRROR_STORAGE_KEY))[MIRROR_STORAGE_KEY];
+  const fresh = { backendUrl: STATE.backendUrl, profile: STATE.profile, version: 0, entries: {}, intents: {}, aliases: {} };
+  const current = stored && stored.backendUrl === STATE.backendUrl && stored.profile === STATE.profile;
+  let mirror = current ? { aliases: {}, ...stored } : fresh;
+  STATE.mirror = mirror;
+  for (;;) {
+    const res = await fetch(`${STATE.backendUrl}/qa-history/changes?since=${mirror.version}&limit=1000`, {
+      headers: backendHeaders()
+    });
+    if (!res.ok) throw new Error(`history sync failed: HTTP ${res.status}`);
+    const data = await res.json();
+    if (data.version < mirror.version) {
+      // The backend store was replaced; start over.
+      mirror = { ...fresh, entries: {}, intents: {}, aliases: {} };
+      continue;
+    }
+    for (const change of data.changes || []) {
+      const bucket = change.kind === "qa" ? mirror.entries : mirror.intents;
+      if (change.deleted) delete bucket[change.key];
+      else bucket[change.key] = change.kind === "qa" ? change.entry?.answer : change.answer;
+      // Wordings merged into this entry by history compaction answer with it.
+      if (change.kind === "qa" && !change.deleted) {
+        for (const alias of change.entry?.aliases || []) mirror.aliases[alias.key] = change.key;
+      }
+    }
+    mirror.version = data.next_since;
+    if (!data.has_more) break;
+  }
+  STATE.mirror = mirror;
+  await chrome.storage.local.set({ [MIRROR_STORAGE_KEY]: mirror });
+  return mirror;
+}
+
+function mirrorAnswers(items) {
+  // Offline fallback: exact matches and intent answers from the last synced mirror.
+  const mirror = STATE.mirror;
+  return items.map((item) => {
+    if (!mirror || !item.question) return null;
+    const key = normalizeQuestion(item.question);
+    return (
+      mirror.entries[key] ||
+      mirror.entries[mirror.aliases[key]] ||
+      (item.intent && mirror.intents[item.intent]) ||
+      null
+    );
+  });
+}
+
 function getLabelText(el) {
   if (!el) return "";
   const id = el.id ? `[for="${el.id}"]` : null;
@@ -399,54 +483,155 @@ function gatherChoices(field) {
   return [];
 }
 
-async function lookupClosedAnswer(question, intent = null) {
-  const cacheHit = STATE.qaCache[question];
-  if (cacheHit) return cacheHit;
-  const res = await fetch(`${STATE.backendUrl}/closed-question`, {
+function parseServerTiming(header) {
+  // "closed.exact;dur=0.12, total;dur=2.40" -> { "closed.exact": 0.12, total: 2.4 }
+  const timings = {};
+  (header || "").split(",").forEach((entry) => {
+    const [name, ...params] = entry.trim().split(";");
+    const dur = params.find((param) => param.trim().startsWith("dur="));
+    if (name && dur) timings[name] = Number(dur.trim().slice(4));
+  });
+  return timings;
+}
+
+function logTimingBreakdown(label, response, rows) {
+  // Per-field timings from the backend (ms per matching layer) plus the request-level Server-Timing.
+  console.groupCollapsed(`⏱ ${label}: ${rows.length} field(s)`);
+  console.table(rows);
+  console.table(parseServerTiming(response.headers.get("Server-Timing")));
+  console.groupEnd();
+}
+
+function timingRow(question, result) {
+  return {
+    question,
+    source: result?.stored ? "stored" : result?.source || "miss",
+    score: result?.score ?? "",
+    ...(result?.timings || {})
+  };
+}
+
+async function lookupClosedAnswers(items) {
+  // Resolve every uncached question in a single round trip; answers come back in input order.
+  const answers = items.map((item) => STATE.qaCache[item.question] || null);
+  const missing = [];
+  items.forEach((item, idx) => {
+    if (!answers[idx] && item.question) missing.push(idx);
+  });
+  if (!missing.length) return answers;
+
+  const res = await fetch(`${STATE.backendUrl}/closed-question/batch`, {
     method: "POST",
-    headers: { "Content-Type": "application/json" },
-    body: JSON.stringify({ question, intent })
+    headers: backendHeaders({ "Content-Type": "application/json" }),
+    body: JSON.stringify({
+      items: missing.map((idx) => ({ question: items[idx].question, intent: items[idx].intent || null }))
+    })
   });
+  if (!res.ok) throw new Error(`batch lookup failed: HTTP ${res.status}`);
   const data = await res.json();
-  if (data.found && data.answer) {
-    STATE.qaCache[question] = data.answer;
-    return data.answer;
-  }
-  return null;
+  logTimingBreakdown(
+    "closed-question lookup",
+    res,
+    (data.results || []).map((result, pos) => timingRow(items[missing[pos]].question, result))
+  );
+  (data.results || []).forEach((result, pos) => {
+    const idx = missing[pos];
+    if (result.found && result.answer) {
+      STATE.qaCache[items[idx].question] = result.answer;
+      answers[idx] = result.answer;
+    }
+  });
+  return answers;
 }
 
-async function storeClosedAnswer(question, answer, choices = [], intent = null) {
-  if (!answer) return { success: false, updated: false, question };
-  
+function fieldType(item) {
+  if (item.group) return "buttons";
+  const field = item.field;
+  if (!field) return "";
+  return field.tagName === "INPUT" ? (field.type || "text").toLowerCase() : field.tagName.toLowerCase();
+}
+
+async function resolveFormPlan(items) {
+  // Resolve the whole form at once; the backend caches the plan under the form's structure,
+  // so a template seen before (same questions, field types and choices) is one hash lookup.
+  const res = await fetch(`${STATE.backendUrl}/form-plan`, {
+    method: "POST",
+    headers: backendHeaders({ "Content-Type": "application/json" }),
+    body: JSON.stringify({
+      fields: items.map((item) => ({
+        question: item.question || "",
+        type: fieldType(item),
+        choices: item.choices || [],
+        intent: item.intent || null
+      }))
+    })
+  });
+  if (!res.ok) throw new Error(`form plan failed: HTTP ${res.status}`);
+  const data = await res.json();
+  logTimingBreakdown(
+    `form plan (${data.status}, ${data.resolved} resolved, ${data.reused} reused)`,
+    res,
+    (data.fields || []).map((result) => timingRow(result.question, result))
+  );
+  return (data.fields || []).map((result, idx) => {
+    if (!result.found || !result.answer) return null;
+    STATE.qaCache[items[idx].question] = result.answer;
+    return result.answer;
+  });
+}
+
+async function storeClosedAnswers(items) {
+  // Store many answers with a single request so the backend writes its stores once.
+  const valid = items.filter((item) => item.answer);
+  if (!valid.length) return [];
+
   try {
-    const response = await fetch(`${STATE.backendUrl}/closed-question`, {
+    const response = await fetch(`${STATE.backendUrl}/closed-question/batch`, {
       method: "POST",
-      headers: { "Content-Type": "application/json" },
-      body: JSON.stringify({ question, answer, choices, intent })
+      headers: backendHeaders({ "Content-Type": "application/json" }),
+      body: JSON.stringify({
+        items: valid.map(({ question, answer, choices, intent }) => ({
+          question,
+          answer,
+          choices: choices || [],
+          intent: intent || null
+        }))
+      })
     });
-    
+
     if (!response.ok) {
-      console.error(`Failed to save answer for "${question}": HTTP ${response.status}`);
-      return { success: false, updated: false, question };
+      console.error(`Failed to save ${valid.length} answers: HTTP ${response.status}`);
+      return valid.map(({ question }) => ({ success: false, updated: false, question }));
     }
-    
+
     const data = await response.json();
-    STATE.qaCache[question] = answer;
-    
-    const wasUpdated = data.updated || false;
-    if (wasUpdated) {
-      console.log(`✅ Updated answer for "${question}" to "${answer}"`);
-    } else {
-      console.log(`✅ Saved answer for "${question}": "${answer}"`);
-    }
-    
-    return { success: true, updated: wasUpdated, question };
+    logTimingBreakdown(
+      "closed-question store",
+      response,
+      valid.map(({ question }, idx) => timingRow(question, data.results?.[idx]))
+    );
+    return valid.map(({ question, answer }, idx) => {
+      const wasUpdated = data.results?.[idx]?.updated || false;
+      STATE.qaCache[question] = answer;
+      if (wasUpdated) {
+        console.log(`✅ Updated answer for "${question}" to "${answer}"`);
+      } else {
+        console.log(`✅ Saved answer for "${question}": "${answer}"`);
+      }
+      return { success: true, updated: wasUpdated, question };
+    });
   } catch (err) {
-    console.error(`❌ Error saving answer for "${question}":`, err);
-    return { success: false, updated: false, question };
+    console.error(`❌ Error saving ${valid.length} answers:`, err);
+    return valid.map(({ question }) => ({ success: false, updated: false, question }));
   }
 }
 
+async function storeClosedAnswer(question, answer, choices = [], intent = null) {
+  if (!answer) return { success: false, updated: false, question };
+  const [result] = await storeClosedAnswers([{ question, answer, choices, intent }]);
+  return result;
+}
+
 function setFieldValue(field, value) {
   if (field.tagName === "SELECT") {
     for (const opt of field.options) {
@@ -599,24 +784,164 @@ function attachClosedListener(field, question, choices) {
   }
 }
 
+async function readEventStream(response, onEvent) {
+  // Minimal Server-Sent Events parser over a fetch() body.
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+  while (true) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    let boundary;
+    while ((boundary = buffer.indexOf("\n\n")) !== -1) {
+      const raw = buffer.slice(0, boundary);
+      buffer = buffer.slice(boundary + 2);
+      let event = "message";
+      const dataLines = [];
+      raw.split("\n").forEach((line) => {
+        if (line.startsWith("event:")) event = line.slice(6).trim();
+        else if (line.startsWith("data:")) dataLines.push(line.slice(5).trimStart());
+      });
+      if (dataLines.length) onEvent(event, JSON.parse(dataLines.join("\n")));
+    }
+  }
+}
+
+function writeDraftProgress(field, text) {
+  field.value = text;
+  field.dispatchEvent(new Event("input", { bubbles: true }));
+}
+
 async function handleOpenEnded(field, question, config) {
   if (!config.autoDraftOpenEnded || field.value.trim()) return;
-  const resumeSummary = STATE.resume?.summary || "";
-  const jobContext = {
+  const jobContext = pageJobContext();
+  try {
+    const res = await fetch(`${STATE.backendUrl}/open-question/stream`, {
+      method: "POST",
+      headers: backendHeaders({ "Content-Type": "application/json", Accept: "text/event-stream" }),
+      // No resume_summary: the backend picks the resume sections relevant to each question itself.
+      body: JSON.stringify({ question, job_context: jobContext })
+    });
+    if (!res.ok || !res.body) return;
+    // Write tokens into the field as they arrive; stop if the user starts typing.
+    let written = "";
+    await readEventStream(res, (event, data) => {
+      if (field.value !== written) return;
+      if (event === "delta") {
+        written += data.text || "";
+        writeDraftProgress(field, written);
+      } else if (event === "reset") {
+        written = "";
+        writeDraftProgress(field, written);
+      } else if (event === "done" && data.draft && data.draft !== written) {
+        written = data.draft;
+        writeDraftProgress(field, written);
+      }
+      if (event === "done") {
+        logTimingBreakdown("open-question draft", res, [{
+          question,
+          source: data.source,
+          cached: data.cached,
+          first_token_ms: Math.round(data.first_token_ms ?? 0),
+          total_ms: Math.round(data.total_ms ?? 0)
+        }]);
+      }
+    });
+  } catch (_err) {
+    // ignore failures; user can still type manually
+  }
+}
+
+const JOB_DESCRIPTION_SELECTORS = [
+  "[data-automation-id='jobPostingDescription']",
+  "[class*='job-description' i]",
+  "[id*='job-description' i]",
+  "[class*='jobDescription']",
+  "[class*='posting-description' i]",
+  "article"
+];
+
+function pageJobDescription() {
+  // The backend digests and caches the posting, so sending it in full costs one upload per page.
+  for (const selector of JOB_DESCRIPTION_SELECTORS) {
+    const text = document.querySelector(selector)?.innerText?.trim();
+    if (text && text.length > 200) return text.slice(0, 50000);
+  }
+  return null;
+}
+
+function pageJobContext() {
+  return {
     url: window.location.href,
     role: document.title,
-    company: window.location.hostname
+    company: window.location.hostname,
+    job_description: pageJobDescription()
   };
+}
+
+async function readNdjsonStream(response, onLine) {
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+  while (true) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    let newline;
+    while ((newline = buffer.indexOf("\n")) !== -1) {
+      const line = buffer.slice(0, newline).trim();
+      buffer = buffer.slice(newline + 1);
+      if (line) onLine(JSON.parse(line));
+    }
+  }
+  if (buffer.trim()) onLine(JSON.parse(buffer));
+}
+
+async function handleOpenEndedBatch(items, config) {
+  // Draft all open-ended fields concurrently; fill each one as its draft completes.
+  if (!config.autoDraftOpenEnded) return;
+  const targets = items.filter((item) => !item.field.value.trim());
+  if (targets.length <= 1) {
+    for (const item of targets) await handleOpenEnded(item.field, item.question, config);
+    return;
+  }
+  for (let start = 0; start < targets.length; start += OPEN_BATCH_MAX_QUESTIONS) {
+    await draftOpenEndedChunk(targets.slice(start, start + OPEN_BATCH_MAX_QUESTIONS), config);
+  }
+}
+
+async function draftOpenEndedChunk(targets, config) {
   try {
-    const res = await fetch(`${STATE.backendUrl}/open-question`, {
+    const res = await fetch(`${STATE.backendUrl}/open-question/batch`, {
       method: "POST",
-      headers: { "Content-Type": "application/json" },
-      body: JSON.stringify({ question, job_context: jobContext, resume_summary: resumeSummary })
+      headers: backendHeaders({ "Content-Type": "application/json" }),
+      body: JSON.stringify({
+        questions: targets.map((item) => item.question),
+        job_context: pageJobContext(),
+        stream: true
+      })
     });
-    const data = await res.json();
-    if (data.draft) {
-      setFieldValue(field, data.draft);
+    if (res.status === 422) {
+      // The backend was configured with a smaller batch limit: draft these one at a time.
+      for (const item of targets) await handleOpenEnded(item.field, item.question, config);
+      return;
     }
+    if (!res.ok || !res.body) return;
+    const rows = [];
+    await readNdjsonStream(res, (result) => {
+      if (result.done) return;
+      const item = targets[result.index];
+      if (item && result.draft) setFieldValue(item.field, result.draft);
+      rows.push({
+        question: result.question,
+        source: result.source,
+        cached: result.cached,
+        prompt_tokens: result.prompt_budget?.used ?? "",
+        elapsed_ms: Math.round(result.elapsed_ms ?? 0)
+      });
+    });
+    logTimingBreakdown("open-question drafts", res, rows);
   } catch (_err) {
     // ignore failures; user can still type manually
   }
@@ -625,11 +950,15 @@ async function handleOpenEnded(field, question, config) {
 async function handleAutoFill() {
   const config = await getConfig();
   STATE.backendUrl = config.backendUrl;
+  STATE.profile = config.profile;
+  const mirrorSync = syncHistoryMirror().catch(() => STATE.mirror);
   const resume = await fetchResume();
   const fields = Array.from(document.querySelectorAll("input, textarea, select")).filter(
     (el) => !el.disabled && el.offsetParent !== null
   );
 
+  // First pass: classify every field so all stored-answer lookups go out in one request.
+  const pending = [];
   for (const field of fields) {
     const question = getQuestionText(field);
     const intent = detectIntent(question);
@@ -637,19 +966,7 @@ async function handleAutoFill() {
 
     if (isClosedField(field)) {
       attachClosedListener(field, question, choices);
-      try {
-        const answer = await lookupClosedAnswer(question, intent);
-        if (answer) setFieldValue(field, answer);
-        else if (intent === "referral-source" && choices.length) {
-          const pick = chooseClosestChoice(choices, "company website");
-          if (pick) {
-            setFieldValue(field, pick);
-            await storeClosedAnswer(question, pick, choices, intent);
-          }
-        }
-      } catch (_err) {
-        // ignore lookup failure
-      }
+      pending.push({ kind: "closed", field, question, intent, choices });
       continue;
     }
 
@@ -660,64 +977,85 @@ async function handleAutoFill() {
     }
 
     if (field.tagName === "INPUT") {
-      try {
-        const stored = await lookupClosedAnswer(question, intent);
-        if (stored) {
-          setFieldValue(field, stored);
-          continue;
-        }
-      } catch (_err) {
-        // ignore lookup failure
-      }
-      // If intent is known, prefer stored answers to avoid AI drafts
-      if (intent) {
-        const stored = await lookupClosedAnswer(question, intent);
-        if (stored) {
-          setFieldValue(field, stored);
-          continue;
-        }
-      }
+      pending.push({ kind: "input", field, question, intent });
+      continue;
     }
 
     if (isOpenEnded(field)) {
       // For known contact/profile intents in textareas, reuse stored answers and skip Gemini
-      if (intent) {
-        try {
-          const stored = await lookupClosedAnswer(question, intent);
-          if (stored) {
-            setFieldValue(field, stored);
-            continue;
-          }
-        } catch (_err) {
-          // ignore
-        }
-      }
-      await handleOpenEnded(field, question, config);
+      pending.push({ kind: intent ? "open-known" : "open", field, question, intent });
     }
   }
 
   const buttonGroups = getButtonGroups();
-  for (const group of buttonGroups) {
+  const groupItems = buttonGroups.map((group) => {
     attachButtonListeners(group);
+    return {
+      kind: "buttons",
+      group,
+      question: group.question,
+      intent: detectIntent(group.question),
+      choices: group.buttons.map((b) => b.textContent?.trim() || "")
+    };
+  });
+
+  const lookups = pending.filter((item) => item.kind !== "open").concat(groupItems);
+  let answers = [];
+  if (lookups.length) {
     try {
-      const answer = await lookupClosedAnswer(group.question, detectIntent(group.question));
-      const intent = detectIntent(group.question);
-      if (answer) {
-        setButtonGroupValue(group, answer);
-      } else if (intent === "referral-source") {
-        const pick = chooseClosestChoice(
-          group.buttons.map((b) => b.textContent?.trim() || ""),
-          "company website"
-        );
+      answers = await resolveFormPlan(lookups);
+    } catch (_err) {
+      try {
+        // Older backends have no /form-plan; fall back to per-question lookups.
+        answers = await lookupClosedAnswers(lookups);
+      } catch (_lookupErr) {
+        // Backend unreachable: use whatever the last history sync mirrored.
+        await mirrorSync;
+        answers = mirrorAnswers(lookups);
+      }
+    }
+  }
+  const answerFor = new Map(lookups.map((item, idx) => [item, answers[idx] || null]));
+
+  // Second pass: apply answers, remember default picks, and queue drafts.
+  const toStore = [];
+  const openEnded = [];
+  for (const item of pending) {
+    const answer = answerFor.get(item) || null;
+    if (item.kind === "closed") {
+      if (answer) setFieldValue(item.field, answer);
+      else if (item.intent === "referral-source" && item.choices.length) {
+        const pick = chooseClosestChoice(item.choices, "company website");
         if (pick) {
-          setButtonGroupValue(group, pick);
-          await storeClosedAnswer(group.question, pick, group.buttons.map((b) => b.textContent?.trim() || ""), intent);
+          setFieldValue(item.field, pick);
+          toStore.push({ question: item.question, answer: pick, choices: item.choices, intent: item.intent });
         }
       }
-    } catch (_err) {
-      // ignore lookup failure
+    } else if (item.kind === "input") {
+      if (answer) setFieldValue(item.field, answer);
+    } else if (answer) {
+      setFieldValue(item.field, answer);
+    } else {
+      openEnded.push(item);
     }
   }
+
+  for (const item of groupItems) {
+    const answer = answerFor.get(item) || null;
+    if (answer) {
+      setButtonGroupValue(item.group, answer);
+    } else if (item.intent === "referral-source") {
+      const pick = chooseClosestChoice(item.choices, "company website");
+      if (pick) {
+        setButtonGroupValue(item.group, pick);
+        toStore.push({ question: item.question, answer: pick, choices: item.choices, intent: item.intent });
+      }
+    }
+  }
+
+  if (toStore.length) await storeClosedAnswers(toStore);
+
+  await handleOpenEndedBatch(openEnded, config);
 }
 
 function initClosedCapture() {
@@ -755,14 +1093,11 @@ chrome.runtime.onMessage.addListener((message, _sender, _sendResponse) => {
 async function saveManualAnswers() {
   const config = await getConfig();
   STATE.backendUrl = config.backendUrl;
+  STATE.profile = config.profile;
   initButtonCapture();
   
-  // Track results
-  const results = {
-    updated: 0,
-    saved: 0,
-    failed: 0
-  };
+  // Collect every answer on the page first so they are stored in a single write
+  const toStore = [];
   
   const fields = Array.from(document.querySelectorAll("input, select, textarea")).filter(
     (el) => !el.disabled && el.offsetParent !== null
@@ -784,16 +1119,7 @@ async function saveManualAnswers() {
         }
       }
       if (answer) {
-        const result = await storeClosedAnswer(question, answer, choices, intent);
-        if (result.success) {
-          if (result.updated) {
-            results.updated++;
-          } else {
-            results.saved++;
-          }
-        } else {
-          results.failed++;
-        }
+        toStore.push({ question, answer, choices, intent });
       }
       continue;
     }
@@ -804,16 +1130,7 @@ async function saveManualAnswers() {
       const openEndedHints = ["why", "describe", "tell us", "motivation", "cover letter", "essay"];
       if (openEndedHints.some((hint) => q.includes(hint))) continue;
       if (value) {
-        const result = await storeClosedAnswer(question, value, [], intent);
-        if (result.success) {
-          if (result.updated) {
-            results.updated++;
-          } else {
-            results.saved++;
-          }
-        } else {
-          results.failed++;
-        }
+        toStore.push({ question, answer: value, choices: [], intent });
       }
     }
   }
@@ -824,21 +1141,32 @@ async function saveManualAnswers() {
     const selected = detectSelectedButton(group);
     const answer = (selected && (selected.textContent || "").trim()) || "";
     if (answer) {
-      const result = await storeClosedAnswer(
-        group.question, 
-        answer, 
-        group.buttons.map((b) => b.textContent?.trim() || ""), 
-        detectIntent(group.question)
-      );
-      if (result.success) {
-        if (result.updated) {
-          results.updated++;
-        } else {
-          results.saved++;
-        }
+      toStore.push({
+        question: group.question,
+        answer,
+        choices: group.buttons.map((b) => b.textContent?.trim() || ""),
+        intent: detectIntent(group.question)
+      });
+    }
+  }
+  
+  // Track results
+  const results = {
+    updated: 0,
+    saved: 0,
+    failed: 0
+  };
+  
+  const stored = await storeClosedAnswers(toStore);
+  for (const result of stored) {
+    if (result.success) {
+      if (result.updated) {
+        results.updated++;
       } else {
-        results.failed++;
+        results.saved++;
       }
+    } else {
+      results.failed++;
     }
   }
   
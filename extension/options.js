@@ -1,20 +1,28 @@
 const backendUrlInput = document.getElementById("backendUrl");
 const autoDraftCheckbox = document.getElementById("autoDraft");
+const profileInput = document.getElementById("profile");
 const statusEl = document.getElementById("status");
 
 async function loadSettings() {
-  const { backendUrl, autoDraftOpenEnded } = await chrome.storage.sync.get([
+  const { backendUrl, autoDraftOpenEnded, profile } = await chrome.storage.sync.get([
     "backendUrl",
-    "autoDraftOpenEnded"
+    "autoDraftOpenEnded",
+    "profile"
   ]);
   backendUrlInput.value = backendUrl || "http://localhost:8000";
   autoDraftCheckbox.checked = autoDraftOpenEnded !== false;
+  profileInput.value = profile || "";
 }
 
 async function saveSettings() {
   const backendUrl = backendUrlInput.value.trim();
   const autoDraftOpenEnded = autoDraftCheckbox.checked;
-  await chrome.storage.sync.set({ backendUrl, autoDraftOpenEnded });
+  const profile = profileInput.value.trim();
+  if (profile && !/^[A-Za-z0-9][A-Za-z0-9_-]{0,63}$/.test(profile)) {
+    setStatus("Profile: use letters, digits, '-' or '_' (max 64)", "error");
+    return;
+  }
+  await chrome.storage.sync.set({ backendUrl, autoDraftOpenEnded, profile });
   setStatus("Saved", "ok");
 }
 
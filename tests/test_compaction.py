@@ -0,0 +1,43 @@
+from backend.compaction import plan_compaction
+from backend.matching import normalize_question
+
+
+def row(question, answer, intent=None, version=1, updated_at=None):
+    return normalize_question(question), {"question": question, "answer": answer}, intent, version, updated_at
+
+
+def merged_groups(plan):
+    return sorted(sorted([cluster.canonical, *cluster.merged]) for cluster in plan.clusters)
+
+
+def test_same_intent_below_threshold_is_not_merged():
+    rows = [
+        row("Are you authorized to work in the US?", "Yes", intent="work_authorization"),
+        row("Are you authorized to work in Canada?", "Yes", intent="work_authorization"),
+    ]
+    assert plan_compaction(rows, threshold=0.75).clusters == []
+
+
+def test_similar_wordings_with_the_same_answer_are_merged():
+    rows = [
+        row("Have you ever worked for this company before?", "No", updated_at=1.0),
+        row("Have you worked for this company before?", "No", updated_at=2.0),
+        row("Are you willing to relocate?", "No"),
+    ]
+    plan = plan_compaction(rows, threshold=0.75)
+    assert merged_groups(plan) == [
+        ["have you ever worked for this company before", "have you worked for this company before"]
+    ]
+    # The most recently written wording is kept; the other becomes its alias.
+    assert plan.clusters[0].canonical == "have you worked for this company before"
+    assert [alias["key"] for alias in plan.clusters[0].entry["aliases"]] == [
+        "have you ever worked for this company before"
+    ]
+
+
+def test_different_answers_are_never_merged():
+    rows = [
+        row("Have you ever worked for this company before?", "No"),
+        row("Have you worked for this company before?", "Yes"),
+    ]
+    assert plan_compaction(rows, threshold=0.5).clusters == []
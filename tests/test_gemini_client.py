@@ -0,0 +1,128 @@
+import asyncio
+import importlib
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from backend import fake_genai, gemini_client
+from backend.gemini_client import DraftCache, GeminiClient
+
+
+@pytest.fixture(autouse=True)
+def reset_fake_stats():
+    fake_genai.reset_stats()
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return DraftCache(tmp_path / "drafts.sqlite3", ttl_seconds=60, max_entries=3)
+
+
+def make_client(models, cache=None):
+    return GeminiClient(fake_genai, "test-key", models, max_concurrency=4, timeout=5, cache=cache)
+
+
+def test_concurrent_identical_prompts_share_one_upstream_call(cache):
+    client = make_client(["fake-model"], cache)
+
+    async def run():
+        return await asyncio.gather(*(client.generate("Why this role?") for _ in range(10)))
+
+    results = asyncio.run(run())
+    assert fake_genai.stats["calls"] == 1
+    assert client.upstream_calls == 1
+    assert client.deduplicated == 9
+    assert len({result["draft"] for result in results}) == 1
+
+
+def test_finished_drafts_are_served_from_the_cache(cache):
+    client = make_client(["fake-model"], cache)
+
+    async def run():
+        first = await client.generate("Why this role?")
+        second = await client.generate("Why this role?")
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert (first["cached"], second["cached"]) == (False, True)
+    assert second["draft"] == first["draft"]
+    assert fake_genai.stats["calls"] == 1
+
+
+def test_cache_entries_expire_after_ttl(cache, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(gemini_client.time, "time", lambda: now[0])
+    cache.put("key", "fake-model", "draft", "gemini:fake-model")
+    assert cache.get("key") == {"draft": "draft", "source": "gemini:fake-model"}
+    now[0] += 61
+    assert cache.get("key") is None
+
+
+def test_eviction_drops_least_recently_used_beyond_max_entries(cache, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(gemini_client.time, "time", lambda: now[0])
+    for key in ["a", "b", "c"]:
+        now[0] += 1
+        cache.put(key, "fake-model", key, "gemini:fake-model")
+    now[0] += 1
+    cache.get("a")
+    now[0] += 1
+    cache.put("d", "fake-model", "d", "gemini:fake-model")
+    cache.evict()
+    assert [key for key in "abcd" if cache.get(key)] == ["a", "c", "d"]
+    assert cache.stats()["evictions"] == 1
+
+
+def test_failing_model_falls_back_to_the_next_one(cache):
+    client = make_client(["fail-model", "fake-model"], cache)
+
+    async def run():
+        return [await client.generate("Why this role?") for _ in range(2)]
+
+    first, second = asyncio.run(run())
+    assert first["source"] == second["source"] == "gemini:fake-model"
+    # A fallback model's draft is not cached under the primary model's key.
+    assert second["cached"] is False
+    assert cache.stats()["size"] == 0
+
+
+def test_stream_resets_when_a_model_fails_partway(cache):
+    client = make_client(["flaky-model", "fake-model"], cache)
+
+    async def run():
+        return [event async for event in client.stream("Why this role?")]
+
+    events = asyncio.run(run())
+    kinds = [kind for kind, _payload in events]
+    reset = kinds.index("reset")
+    assert kinds[:reset] == ["delta", "delta"]
+    assert kinds[-1] == "done"
+    done = events[-1][1]
+    assert done["source"] == "gemini:fake-model"
+    # What follows the reset is the fallback model's complete draft.
+    assert "".join(payload["text"] for kind, payload in events[reset:] if kind == "delta") == done["draft"]
+
+
+@pytest.fixture(scope="module")
+def main_module(tmp_path_factory):
+    # main.py reads its configuration on import, so point it at a scratch data directory first.
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setenv("BACKEND_DATA_DIR", str(tmp_path_factory.mktemp("data")))
+        patch.setenv("GEMINI_BACKEND", "fake")
+        yield importlib.import_module("backend.main")
+
+
+def test_stream_endpoint_sends_reset_event(main_module, monkeypatch):
+    monkeypatch.setattr(main_module, "gemini_client", make_client(["flaky-model", "fake-model"]))
+    with TestClient(main_module.app) as client:
+        response = client.post("/open-question/stream", json={"question": "Why this role?"})
+    assert response.status_code == 200
+    events = [
+        (block.split("\n")[0].removeprefix("event: "), json.loads(block.split("\n")[1].removeprefix("data: ")))
+        for block in response.text.strip().split("\n\n")
+    ]
+    kinds = [kind for kind, _data in events]
+    assert kinds[0] == "meta" and kinds[-1] == "done"
+    assert "reset" in kinds and kinds.index("reset") > kinds.index("delta")
+    assert events[-1][1]["source"] == "gemini:fake-model"
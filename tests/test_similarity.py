@@ -0,0 +1,101 @@
+import random
+
+import pytest
+
+from backend.matching import QuestionIndex, normalize_question
+from backend.similarity import DEFAULT_THRESHOLD, NUMPY_AVAILABLE, SimilarityEngine
+from benchmarks.datasets import make_history, make_queries
+
+STORED = {
+    "Are you authorized to work in the US?": "Yes",
+    "Have you worked for this company before?": "No",
+    "Will you now or in the future require visa sponsorship?": "No",
+    "What is your expected salary?": "120000",
+    "Are you willing to relocate?": "Yes",
+    "What is your LinkedIn profile URL?": "https://linkedin.com/in/example",
+}
+
+# Questions that share most of their wording with a stored one but ask something else.
+NEAR_MISSES = [
+    "Are you authorized to work in Canada?",
+    "Are you authorized to work in the UK?",
+    "Are you authorized to work in Germany?",
+    "Have you worked for a competitor?",
+    "What is your GitHub profile URL?",
+    "Are you willing to travel?",
+    "What is your expected start date?",
+]
+
+PARAPHRASES = {
+    "Are you legally authorized to work in the US?": "Are you authorized to work in the US?",
+    "Have you ever worked for this company before?": "Have you worked for this company before?",
+    "Have you previously worked for this company?": "Have you worked for this company before?",
+    "Will you require visa sponsorship now or in the future?": "Will you now or in the future require visa sponsorship?",
+    "Would you be willing to relocate?": "Are you willing to relocate?",
+    "LinkedIn profile URL": "What is your LinkedIn profile URL?",
+}
+
+ENGINES = [
+    pytest.param(QuestionIndex, 0.6, id="token"),
+    pytest.param(
+        SimilarityEngine,
+        DEFAULT_THRESHOLD,
+        id="ngram",
+        marks=pytest.mark.skipif(not NUMPY_AVAILABLE, reason="numpy is not installed"),
+    ),
+]
+
+
+def stored_history():
+    return {normalize_question(question): {"question": question, "answer": answer} for question, answer in STORED.items()}
+
+
+@pytest.mark.parametrize("engine, threshold", ENGINES)
+@pytest.mark.parametrize("question", NEAR_MISSES)
+def test_near_misses_do_not_match(engine, threshold, question):
+    index = engine.from_history(stored_history())
+    assert index.top_k(normalize_question(question), k=1, threshold=threshold) == []
+
+
+@pytest.mark.parametrize("engine, threshold", ENGINES)
+@pytest.mark.parametrize("question, expected", PARAPHRASES.items())
+def test_paraphrases_match(engine, threshold, question, expected):
+    index = engine.from_history(stored_history())
+    matches = index.top_k(normalize_question(question), k=1, threshold=threshold)
+    assert [key for key, _score in matches] == [normalize_question(expected)]
+
+
+@pytest.mark.skipif(not NUMPY_AVAILABLE, reason="numpy is not installed")
+def test_ngram_scores_do_not_depend_on_build_history():
+    history = make_history(2000, seed=1)
+    queries = [normalize_question(query) for query in make_queries(history, 300, seed=2)]
+    built = SimilarityEngine.from_history(history)
+
+    # Same entries, inserted in another order, with unrelated entries added and removed in between.
+    incremental = SimilarityEngine()
+    items = list(history.items())
+    random.Random(3).shuffle(items)
+    transient = {key: entry for key, entry in make_history(1500, seed=4).items() if key not in history}
+    for key, entry in items[: len(items) // 2]:
+        incremental.upsert(key, entry)
+    for key, entry in transient.items():
+        incremental.upsert(key, entry)
+    for key, entry in items[len(items) // 2 :]:
+        incremental.upsert(key, entry)
+    for key in transient:
+        incremental.remove(key)
+
+    for query in queries:
+        assert incremental.top_k(query, k=3, threshold=DEFAULT_THRESHOLD) == built.top_k(
+            query, k=3, threshold=DEFAULT_THRESHOLD
+        )
+
+
+@pytest.mark.skipif(not NUMPY_AVAILABLE, reason="numpy is not installed")
+def test_ngram_ties_resolve_to_smallest_key():
+    index = SimilarityEngine()
+    for key in ["salary zb", "salary za", "salary zc"]:
+        index.upsert(key, {"question": key, "answer": key})
+    matches = index.top_k("salary", k=2)
+    assert [key for key, _score in matches] == ["salary za", "salary zb"]
+    assert matches[0][1] == matches[1][1]